@@ -0,0 +1,80 @@
+import argparse
+import glob
+import time
+from typing import Callable, List, Tuple
+
+from bs4 import BeautifulSoup
+
+from scrapers.html_extract import HTML_PARSER, TRANSLATIONS_LIST_CLASS, extract_first_table, extract_translations
+
+
+def page_boilerplate(seed: int) -> Tuple[str, str]:
+    # Navigation, scripts and footer links like the ones surrounding the content on the scraped sites
+    head = "".join(f'<script src="/static/js/app{idx}.js"></script><link rel="stylesheet" href="/static/css/{idx}.css">' for idx in range(20))
+    navigation = "".join(f'<li class="nav-item"><a href="/pl/{seed}-{idx}" title="Link {idx}">Słowo {idx}</a></li>' for idx in range(300))
+    footer = "".join(f'<div class="footer-col"><p>Stopka {idx} <b>tekst</b> <i>kursywa</i></p></div>' for idx in range(100))
+    return f"<html><head>{head}</head><body><nav><ul>{navigation}</ul></nav>", f"<footer>{footer}</footer></body></html>"
+
+
+def translations_page(seed: int) -> str:
+    header, footer = page_boilerplate(seed)
+    translations = "".join(f"<li> tłomaczenie{seed}-{idx} </li>" for idx in range(5))
+    return f'{header}<main><h1>słowo{seed}</h1><ul class="{TRANSLATIONS_LIST_CLASS}">{translations}</ul></main>{footer}'
+
+
+def declension_page(seed: int) -> str:
+    header, footer = page_boilerplate(seed)
+    rows = "".join(f"<tr><td>Przypadek{idx} (kto? co?)</td><td>forma{seed}-{idx}</td><td>formy{seed}-{idx}</td></tr>" for idx in range(7))
+    return f"{header}<main><table><tr><th>Przypadek</th><th>Liczba pojedyncza</th><th>Liczba mnoga</th></tr>{rows}</table></main>{footer}"
+
+
+def extract_full_parse(html: str) -> str:
+    # The previous implementation, the whole page parsed with html.parser
+    soup = BeautifulSoup(html, 'html.parser')
+    if TRANSLATIONS_LIST_CLASS in html:
+        return repr([li.text.strip() for ul in soup.find_all('ul', class_=TRANSLATIONS_LIST_CLASS) for li in ul.find_all('li')])
+    return str(soup.find('table'))
+
+
+def extract_partial_parse(html: str) -> str:
+    if TRANSLATIONS_LIST_CLASS in html:
+        return repr(extract_translations(html))
+    return str(extract_first_table(html))
+
+
+def measure(function: Callable[[str], str], pages: List[str], repeat: int) -> Tuple[float, List[str]]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [function(page) for page in pages]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare full and partial parsing of scraped HTML pages")
+    parser.add_argument("--fixtures", help="Directory with saved *.html pages, synthetic pages are generated if not given")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        pages = []
+        for path in sorted(glob.glob(f"{args.fixtures}/*.html")):
+            with open(path, "r", encoding="utf-8") as file:
+                pages.append(file.read())
+    else:
+        pages = [translations_page(seed) if seed % 2 else declension_page(seed) for seed in range(args.pages)]
+
+    baseline_time, baseline = measure(extract_full_parse, pages, args.repeat)
+    optimized_time, optimized = measure(extract_partial_parse, pages, args.repeat)
+    assert baseline == optimized, "Extracted content differs"
+
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KiB on average")
+    print(f"  full html.parser:        {baseline_time:.3f}s ({len(pages) / baseline_time:,.0f} pages/s)")
+    print(f"  partial {HTML_PARSER + ':':<16} {optimized_time:.3f}s ({len(pages) / optimized_time:,.0f} pages/s)")
+    print(f"  speedup:                 {baseline_time / optimized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+
+ENTRY_MODULE = "data_processor.__main__"
+DEFAULT_REPEAT = 5
+DEFAULT_BUDGET = 0.5
+DEFAULT_TOP = 15
+# Imported by the stages that need them, importing the entry point must not pull them in
+DEFERRED_MODULES = ["pandas", "transformers", "sacremoses", "tqdm", "torch"]
+
+
+def import_times(module: str) -> Tuple[float, Dict[str, int]]:
+    # Total import time in seconds and the cumulative microseconds of every imported module, in a fresh interpreter
+    # so that nothing is imported already
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True, check=True)
+    # The modules imported at interpreter start-up are listed up to and including site, the indented names are
+    # imported by the module listed after them
+    modules, started = {}, False
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name[1:].rstrip()
+        if started:
+            modules[name] = int(cumulative)
+        elif name == "site":
+            started = True
+    return sum(top_level(modules).values()) / 1e6, modules
+
+
+def top_level(modules: Dict[str, int], depth: int = 0) -> Dict[str, int]:
+    # Every level of nesting is indented by two more spaces
+    indent = " " * 2 * depth
+    return {name.strip(): cumulative for name, cumulative in modules.items() if name.startswith(indent) and not name.startswith(indent + " ")}
+
+
+def check_run_time(repeat: int) -> Tuple[float, int]:
+    # Best wall time of a whole `python data_processor --check` run and its exit code
+    best, returncode = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        returncode = subprocess.run([sys.executable, "data_processor", "--check"], capture_output=True).returncode
+        best = min(best, time.perf_counter() - start)
+    return best, returncode
+
+
+def find_deferred(modules: Dict[str, int]) -> List[str]:
+    imported = {name.strip().split(".")[0] for name in modules}
+    return [module for module in DEFERRED_MODULES if module in imported]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time importing the data_processor entry point and check that the ML stack is imported lazily")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"fresh interpreters per measurement, the best one counts (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help=f"maximum import time in seconds (default: {DEFAULT_BUDGET})")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help=f"number of slowest modules listed (default: {DEFAULT_TOP})")
+    parser.add_argument("--check-run", action="store_true", help="also time a whole `python data_processor --check` run")
+    args = parser.parse_args()
+
+    best, modules = min((import_times(ENTRY_MODULE) for _ in range(args.repeat)), key=lambda result: result[0])
+    print(f"import {ENTRY_MODULE}: {best * 1000:.1f} ms, {len(modules)} modules")
+    # The modules imported by the entry point itself, with everything they import in turn
+    for name, cumulative in sorted(top_level(modules, depth=1).items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{cumulative / 1000:>10.1f} ms  {name}")
+
+    if args.check_run:
+        seconds, returncode = check_run_time(args.repeat)
+        print(f"python data_processor --check: {seconds * 1000:.1f} ms, exit code {returncode}")
+
+    failures = [f"{module} is imported by {ENTRY_MODULE}" for module in find_deferred(modules)]
+    if best > args.budget:
+        failures.append(f"import took {best:.3f} s, over the budget of {args.budget:.3f} s")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+from utils.data_cleaner import compile_phrases, phrases_to_remove, remove_phrases
+
+
+def load_lines(paths: List[str]) -> List[str]:
+    lines = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            lines.extend(file)
+    return lines
+
+
+def remove_sequentially(lines: List[str]) -> List[str]:
+    # The previous implementation, every phrase replaced in every line
+    results = []
+    for line in lines:
+        line = line.strip()
+        for phrase in phrases_to_remove:
+            line = line.replace(phrase, '').strip()
+        results.append(line)
+    return results
+
+
+def remove_with_pattern(lines: List[str]) -> List[str]:
+    phrase_pattern = compile_phrases(phrases_to_remove)
+    return [remove_phrases(line, phrases_to_remove, phrase_pattern) for line in lines]
+
+
+def measure(function: Callable[[List[str]], List[str]], lines: List[str], repeat: int) -> Tuple[float, List[str]]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(lines)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare sequential and pattern-guarded phrase removal")
+    parser.add_argument("paths", nargs="*", default=["data/raw/bilingual/dataset.pl.txt", "data/raw/bilingual/dataset.csb.txt"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lines = load_lines(args.paths)
+    baseline_time, baseline = measure(remove_sequentially, lines, args.repeat)
+    optimized_time, optimized = measure(remove_with_pattern, lines, args.repeat)
+    assert baseline == optimized, "Cleaned lines differ"
+
+    phrase_pattern = compile_phrases(phrases_to_remove)
+    matching = sum(phrase_pattern.search(line.strip()) is not None for line in lines)
+    print(f"{' '.join(args.paths)}: {len(lines)} lines, {matching} containing a phrase")
+    print(f"  sequential: {baseline_time:.3f}s ({len(lines) / baseline_time:,.0f} lines/s)")
+    print(f"  pattern:    {optimized_time:.3f}s ({len(lines) / optimized_time:,.0f} lines/s)")
+    print(f"  speedup:    {baseline_time / optimized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
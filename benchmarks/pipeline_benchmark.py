@@ -0,0 +1,256 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from data_processor import config_loader
+from data_processor.data_normalizer import DataNormalizer
+from data_processor.data_preparer import DataPreparer
+from data_processor.tsv_writer import write_batches
+
+
+CONFIG_PATH = "data_processor/config.ini"
+DEFAULT_BASELINE_PATH = "benchmarks/pipeline_baseline.json"
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_REPEAT = 3
+# Stages faster than this in the baseline are too noisy to compare their rows/s
+MIN_COMPARED_SECONDS = 0.01
+SOURCE_LANG = "pol_Latn"
+TARGET_LANG = "csb_Latn"
+STAGES = ["read", "dataframe", "printable_filter", "moses_normalization", "unk_filter", "tsv_write"]
+
+# Markers the stub tokenizer turns into an unknown token, like characters missing from the NLLB vocabulary
+UNKNOWN_MARKER = "ŋ"
+POLISH_WORDS = ["ala", "ma", "kota", "żółw", "dom", "źródło", "się", "jest", "bardzo", "ładny", "pies", "miasto", "woda", "rzeka",
+                "człowiek", "świat", "dzień", "noc", "jabłko", "chleb", "książka", "szkoła", "droga", "morze", "gęś"]
+KASHUBIAN_WORDS = ["ala", "mô", "kòta", "żôłw", "dóm", "zdrzódło", "so", "je", "baro", "pëszny", "pies", "gard", "wòda", "rzéka",
+                   "człowiek", "swiat", "dzéń", "noc", "jabkò", "chléb", "ksążka", "szkòła", "dregã", "mòrze", "gãs"]
+PUNCTUATION = [("„", "”"), ("«", "»"), ("\"", "\""), ("(", ")"), ("", "")]
+SUFFIXES = ["", ".", "...", " !", " ?", " ;", ","]
+
+
+class StubTokenizer:
+    # Stands in for the NLLB tokenizer so that the benchmark measures the pipeline rather than the tokenizer
+    unk_token_id = 3
+
+    def __call__(self, texts: List[str], add_special_tokens: bool = True) -> SimpleNamespace:
+        return SimpleNamespace(input_ids=[
+            [self.unk_token_id if UNKNOWN_MARKER in word else 4 + len(word) for word in text.split()] + [2] for text in texts
+        ])
+
+
+def synthetic_sentence(rng: random.Random, words: List[str], opening: str, closing: str, suffix: str) -> str:
+    sentence = " ".join(rng.choice(words) for _ in range(rng.randint(1, 12)))
+    if rng.random() < 0.05:
+        sentence = sentence.replace(" ", "  ", 1)
+    return f"{opening}{sentence}{closing}{suffix}"
+
+
+def write_synthetic_corpus(directory: str, size: int, seed: int = 0) -> Tuple[str, str]:
+    # Dictionary like pairs with quotes and spacing for the punctuation normalizer, a few unprintable characters and
+    # words unknown to the tokenizer, and repeated headwords
+    rng = random.Random(seed + size)
+    source_path = os.path.join(directory, f"synthetic_{size}.pol.txt")
+    target_path = os.path.join(directory, f"synthetic_{size}.csb.txt")
+    headwords = [(rng.choice(POLISH_WORDS), rng.choice(KASHUBIAN_WORDS)) for _ in range(max(size // 20, 1))]
+    with open(source_path, "w", encoding="utf-8") as source_file, open(target_path, "w", encoding="utf-8") as target_file:
+        for _ in range(size):
+            if rng.random() < 0.3:
+                source, target = rng.choice(headwords)
+            else:
+                opening, closing = rng.choice(PUNCTUATION)
+                suffix = rng.choice(SUFFIXES)
+                source = synthetic_sentence(rng, POLISH_WORDS, opening, closing, suffix)
+                target = synthetic_sentence(rng, KASHUBIAN_WORDS, opening, closing, suffix)
+            if rng.random() < 0.01:
+                target += "\u200b"
+            if rng.random() < 0.02:
+                target += f" {UNKNOWN_MARKER}"
+            source_file.write(source + "\n")
+            target_file.write(target + "\n")
+    return source_path, target_path
+
+
+def real_corpora(config_path: str) -> Dict[str, Tuple[str, str]]:
+    config = config_loader.load(config_path, logging.getLogger(__name__))
+    corpora = {}
+    for section in config.sections():
+        if config.has_option(section, "source_file") and config.has_option(section, "target_file"):
+            source_path, target_path = config[section]["source_file"], config[section]["target_file"]
+            if os.path.exists(source_path) and os.path.exists(target_path):
+                corpora[os.path.basename(source_path).split(".")[0]] = (source_path, target_path)
+    return corpora
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_stages(source_path: str, target_path: str, output_path: str) -> Dict[str, Dict]:
+    # Runs in a fresh process per corpus. Peak RSS is the high-water mark of that process at the end of each stage,
+    # so a stage raising it shows up in its own and all the following stages.
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.WARNING)
+    preparer = DataPreparer(logger)
+    normalizer = DataNormalizer(logger)
+    read_text_file = preparer._DataPreparer__read_text_file
+    state = {}
+
+    def read() -> int:
+        state["source"], state["target"] = read_text_file(source_path), read_text_file(target_path)
+        return len(state["source"])
+
+    def build_dataframe() -> int:
+        state["train_df"] = DataPreparer._DataPreparer__build_dataframe(state["source"], state["target"], SOURCE_LANG, TARGET_LANG)
+        del state["source"], state["target"]
+        return state["train_df"].shape[0]
+
+    def printable_filter() -> int:
+        rows = state["train_df"].shape[0]
+        state["train_df"] = normalizer._DataNormalizer__remove_unprintable_rows(state["train_df"])
+        return rows
+
+    def moses_normalization() -> int:
+        state["train_df"] = normalizer._DataNormalizer__normalize_translation_dataset(state["train_df"])
+        return state["train_df"].shape[0]
+
+    def unk_filter() -> int:
+        train_df = state["train_df"]
+        unknown_tokens = normalizer._DataNormalizer__find_unknown_tokens(StubTokenizer(), train_df)
+        state["train_df"] = normalizer._DataNormalizer__remove_rows_with_unknown_tokens(train_df, unknown_tokens)
+        return train_df.shape[0]
+
+    def tsv_write() -> int:
+        return write_batches([state["train_df"]], output_path)
+
+    stages: Dict[str, Callable[[], int]] = {
+        "read": read, "dataframe": build_dataframe, "printable_filter": printable_filter,
+        "moses_normalization": moses_normalization, "unk_filter": unk_filter, "tsv_write": tsv_write
+    }
+    results = {}
+    for name in STAGES:
+        start = time.perf_counter()
+        rows = stages[name]()
+        seconds = time.perf_counter() - start
+        results[name] = {
+            "rows": rows,
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1)
+        }
+    return results
+
+
+def run_corpus(source_path: str, target_path: str, output_path: str, repeat: int) -> Dict[str, Dict]:
+    # Every repetition runs in a new process, the best rows/s and the lowest peak RSS of every stage are kept
+    best = {}
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            results = executor.submit(run_stages, source_path, target_path, output_path).result()
+        for stage, result in results.items():
+            if stage not in best:
+                best[stage] = result
+                continue
+            if result["seconds"] < best[stage]["seconds"]:
+                best[stage] = {**result, "peak_rss_mb": best[stage]["peak_rss_mb"]}
+            best[stage]["peak_rss_mb"] = min(best[stage]["peak_rss_mb"], result["peak_rss_mb"])
+    return best
+
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    # Only corpora and stages present in both runs are compared, rows/s may drop and peak RSS grow by the threshold
+    regressions = []
+    for corpus, stages in results.items():
+        for stage, result in stages.items():
+            expected = baseline.get(corpus, {}).get(stage)
+            if expected is None:
+                continue
+            if expected["seconds"] >= MIN_COMPARED_SECONDS and result["rows_per_second"] and expected["rows_per_second"] and \
+                    result["rows_per_second"] < expected["rows_per_second"] * (1 - threshold):
+                regressions.append(f"{corpus}/{stage}: {result['rows_per_second']:,.0f} rows/s, baseline {expected['rows_per_second']:,.0f} rows/s")
+            if result["peak_rss_mb"] > expected["peak_rss_mb"] * (1 + threshold):
+                regressions.append(f"{corpus}/{stage}: {result['peak_rss_mb']:.1f} MB peak RSS, baseline {expected['peak_rss_mb']:.1f} MB")
+    return regressions
+
+
+def print_results(corpus: str, stages: Dict[str, Dict]) -> None:
+    print(f"{corpus}: {stages['read']['rows']} pairs")
+    for stage, result in stages.items():
+        rows_per_second = f"{result['rows_per_second']:>14,.0f}" if result["rows_per_second"] else f"{'-':>14}"
+        print(f"  {stage:<20} {result['seconds']:>9.3f}s {rows_per_second} rows/s {result['peak_rss_mb']:>9.1f} MB peak RSS")
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_results(path: str, results: Dict[str, Dict]) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "pandas": pd.__version__},
+        "results": results
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time every data_processor stage and compare the results with a baseline")
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="sizes of the synthetic corpora in pairs")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"runs per corpus, the best one counts (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--no-real", action="store_true", help="skip the data/input corpora listed in config.ini")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help=f"baseline JSON file (default: {DEFAULT_BASELINE_PATH})")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"allowed relative drop in rows/s and growth in peak RSS (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline instead of comparing")
+    parser.add_argument("--output", help="also write the results of this run to a JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        corpora = {} if args.no_real else real_corpora(CONFIG_PATH)
+        for size in args.sizes:
+            corpora[f"synthetic_{size}"] = write_synthetic_corpus(directory, size)
+        for corpus, (source_path, target_path) in corpora.items():
+            results[corpus] = run_corpus(source_path, target_path, os.path.join(directory, f"{corpus}.tsv"), args.repeat)
+            print_results(corpus, results[corpus])
+
+    if args.output:
+        save_results(args.output, results)
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    if baseline is None:
+        save_results(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    regressions = find_regressions(results, baseline["results"], args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions past {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
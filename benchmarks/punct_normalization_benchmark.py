@@ -0,0 +1,63 @@
+import argparse
+import logging
+import re
+import time
+from typing import Callable, Tuple
+
+import pandas as pd
+from sacremoses import MosesPunctNormalizer
+
+from data_processor.data_normalizer import DataNormalizer
+
+
+def load_dataset(source_path: str, target_path: str) -> pd.DataFrame:
+    with open(source_path, "r", encoding="utf-8") as source_file, open(target_path, "r", encoding="utf-8") as target_file:
+        return pd.DataFrame(
+            [[source.strip(), target.strip()] for source, target in zip(source_file, target_file)],
+            columns=["pol_Latn", "csb_Latn"]
+        )
+
+
+def normalize_per_row(train_df: pd.DataFrame) -> pd.DataFrame:
+    # The previous implementation, a fresh normalizer applied to every cell
+    mpn = MosesPunctNormalizer(lang="en")
+    mpn.substitutions = [(re.compile(r), sub) for r, sub in mpn.substitutions]
+    return train_df.apply(lambda column: column.apply(mpn.normalize))
+
+
+def normalize_deduplicated(train_df: pd.DataFrame) -> pd.DataFrame:
+    normalizer = DataNormalizer(logging.getLogger(__name__))
+    return normalizer._DataNormalizer__normalize_translation_dataset(train_df)
+
+
+def measure(function: Callable[[pd.DataFrame], pd.DataFrame], train_df: pd.DataFrame, repeat: int) -> Tuple[float, pd.DataFrame]:
+    best = float("inf")
+    for _ in range(repeat):
+        data = train_df.copy()
+        start = time.perf_counter()
+        result = function(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare per-row and deduplicated Moses punctuation normalization")
+    parser.add_argument("--source", default="data/input/train.pol.txt")
+    parser.add_argument("--target", default="data/input/train.csb.txt")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    train_df = load_dataset(args.source, args.target)
+    baseline_time, baseline = measure(normalize_per_row, train_df, args.repeat)
+    optimized_time, optimized = measure(normalize_deduplicated, train_df, args.repeat)
+    assert baseline.equals(optimized), "Normalized output differs"
+
+    rows = train_df.shape[0]
+    print(f"{args.source} / {args.target}: {rows} rows, {train_df.pol_Latn.nunique()} / {train_df.csb_Latn.nunique()} unique")
+    print(f"  per row:      {baseline_time:.3f}s ({rows / baseline_time:,.0f} rows/s)")
+    print(f"  deduplicated: {optimized_time:.3f}s ({rows / optimized_time:,.0f} rows/s)")
+    print(f"  speedup:      {baseline_time / optimized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
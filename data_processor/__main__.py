@@ -1,37 +1,230 @@
-import config_loader
-from data_preparer import DataPreparer
-from data_normalizer import DataNormalizer
+import argparse
+import os
+import sys
+import time
 from logging import Logger
-from logger import set_up_logger
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def process_data(data_paths: dict, language: dict, logger: Logger) -> None:
-    DataPreparer(logger).prepare(
-        data_paths["source_file"],
-        data_paths["target_file"],
-        data_paths["output_file"],
-        language["source_language"],
-        language["target_language"]
-    )
-    DataNormalizer(logger).normalize(
-        data_paths["output_file"],
-        data_paths["output_file"]
-    )
+# pandas, transformers and sacremoses are imported by the stages that use them, so that --check and runs with every
+# split up to date start quickly, see benchmarks/import_benchmark.py
+from data_processor import config_loader  # noqa: E402
+from data_processor.build_manifest import BuildManifest, inputs_digest  # noqa: E402
+from data_processor.columnar import columnar_path  # noqa: E402
+from data_processor.instrumentation import get_recorder  # noqa: E402
+from data_processor.logger import set_up_logger  # noqa: E402
+from data_processor.parallel_corpus import ParallelCorpus  # noqa: E402
+from data_processor.profiling import PROFILE_MODES, Profiler, create_profiler, use_profiler  # noqa: E402
+from data_processor.settings import STREAM_CHUNK_SIZE, normalizer_settings  # noqa: E402
+from data_processor.tokenizer_provider import configure_tokenizer  # noqa: E402
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+CONFIG_PATH = "data_processor/config.ini"
+# The code that shapes the output files, editing any of it rebuilds every split
+OUTPUT_MODULES = ["parallel_corpus.py", "data_preparer.py", "data_normalizer.py", "scheduler.py", "tsv_writer.py", "columnar.py", "settings.py"]
+
+SPLITS = {
+    "TRAINING": "training data",
+    "VALIDATION": "validation data",
+    "VALIDATION_DEBUG": "validation debug data",
+    "TEST": "test data"
+}
+
+REQUIRED_OPTIONS = {
+    "DIRECTORIES": ["build_manifest_file", "run_report_file", "run_trace_file", "profile_data_dir"],
+    "LANGUAGE": ["source_language", "target_language"],
+    "CACHE": ["token_cache_file", "token_cache_max_entries"],
+    "TOKENIZER": ["model_dir", "cache_dir"],
+    **{section: ["source_file", "target_file", "output_file"] for section in SPLITS}
+}
+
+
+def prepare_data(data_paths: dict, language: dict, logger: Logger, args: argparse.Namespace) -> Optional[Iterable["pd.DataFrame"]]:
+    import pandas as pd
+    from data_processor.data_preparer import DataPreparer
+
+    preparer = DataPreparer(logger)
+    source_path, target_path, output_path = data_paths["source_file"], data_paths["target_file"], data_paths["output_file"]
+    source_lang, target_lang = language["source_language"], language["target_language"]
+
+    if not args.write_intermediate:
+        if args.stream:
+            return preparer.iter_batches(source_path, target_path, source_lang, target_lang, args.chunk_size)
+        train_df = preparer.prepare_dataframe(source_path, target_path, source_lang, target_lang)
+        return None if train_df is None else [train_df]
+
+    if args.stream:
+        preparer.prepare_streaming(source_path, target_path, output_path, source_lang, target_lang, args.chunk_size)
+    else:
+        preparer.prepare(source_path, target_path, output_path, source_lang, target_lang)
+    # Every cell is read back as the string that was written, so that "", "NA" or "null" do not become NaN and the data
+    # is the same as without --write-intermediate
+    read_options = {"sep": "\t", "index_col": 0, "keep_default_na": False, "na_filter": False, "dtype": {source_lang: str, target_lang: str}}
+    try:
+        if args.stream:
+            return pd.read_csv(output_path, chunksize=args.chunk_size, **read_options)
+        return [pd.read_csv(output_path, **read_options)]
+    except Exception as e:
+        logger.error(f"Failed to read the intermediate file {output_path}: {e}")
+        return None
+
+
+def output_options(args: argparse.Namespace) -> dict:
+    # The command line options that change how a split is built, the chunk size only matters when streaming
+    return {
+        "write_intermediate": args.write_intermediate,
+        "stream": args.stream,
+        "chunk_size": args.chunk_size if args.stream else None,
+        "columnar": args.columnar
+    }
+
+
+def prepare_lazily(data_paths: dict, language: dict, description: str, logger: Logger, args: argparse.Namespace) -> Iterator["pd.DataFrame"]:
+    # A split is prepared only when the scheduler starts reading it, so that one split at a time is held in memory
+    logger.info(f"Preparing {description}")
+    batches = prepare_data(data_paths, language, logger, args)
+    if batches is None:
+        raise ValueError(f"Failed to prepare the {description}")
+    yield from batches
+
+
+def split_digest(data_paths: dict, args: argparse.Namespace, logger: Logger) -> Optional[str]:
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = [data_paths["source_file"], data_paths["target_file"], CONFIG_PATH]
+    paths.extend(os.path.join(package_dir, module) for module in OUTPUT_MODULES)
+    try:
+        return inputs_digest(paths, {**normalizer_settings(), **output_options(args)})
+    except OSError as e:
+        logger.error(f"Failed to hash the inputs: {e}")
+        return None
+
+
+def is_up_to_date(section: str, digest: Optional[str], output_path: str, manifest: BuildManifest, args: argparse.Namespace) -> bool:
+    columnar_missing = args.columnar and not os.path.isdir(columnar_path(output_path))
+    return not args.force and not columnar_missing and digest is not None and manifest.is_up_to_date(section, digest, output_path)
+
+
+def check(config, manifest: BuildManifest, args: argparse.Namespace, logger: Logger) -> bool:
+    # Validates the config and the alignment of the input files and reports the splits a run would rebuild
+    if not config_loader.validate(config, REQUIRED_OPTIONS, logger):
+        return False
+    valid = True
+    try:
+        config["CACHE"].getint("token_cache_max_entries")
+    except ValueError as e:
+        logger.error(f"Invalid option token_cache_max_entries in section [CACHE] of the config: {e}")
+        valid = False
+    model_dir = config["TOKENIZER"]["model_dir"]
+    if model_dir and not os.path.isdir(model_dir):
+        logger.error(f"Tokenizer model directory {model_dir} does not exist")
+        valid = False
+
+    for section, description in SPLITS.items():
+        data_paths = config[section]
+        try:
+            with ParallelCorpus(data_paths["source_file"], data_paths["target_file"]) as corpus:
+                corpus.check_aligned()
+                pairs = len(corpus)
+        except (OSError, ValueError) as e:
+            logger.error(f"Invalid {description}: {e}")
+            valid = False
+            continue
+        output_path = data_paths["output_file"]
+        digest = split_digest(data_paths, args, logger)
+        state = "is up to date" if is_up_to_date(section, digest, output_path, manifest, args) else "would be rebuilt"
+        logger.info(f"Checked {description}: {pairs} aligned pairs, {output_path} {state}")
+    return valid
+
+
+def write_run_report(directories, args: argparse.Namespace, written: List[str], logger: Logger) -> None:
+    recorder = get_recorder()
+    try:
+        recorder.write_report(directories["run_report_file"], {"args": vars(args), "written": written})
+        logger.info(f"Run report written to {directories['run_report_file']}")
+        if args.trace:
+            recorder.write_chrome_trace(directories["run_trace_file"])
+            logger.info(f"Trace written to {directories['run_trace_file']}")
+    except OSError as e:
+        logger.error(f"Failed to write the run report: {e}")
+
+
+def write_profile(directories, profiler: Profiler, logger: Logger) -> None:
+    # Every profiled run gets its own directory, e.g. data/profile/20240101-120000-cprofile, to compare it with others
+    if profiler.mode is None:
+        return
+    directory = os.path.join(directories["profile_data_dir"], f"{time.strftime('%Y%m%d-%H%M%S')}-{profiler.mode}")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for path in profiler.write(directory):
+            logger.info(f"Profile written to {path}")
+    except OSError as e:
+        logger.error(f"Failed to write the profile: {e}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="data_processor", description="Prepare and normalize the translation datasets")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes used to normalize the splits (default: 1)")
+    parser.add_argument("--write-intermediate", action="store_true", help="write the prepared data to the output files and read it back before normalization, useful for debugging")
+    parser.add_argument("--stream", action="store_true", help="read the input files lazily and process them in fixed-size chunks to keep memory usage flat")
+    parser.add_argument("--no-token-cache", action="store_true", help="tokenize every sentence again instead of using the persistent token cache")
+    parser.add_argument("--force", action="store_true", help="rebuild every split even if its inputs did not change since the last build")
+    parser.add_argument("--columnar", action="store_true", help="also write every split as memory-mappable text and token ID arrays, and as Parquet if pyarrow is installed")
+    parser.add_argument("--trace", action="store_true", help="also write the timed steps of the run in Chrome trace format, see chrome://tracing")
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="profile every split with cProfile, a low overhead sampling profiler or tracemalloc and write the results to data/profile")
+    parser.add_argument("--check", action="store_true", help="only validate the config and the alignment of the input files and list the splits that would be rebuilt, without processing them")
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE, help=f"number of rows per chunk in streaming mode (default: {STREAM_CHUNK_SIZE})")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     logger = set_up_logger(__name__, "INFO")
 
-    config = config_loader.load("data_processor/config.ini", logger)
+    config = config_loader.load(CONFIG_PATH, logger)
+    manifest = BuildManifest(config["DIRECTORIES"]["build_manifest_file"])
+    if args.check:
+        sys.exit(0 if check(config, manifest, args, logger) else 1)
+    profiler = create_profiler(args.profile)
+
+    splits = []
+    digests = {}
+    for section, description in SPLITS.items():
+        output_path = config[section]["output_file"]
+        digest = split_digest(config[section], args, logger)
+        if is_up_to_date(section, digest, output_path, manifest, args):
+            logger.info(f"Skipping {description}, {output_path} is up to date")
+            continue
+
+        splits.append((prepare_lazily(config[section], config["LANGUAGE"], description, logger, args), output_path))
+        digests[output_path] = (section, digest)
 
-    logger.info("Processing training data")
-    process_data(config["TRAINING"], config["LANGUAGE"], logger)
+    if not splits:
+        logger.info("All the splits are up to date")
+        write_run_report(config["DIRECTORIES"], args, [], logger)
+        sys.exit(0)
 
-    logger.info("Processing validation data")
-    process_data(config["VALIDATION"], config["LANGUAGE"], logger)
+    from data_processor.scheduler import SplitScheduler
 
-    logger.info("Processing validation debug data")
-    process_data(config["VALIDATION_DEBUG"], config["LANGUAGE"], logger)
+    # An empty model_dir loads the tokenizer from the Hugging Face hub
+    configure_tokenizer(config["TOKENIZER"]["model_dir"] or None, config["TOKENIZER"]["cache_dir"])
+    logger.info(f"Normalizing data with {args.jobs} job(s)")
+    with use_profiler(profiler):
+        written = SplitScheduler(
+            logger,
+            args.jobs,
+            token_cache_path=None if args.no_token_cache else config["CACHE"]["token_cache_file"],
+            token_cache_size=config["CACHE"].getint("token_cache_max_entries"),
+            columnar=args.columnar
+        ).normalize(splits)
 
-    logger.info("Processing test data")
-    process_data(config["TEST"], config["LANGUAGE"], logger)
+    for output_path in written:
+        section, digest = digests[output_path]
+        if digest is not None:
+            manifest.record(section, digest, output_path)
+    manifest.save()
+    write_run_report(config["DIRECTORIES"], args, written, logger)
+    write_profile(config["DIRECTORIES"], profiler, logger)
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+
+FILE_READ_SIZE = 1 << 20
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(FILE_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def inputs_digest(paths: Iterable[str], settings: Dict) -> str:
+    # Combined digest of every input file and of the settings that affect the output
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(file_digest(path).encode("utf-8"))
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    __path: str
+    __entries: Dict[str, Dict[str, str]]
+
+    def __init__(self, path: str):
+        self.__path = path
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                self.__entries = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.__entries = {}
+
+    def __output_digest(self, output_path: str) -> Optional[str]:
+        try:
+            return file_digest(output_path)
+        except FileNotFoundError:
+            return None
+
+    def is_up_to_date(self, name: str, digest: str, output_path: str) -> bool:
+        # A split is rebuilt when its inputs changed or when its output was removed or edited since the last build
+        entry = self.__entries.get(name)
+        if entry is None or entry["inputs"] != digest:
+            return False
+        return entry["output"] == self.__output_digest(output_path)
+
+    def record(self, name: str, digest: str, output_path: str) -> None:
+        self.__entries[name] = {"inputs": digest, "output": self.__output_digest(output_path)}
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.__path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.__path + '.tmp'
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.__entries, file, indent=2, sort_keys=True)
+            file.write("\n")
+        os.replace(temp_path, self.__path)
@@ -0,0 +1,206 @@
+import importlib.util
+import json
+import os
+import shutil
+from array import array
+from itertools import chain
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from data_processor.instrumentation import span
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+INPUT_IDS_SUFFIX = "_input_ids"
+COLUMNAR_SUFFIX = ".columnar"
+METADATA_FILE = "metadata.json"
+PARQUET_FILE = "data.parquet"
+TEXT_DTYPE = np.uint8
+INPUT_IDS_DTYPE = np.int32
+OFFSETS_DTYPE = np.int64
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def columnar_path(output_path: str) -> str:
+    # data/output/train.tsv -> data/output/train.columnar
+    return os.path.splitext(output_path)[0] + COLUMNAR_SUFFIX
+
+
+def parquet_available() -> bool:
+    # pyarrow is optional, without it only the memory-mappable arrays are written
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def text_columns(batch: "pd.DataFrame") -> List[str]:
+    return [column for column in batch.columns if not column.endswith(INPUT_IDS_SUFFIX)]
+
+
+def _copy_to_npy(raw_path: str, npy_path: str, dtype: np.dtype) -> None:
+    # The raw values are streamed into a .npy file of the final size without holding the whole array in memory
+    count = os.path.getsize(raw_path) // np.dtype(dtype).itemsize
+    if count == 0:
+        np.save(npy_path, np.empty(0, dtype=dtype))
+        return
+    values = np.lib.format.open_memmap(npy_path, mode="w+", dtype=dtype, shape=(count,))
+    position = 0
+    with open(raw_path, "rb") as raw_file:
+        while chunk := raw_file.read(COPY_CHUNK_SIZE):
+            chunk_values = np.frombuffer(chunk, dtype=dtype)
+            values[position:position + chunk_values.shape[0]] = chunk_values
+            position += chunk_values.shape[0]
+    values.flush()
+    del values
+
+
+class ColumnarWriter:
+    # Writes a split as a directory next to its TSV file. For every language column it holds the UTF-8 text and the
+    # int32 token IDs as flat .npy arrays, each with an int64 offsets array of rows + 1 entries, so row i of a column
+    # is values[offsets[i]:offsets[i + 1]]. When pyarrow is installed the same data is also written to a Parquet file.
+    # Everything is written to a temporary directory first so that a failure never leaves a partial output behind.
+    __directory: str
+    __temp_directory: str
+    __metadata: Dict
+    __parquet: bool
+    __columns: Optional[List[str]]
+    __files: Dict
+    __offsets: Dict[str, array]
+    __parquet_writer: Optional[object]
+    __rows: int
+
+    def __init__(self, output_path: str, metadata: Optional[Dict] = None, parquet: Optional[bool] = None):
+        self.__directory = columnar_path(output_path)
+        self.__temp_directory = self.__directory + ".tmp"
+        self.__metadata = metadata or {}
+        self.__parquet = parquet_available() if parquet is None else parquet
+        self.__columns = None
+        self.__files = {}
+        self.__offsets = {}
+        self.__parquet_writer = None
+        self.__rows = 0
+
+    def __open(self, columns: List[str]) -> None:
+        shutil.rmtree(self.__temp_directory, ignore_errors=True)
+        os.makedirs(self.__temp_directory)
+        self.__columns = columns
+        for column in columns:
+            for kind in ("text", "input_ids"):
+                name = f"{column}.{kind}"
+                self.__files[name] = open(os.path.join(self.__temp_directory, name + ".bin"), "wb")
+                self.__offsets[name] = array("q", [0])
+
+    def __append(self, name: str, data: bytes, lengths: Iterable[int]) -> None:
+        self.__files[name].write(data)
+        offsets = self.__offsets[name]
+        end = offsets[-1]
+        for length in lengths:
+            end += length
+            offsets.append(end)
+
+    def __write_parquet(self, batch: "pd.DataFrame") -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({
+            **{column: pa.array(batch[column].astype(str).tolist(), type=pa.string()) for column in self.__columns},
+            **{column + INPUT_IDS_SUFFIX: pa.array(batch[column + INPUT_IDS_SUFFIX].tolist(), type=pa.list_(pa.int32()))
+               for column in self.__columns}
+        })
+        if self.__parquet_writer is None:
+            self.__parquet_writer = pq.ParquetWriter(os.path.join(self.__temp_directory, PARQUET_FILE), table.schema)
+        self.__parquet_writer.write_table(table)
+
+    def write(self, batch: "pd.DataFrame") -> None:
+        with span("write.columnar_batch", "io", path=self.__directory) as step:
+            if self.__columns is None:
+                self.__open(text_columns(batch))
+            for column in self.__columns:
+                encoded = [text.encode("utf-8") for text in batch[column].astype(str).tolist()]
+                self.__append(f"{column}.text", b"".join(encoded), map(len, encoded))
+                step.bytes_written += sum(map(len, encoded))
+
+                input_ids = batch[column + INPUT_IDS_SUFFIX].tolist()
+                lengths = list(map(len, input_ids))
+                values = np.fromiter(chain.from_iterable(input_ids), dtype=INPUT_IDS_DTYPE, count=sum(lengths))
+                self.__append(f"{column}.input_ids", values.tobytes(), lengths)
+                step.bytes_written += values.nbytes
+            if self.__parquet:
+                self.__write_parquet(batch)
+            self.__rows += batch.shape[0]
+            step.rows_in = batch.shape[0]
+
+    def passthrough(self, batches: Iterable["pd.DataFrame"]) -> Iterator["pd.DataFrame"]:
+        # Writes every batch and yields it without the token ID columns, ready for the TSV writer
+        for batch in batches:
+            self.write(batch)
+            yield batch[text_columns(batch)]
+
+    def __close_files(self) -> None:
+        for file in self.__files.values():
+            file.close()
+        if self.__parquet_writer is not None:
+            self.__parquet_writer.close()
+            self.__parquet_writer = None
+
+    def commit(self) -> str:
+        if self.__columns is None:
+            raise ValueError("No data to write")
+        self.__close_files()
+        for name, offsets in self.__offsets.items():
+            raw_path = os.path.join(self.__temp_directory, name + ".bin")
+            dtype = TEXT_DTYPE if name.endswith(".text") else INPUT_IDS_DTYPE
+            _copy_to_npy(raw_path, os.path.join(self.__temp_directory, name + ".npy"), dtype)
+            os.remove(raw_path)
+            np.save(os.path.join(self.__temp_directory, name + "_offsets.npy"), np.frombuffer(offsets, dtype=OFFSETS_DTYPE))
+
+        metadata = {**self.__metadata, "rows": self.__rows, "columns": self.__columns, "parquet": self.__parquet}
+        with open(os.path.join(self.__temp_directory, METADATA_FILE), "w", encoding="utf-8") as file:
+            json.dump(metadata, file, indent=2, sort_keys=True)
+
+        shutil.rmtree(self.__directory, ignore_errors=True)
+        os.replace(self.__temp_directory, self.__directory)
+        return self.__directory
+
+    def abort(self) -> None:
+        self.__close_files()
+        shutil.rmtree(self.__temp_directory, ignore_errors=True)
+
+
+class ColumnarDataset:
+    # Read side of ColumnarWriter, the arrays are memory-mapped so opening a split costs no parsing or tokenization
+    __directory: str
+    __metadata: Dict
+    __arrays: Dict[str, np.ndarray]
+
+    def __init__(self, path: str):
+        self.__directory = path if path.endswith(COLUMNAR_SUFFIX) else columnar_path(path)
+        with open(os.path.join(self.__directory, METADATA_FILE), "r", encoding="utf-8") as file:
+            self.__metadata = json.load(file)
+        self.__arrays = {}
+
+    @property
+    def metadata(self) -> Dict:
+        return self.__metadata
+
+    @property
+    def columns(self) -> List[str]:
+        return self.__metadata["columns"]
+
+    def __len__(self) -> int:
+        return self.__metadata["rows"]
+
+    def array(self, name: str) -> np.ndarray:
+        # e.g. "csb_Latn.input_ids" and "csb_Latn.input_ids_offsets"
+        if name not in self.__arrays:
+            self.__arrays[name] = np.load(os.path.join(self.__directory, name + ".npy"), mmap_mode="r")
+        return self.__arrays[name]
+
+    def input_ids(self, column: str, row: int) -> np.ndarray:
+        offsets = self.array(f"{column}.input_ids_offsets")
+        return self.array(f"{column}.input_ids")[offsets[row]:offsets[row + 1]]
+
+    def text(self, column: str, row: int) -> str:
+        offsets = self.array(f"{column}.text_offsets")
+        return self.array(f"{column}.text")[offsets[row]:offsets[row + 1]].tobytes().decode("utf-8")
@@ -1,5 +1,6 @@
 import configparser
 from logging import Logger
+from typing import Dict, List
 
 
 def load(path: str, logger: Logger) -> dict:
@@ -10,3 +11,23 @@ def load(path: str, logger: Logger) -> dict:
     except Exception:
         logger.error("Failed to load config")
     return config
+
+
+def validate(config: configparser.ConfigParser, required: Dict[str, List[str]], logger: Logger) -> bool:
+    # Reports every missing section or option and every option whose ${...} reference cannot be resolved
+    valid = True
+    for section, options in required.items():
+        if not config.has_section(section):
+            logger.error(f"Missing section [{section}] in the config")
+            valid = False
+            continue
+        for option in options:
+            try:
+                config.get(section, option)
+            except configparser.NoOptionError:
+                logger.error(f"Missing option {option} in section [{section}] of the config")
+                valid = False
+            except configparser.InterpolationError as e:
+                logger.error(f"Invalid option {option} in section [{section}] of the config: {e}")
+                valid = False
+    return valid
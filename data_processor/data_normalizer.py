@@ -1,72 +1,224 @@
+import os
 import re
+from functools import lru_cache
+from itertools import chain
 from logging import Logger
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from tqdm.auto import tqdm
-from transformers import NllbTokenizer
-from sacremoses import MosesPunctNormalizer
+
+from data_processor.columnar import INPUT_IDS_SUFFIX, ColumnarWriter, text_columns
+from data_processor.instrumentation import span
+from data_processor.profiling import memory_checkpoint
+from data_processor.settings import ADD_SPECIAL_TOKENS, PUNCT_NORMALIZER_LANGUAGE, normalizer_settings
+from data_processor.token_cache import TokenCache, text_key
+from data_processor.tokenizer_provider import load_tokenizer
+
+if TYPE_CHECKING:
+    from transformers import NllbTokenizerFast
+
+
+UNKNOWN_TOKEN_BATCH_SIZE = 1024
+
+
+REGEX_SPECIAL_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+class PunctNormalizer:
+    # Applies the MosesPunctNormalizer substitution chain with the patterns compiled once.
+    # Literal patterns become str.replace calls and runs of non-interacting single character
+    # literals are fused into a single str.translate pass, the result is identical to MosesPunctNormalizer.normalize.
+    __steps: List[Callable[[str], str]]
+
+    def __init__(self, lang: str = "en"):
+        # sacremoses and tqdm are imported on first use, they take a large part of the start-up time of the CLI
+        from sacremoses import MosesPunctNormalizer
+        self.__steps = self.__compile(MosesPunctNormalizer(lang=lang).substitutions)
+
+    @staticmethod
+    def __is_literal(pattern: str, substitution: str) -> bool:
+        return not REGEX_SPECIAL_CHARACTERS.intersection(pattern) and "\\" not in substitution
+
+    @staticmethod
+    def __compile(substitutions: List[Tuple[str, str]]) -> List[Callable[[str], str]]:
+        steps = []
+        translation = {}
+        for pattern, substitution in substitutions:
+            literal = PunctNormalizer.__is_literal(pattern, substitution)
+            # A character can join the current translate pass only if no earlier replacement in it produces that character
+            if literal and len(pattern) == 1 and not any(pattern in replacement for replacement in translation.values()):
+                translation.setdefault(pattern, substitution)
+                continue
+            if translation:
+                steps.append(lambda text, table=str.maketrans(translation): text.translate(table))
+                translation = {}
+            if literal and len(pattern) == 1:
+                translation[pattern] = substitution
+            elif literal:
+                steps.append(lambda text, old=pattern, new=substitution: text.replace(old, new))
+            else:
+                steps.append(lambda text, regex=re.compile(pattern), new=substitution: regex.sub(new, text))
+        if translation:
+            steps.append(lambda text, table=str.maketrans(translation): text.translate(table))
+        return steps
+
+    def normalize(self, text) -> str:
+        text = str(text)
+        for step in self.__steps:
+            text = step(text)
+        return text.strip()
+
+
+@lru_cache(maxsize=None)
+def get_punct_normalizer(lang: str = "en") -> PunctNormalizer:
+    return PunctNormalizer(lang)
 
 
 class DataNormalizer:
     __logger: Logger
+    __batch_size: int
+    __token_cache: Optional[TokenCache]
+    __keep_input_ids: bool
 
-    def __init__(self, logger):
+    def __init__(self, logger, batch_size: int = UNKNOWN_TOKEN_BATCH_SIZE, token_cache: Optional[TokenCache] = None, keep_input_ids: bool = False):
         self.__logger = logger
+        self.__batch_size = batch_size
+        self.__token_cache = token_cache
+        # The token IDs computed for the unknown token check are kept in <column>_input_ids columns of the result
+        self.__keep_input_ids = keep_input_ids
 
-    def __check_for_unknown_tokens(self, tokenizer: NllbTokenizer, train_df: pd.DataFrame) -> None:
-        try:
-            unknown_tokens = [text for text in tqdm(train_df.csb_Latn) if tokenizer.unk_token_id in tokenizer(str(text)).input_ids]
-            self.__logger.info(f"Found {len(unknown_tokens)} unknown tokens in the CSB data")
+    def __tokenize(self, tokenizer: "NllbTokenizerFast", texts: List[str]) -> List[List[int]]:
+        from tqdm.auto import tqdm
+        input_ids = []
+        for start in tqdm(range(0, len(texts), self.__batch_size)):
+            input_ids.extend(tokenizer(texts[start:start + self.__batch_size], add_special_tokens=ADD_SPECIAL_TOKENS).input_ids)
+        return input_ids
 
-            unknown_tokens = [text for text in tqdm(train_df.pol_Latn) if tokenizer.unk_token_id in tokenizer(str(text)).input_ids]
-            self.__logger.info(f"Found {len(unknown_tokens)} unknown tokens in the PL data")
-        except Exception as e:
-            self.__logger.error(f"Error during unknown token check: {str(e)}")
+    @staticmethod
+    def __find_unknown_tokens_in_input_ids(tokenizer: "NllbTokenizerFast", input_ids: List[List[int]]) -> np.ndarray:
+        lengths = np.fromiter(map(len, input_ids), dtype=np.int64, count=len(input_ids))
+        token_ids = np.fromiter(chain.from_iterable(input_ids), dtype=np.int64, count=int(lengths.sum()))
+        row_ids = np.repeat(np.arange(len(input_ids)), lengths)
+        return np.bincount(row_ids[token_ids == tokenizer.unk_token_id], minlength=len(input_ids)) > 0
+
+    def __find_unknown_tokens_with_cache(self, tokenizer: "NllbTokenizerFast", texts: List[str]) -> Tuple[np.ndarray, List[List[int]]]:
+        keys = [text_key(text) for text in texts]
+        cached = self.__token_cache.get_many(keys)
+
+        # Only the distinct texts missing from the cache are tokenized, the results are added to the cache
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        self.__logger.info(f"Token cache: {len(cached)} hits, {len(missing)} misses")
+        if missing:
+            input_ids = self.__tokenize(tokenizer, list(missing.values()))
+            unknown = self.__find_unknown_tokens_in_input_ids(tokenizer, input_ids).tolist()
+            entries = dict(zip(missing, zip(input_ids, unknown)))
+            self.__token_cache.put_many(entries)
+            cached.update(entries)
+
+        unknown = np.fromiter((cached[key][1] for key in keys), dtype=bool, count=len(keys))
+        return unknown, [cached[key][0] for key in keys]
+
+    def __find_unknown_tokens_in_column(self, tokenizer: "NllbTokenizerFast", column: pd.Series) -> Tuple[np.ndarray, List[List[int]]]:
+        texts = column.astype(str).tolist()
+        if self.__token_cache is not None:
+            return self.__find_unknown_tokens_with_cache(tokenizer, texts)
+        input_ids = self.__tokenize(tokenizer, texts)
+        return self.__find_unknown_tokens_in_input_ids(tokenizer, input_ids), input_ids
+
+    def __find_unknown_tokens(self, tokenizer: "NllbTokenizerFast", train_df: pd.DataFrame,
+                              input_ids: Optional[Dict[str, List[List[int]]]] = None) -> pd.DataFrame:
+        # Every sentence is tokenized exactly once, the resulting mask is shared by the report and the filter.
+        # The token IDs of every column are stored in input_ids if given.
+        with span("normalize.tokenize", "normalize") as step:
+            step.rows_in = step.rows_out = train_df.shape[0]
+            unknown_tokens = {}
+            for column in train_df.columns:
+                unknown_tokens[column], column_input_ids = self.__find_unknown_tokens_in_column(tokenizer, train_df[column])
+                if input_ids is not None:
+                    input_ids[column] = column_input_ids
+            return pd.DataFrame(unknown_tokens, index=train_df.index)
+
+    def __check_for_unknown_tokens(self, unknown_tokens: pd.DataFrame) -> None:
+        self.__logger.info(f"Found {unknown_tokens.csb_Latn.sum()} unknown tokens in the CSB data")
+        self.__logger.info(f"Found {unknown_tokens.pol_Latn.sum()} unknown tokens in the PL data")
+
+    @staticmethod
+    def __find_unprintable_characters(column: pd.Series) -> Dict[int, str]:
+        # ? Unsure yet about casting to string here because something somewhere in this is a float and throws an error
+        # ? Might be useful to check types first but it doesn't seem like a big deal.
+        texts = column.astype(str).tolist()
+
+        # The whole column is checked at once, only the rows of a failing column are searched for the offending character
+        if "".join(texts).isprintable():
+            return {}
+        printable = np.fromiter(map(str.isprintable, texts), dtype=bool, count=len(texts))
+        return {
+            row: next(character for character in texts[row] if not character.isprintable())
+            for row in np.flatnonzero(~printable).tolist()
+        }
+
+    def __find_unprintable_rows(self, train_df: pd.DataFrame) -> pd.Series:
+        # Reason code of the first failing cell in every row, e.g. "csb_Latn:U+200B", None for printable rows
+        reasons = np.full(train_df.shape[0], None, dtype=object)
+        for column in reversed(train_df.columns):
+            for row, character in self.__find_unprintable_characters(train_df[column]).items():
+                reasons[row] = f"{column}:U+{ord(character):04X}"
+        return pd.Series(reasons, index=train_df.index)
 
     def __remove_unprintable_rows(self, train_df: pd.DataFrame) -> pd.DataFrame:
-        def printable_filter(row: pd.Series) -> bool:
-            # ? Unsure yet about casting to string here because something somewhere in this is a float and throws an error
-            # ? Might be useful to check types first but it doesn't seem like a big deal.
-            return all(str(cell).isprintable() for cell in row)
+        with span("normalize.printable_filter", "normalize") as step:
+            reasons = self.__find_unprintable_rows(train_df)
+            unprintable = reasons.notna()
 
-        filtered_df = train_df[train_df.apply(printable_filter, axis=1)]
+            for index, reason in reasons[unprintable].items():
+                self.__logger.debug(f"Removing unprintable row {index}: {reason}")
 
-        self.__logger.info(f"Removed {train_df.shape[0] - filtered_df.shape[0]} unprintable rows")
+            filtered_df = train_df[~unprintable.to_numpy()].copy()
 
-        return filtered_df
+            self.__logger.info(f"Removed {train_df.shape[0] - filtered_df.shape[0]} unprintable rows")
 
-    def __remove_rows_with_unknown_tokens(self, tokenizer: NllbTokenizer, train_df: pd.DataFrame, train_df_col: pd.Series) -> pd.DataFrame:
-        try:
-            rows_to_drop = []
-            for id, text in enumerate(train_df_col):
-                if tokenizer.unk_token_id in tokenizer(text).input_ids:
-                    rows_to_drop.append(id)
-            train_df = train_df.drop(rows_to_drop).reset_index(drop=True)
-            return train_df
-        except Exception as e:
-            self.__logger.error(f"Error while removing rows with unknown tokens: {str(e)}")
+            step.rows_in, step.rows_out = train_df.shape[0], filtered_df.shape[0]
+            for reason, rows in reasons[unprintable].value_counts().items():
+                step.drop(f"unprintable {reason}", int(rows))
+            return filtered_df
+
+    def __remove_rows_with_unknown_tokens(self, train_df: pd.DataFrame, unknown_tokens: pd.DataFrame) -> pd.DataFrame:
+        with span("normalize.unknown_filter", "normalize") as step:
+            unknown = unknown_tokens.any(axis=1).to_numpy()
+            filtered_df = train_df[~unknown].reset_index(drop=True)
+
+            self.__logger.info(f"Removed {train_df.shape[0] - filtered_df.shape[0]} rows with unknown tokens")
+
+            # A dropped row is counted under the first column with an unknown token
+            step.rows_in, step.rows_out = train_df.shape[0], filtered_df.shape[0]
+            if unknown.any():
+                for column, rows in unknown_tokens[unknown].idxmax(axis=1).value_counts().items():
+                    step.drop(f"unknown token {column}", int(rows))
+            return filtered_df
+
+    @staticmethod
+    def __normalize_column(mpn: PunctNormalizer, column: pd.Series) -> pd.Series:
+        # Dictionary headwords repeat heavily, every distinct value is normalized once and broadcast back
+        codes, uniques = pd.factorize(column, use_na_sentinel=False)
+        normalized = np.array([mpn.normalize(text) for text in uniques], dtype=object)
+        return pd.Series(normalized[codes], index=column.index, dtype=object)
 
     def __normalize_translation_dataset(self, train_df: pd.DataFrame) -> pd.DataFrame:
         try:
-            mpn = MosesPunctNormalizer(lang="en")
-            mpn.substitutions = [
-                (re.compile(r), sub) for r, sub in mpn.substitutions
-            ]
-            source_column = train_df.columns[0]
-            target_column = train_df.columns[1]
-            train_df[source_column] = train_df[source_column].apply(mpn.normalize)
-            train_df[target_column] = train_df[target_column].apply(mpn.normalize)
-            return train_df
+            with span("normalize.punctuation", "normalize") as step:
+                step.rows_in = step.rows_out = train_df.shape[0]
+                mpn = get_punct_normalizer(PUNCT_NORMALIZER_LANGUAGE)
+                source_column = train_df.columns[0]
+                target_column = train_df.columns[1]
+                train_df[source_column] = self.__normalize_column(mpn, train_df[source_column])
+                train_df[target_column] = self.__normalize_column(mpn, train_df[target_column])
+                return train_df
         except Exception as e:
             self.__logger.error(f"Error during translation dataset normalization: {str(e)}")
 
-    def normalize(self, input_path: str, output_path: str) -> None:
+    def normalize_dataframe(self, train_df: pd.DataFrame, tokenizer: "NllbTokenizerFast") -> Optional[pd.DataFrame]:
         try:
-            tokenizer = NllbTokenizer.from_pretrained("facebook/nllb-200-distilled-600M", additional_special_tokens=["csb_Latn"])
-            train_df = pd.read_csv(input_path, sep='\t', index_col=0)
-
-            self.__check_for_unknown_tokens(tokenizer, train_df)
-
             self.__logger.info("Removing unprintable rows")
             train_df = self.__remove_unprintable_rows(train_df)
 
@@ -74,11 +226,48 @@ class DataNormalizer:
 
             train_df = self.__normalize_translation_dataset(train_df)
 
+            self.__logger.info("Checking for unknown tokens")
+            input_ids = {} if self.__keep_input_ids else None
+            unknown_tokens = self.__find_unknown_tokens(tokenizer, train_df, input_ids)
+            self.__check_for_unknown_tokens(unknown_tokens)
+            if input_ids is not None:
+                train_df = train_df.assign(**{
+                    column + INPUT_IDS_SUFFIX: pd.Series(column_input_ids, index=train_df.index, dtype=object)
+                    for column, column_input_ids in input_ids.items()
+                })
+            # The batch, its token IDs and the unknown token mask are all alive here
+            memory_checkpoint("normalize.dataframe")
+
             self.__logger.info("Removing rows with unknown tokens")
-            train_df = self.__remove_rows_with_unknown_tokens(tokenizer, train_df, train_df[train_df.columns[0]])
-            train_df = self.__remove_rows_with_unknown_tokens(tokenizer, train_df, train_df[train_df.columns[1]])
+            return self.__remove_rows_with_unknown_tokens(train_df, unknown_tokens)
+        except Exception as e:
+            self.__logger.error(f"Error during normalization process: {str(e)}")
+            return None
+
+    def normalize(self, input_path: str, output_path: str, tokenizer: Optional["NllbTokenizerFast"] = None) -> None:
+        try:
+            if tokenizer is None:
+                tokenizer = load_tokenizer()
+            with span("normalize.read_tsv", "io", path=input_path) as step:
+                train_df = pd.read_csv(input_path, sep='\t', index_col=0, keep_default_na=False, na_filter=False, dtype=str)
+                step.rows_out, step.bytes_read = train_df.shape[0], os.path.getsize(input_path)
+
+            train_df = self.normalize_dataframe(train_df, tokenizer)
+            if train_df is None:
+                return
+
+            if self.__keep_input_ids:
+                columnar_writer = ColumnarWriter(output_path, normalizer_settings())
+                try:
+                    columnar_writer.write(train_df)
+                    columnar_writer.commit()
+                except BaseException:
+                    columnar_writer.abort()
+                    raise
+                train_df = train_df[text_columns(train_df)]
 
-            self.__check_for_unknown_tokens(tokenizer, train_df)
-            train_df.to_csv(output_path, sep="\t")
+            with span("normalize.write_tsv", "io", path=output_path) as step:
+                train_df.to_csv(output_path, sep="\t")
+                step.rows_in, step.bytes_written = train_df.shape[0], os.path.getsize(output_path)
         except Exception as e:
             self.__logger.error(f"Error during normalization process: {str(e)}")
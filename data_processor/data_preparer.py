@@ -1,8 +1,16 @@
+import os
+from itertools import islice
 from logging import Logger
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
 
 import pandas as pd
 
+from data_processor.instrumentation import span
+from data_processor.parallel_corpus import ParallelCorpus, TextFile
+from data_processor.profiling import memory_checkpoint
+from data_processor.settings import STREAM_CHUNK_SIZE
+from data_processor.tsv_writer import write_batches
+
 
 class DataPreparer:
     __logger: Logger
@@ -12,8 +20,10 @@ class DataPreparer:
 
     def __read_text_file(self, filename: str) -> Optional[list]:
         try:
-            with open(filename, "r", encoding="utf-8") as file:
-                return [line.strip("\n") for line in file.readlines()]
+            with span("prepare.read_file", "io", path=str(filename)) as step, TextFile(filename) as file:
+                lines = list(file)
+                step.rows_out, step.bytes_read = len(lines), os.path.getsize(filename)
+                return lines
         except FileNotFoundError as e:
             self.__logger.error(f"File not found: {e}")
             return None
@@ -24,6 +34,14 @@ class DataPreparer:
             self.__logger.error(f"Failed to open file {filename}: {e}")
             return None
 
+    @staticmethod
+    def __iterate_line_pairs(source_path: str, target_path: str) -> Iterator[Tuple[str, str]]:
+        # The line counts come from the line indexes, so misaligned files are rejected before any line is decoded
+        with ParallelCorpus(source_path, target_path) as corpus:
+            corpus.check_aligned()
+            for source, target in corpus:
+                yield source.strip(), target.strip()
+
     def __prepare_translation_dataset(self, source_path: str, target_path: str, source_lang: str, target_lang: str) -> Optional[pd.DataFrame]:
         self.__logger.info(f"Preparing translation dataset: {source_lang} → {target_lang}")
         source_train = self.__read_text_file(source_path)
@@ -43,24 +61,65 @@ class DataPreparer:
             return None
 
         try:
-            train_data = [[source.strip(), target.strip()] for source, target in zip(source_train, target_train)]
-            train_df = pd.DataFrame(train_data, columns=[source_lang, target_lang])
+            return self.__build_dataframe(source_train, target_train, source_lang, target_lang)
         except Exception as e:
             self.__logger.error(f"Error while preparing DataFrame: {e}")
             return None
 
-        return train_df
+    @staticmethod
+    def __build_dataframe(source_train: List[str], target_train: List[str], source_lang: str, target_lang: str) -> pd.DataFrame:
+        with span("prepare.dataframe", "prepare") as step:
+            train_data = [[source.strip(), target.strip()] for source, target in zip(source_train, target_train)]
+            train_df = pd.DataFrame(train_data, columns=[source_lang, target_lang])
+            step.rows_in = step.rows_out = train_df.shape[0]
+            memory_checkpoint("prepare.dataframe")
+            return train_df
 
-    def prepare(self, source_path: str, target_path: str, output_path: str, source_lang: str, target_lang: str) -> None:
+    def iter_batches(self, source_path: str, target_path: str, source_lang: str, target_lang: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+        self.__logger.info(f"Streaming translation dataset: {source_lang} → {target_lang}")
+        pairs = self.__iterate_line_pairs(source_path, target_path)
+        start = 0
+        while True:
+            # Only reading the chunk is timed, not the work done on it by the consumer between the yields
+            with span("prepare.read_batch", "prepare") as step:
+                batch = list(islice(pairs, chunk_size))
+                step.rows_out = len(batch)
+            if not batch and start > 0:
+                return
+            batch_df = pd.DataFrame(batch, columns=[source_lang, target_lang], index=pd.RangeIndex(start, start + len(batch)))
+            memory_checkpoint("prepare.read_batch")
+            yield batch_df
+            if len(batch) < chunk_size:
+                return
+            start += chunk_size
+
+    def prepare_dataframe(self, source_path: str, target_path: str, source_lang: str, target_lang: str) -> Optional[pd.DataFrame]:
         self.__logger.info("Starting data preparation process")
 
+        train_df = self.__prepare_translation_dataset(source_path, target_path, source_lang, target_lang)
+        if train_df is None:
+            self.__logger.error("Dataset preparation failed")
+        return train_df
+
+    def prepare(self, source_path: str, target_path: str, output_path: str, source_lang: str, target_lang: str) -> None:
         try:
-            train_df = self.__prepare_translation_dataset(source_path, target_path, source_lang, target_lang)
+            train_df = self.prepare_dataframe(source_path, target_path, source_lang, target_lang)
             if train_df is None:
-                self.__logger.error("Dataset preparation failed, no output file will be written")
+                self.__logger.error("No output file will be written")
                 return
 
-            train_df.to_csv(output_path, sep="\t")
+            with span("prepare.write_tsv", "io", path=output_path) as step:
+                train_df.to_csv(output_path, sep="\t")
+                step.rows_in, step.bytes_written = train_df.shape[0], os.path.getsize(output_path)
             self.__logger.info(f"Data successfully written to {output_path}")
         except Exception as e:
             self.__logger.error(f"Failed to save the prepared data: {e}")
+
+    def prepare_streaming(self, source_path: str, target_path: str, output_path: str, source_lang: str, target_lang: str, chunk_size: int = STREAM_CHUNK_SIZE) -> None:
+        self.__logger.info("Starting streaming data preparation process")
+
+        try:
+            rows = write_batches(self.iter_batches(source_path, target_path, source_lang, target_lang, chunk_size), output_path)
+            self.__logger.info(f"{rows} rows successfully written to {output_path}")
+        except Exception as e:
+            self.__logger.error(f"Dataset preparation failed, no output file will be written: {e}")
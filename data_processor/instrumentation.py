@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+# Spans are timed with the monotonic perf_counter only. It is anchored to the wall clock once per process, so that the
+# start of a span is comparable across processes and a nested span never ends after its parent.
+_CLOCK_ORIGIN_NS = time.time_ns() - time.perf_counter_ns()
+
+
+def clock_ns() -> int:
+    return _CLOCK_ORIGIN_NS + time.perf_counter_ns()
+
+
+@dataclass
+class Span:
+    # One timed step of a run, e.g. the printable filter of a batch or a single scraper request
+    name: str
+    category: str = ""
+    start_ns: int = 0
+    duration_ns: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+    dropped: Dict[str, int] = field(default_factory=dict)
+    bytes_read: int = 0
+    bytes_written: int = 0
+    pid: int = 0
+    thread_id: int = 0
+    attributes: Dict = field(default_factory=dict)
+
+    def drop(self, reason: str, rows: int) -> None:
+        if rows:
+            self.dropped[reason] = self.dropped.get(reason, 0) + rows
+
+
+class Recorder:
+    # Collects finished spans from every thread. Spans recorded in worker processes are sent back and added here.
+    __spans: List[Span]
+    __lock: threading.Lock
+
+    def __init__(self):
+        self.__spans = []
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, category: str = "", **attributes) -> Iterator[Span]:
+        span = Span(name, category, start_ns=clock_ns(), pid=os.getpid(), thread_id=threading.get_ident(), attributes=attributes)
+        cpu_start = time.thread_time()
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            span.duration_ns = clock_ns() - span.start_ns
+            span.wall_seconds = span.duration_ns / 1e9
+            span.cpu_seconds = time.thread_time() - cpu_start
+            self.add([span])
+
+    def add(self, spans: Iterable[Span]) -> None:
+        with self.__lock:
+            self.__spans.extend(spans)
+
+    @property
+    def spans(self) -> List[Span]:
+        with self.__lock:
+            return list(self.__spans)
+
+    def summary(self) -> List[Dict]:
+        # Spans of the same name added up, in the order the steps first started
+        steps: Dict[str, Dict] = {}
+        for span in sorted(self.spans, key=lambda span: span.start_ns):
+            step = steps.setdefault(span.name, {
+                "name": span.name, "category": span.category, "count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                "rows_in": 0, "rows_out": 0, "dropped": {}, "bytes_read": 0, "bytes_written": 0, "errors": 0
+            })
+            step["count"] += 1
+            step["wall_seconds"] += span.wall_seconds
+            step["cpu_seconds"] += span.cpu_seconds
+            step["rows_in"] += span.rows_in
+            step["rows_out"] += span.rows_out
+            step["bytes_read"] += span.bytes_read
+            step["bytes_written"] += span.bytes_written
+            step["errors"] += "error" in span.attributes
+            for reason, rows in span.dropped.items():
+                step["dropped"][reason] = step["dropped"].get(reason, 0) + rows
+        for step in steps.values():
+            step["wall_seconds"] = round(step["wall_seconds"], 6)
+            step["cpu_seconds"] = round(step["cpu_seconds"], 6)
+        return list(steps.values())
+
+    def write_report(self, path: str, run: Optional[Dict] = None) -> None:
+        _write_json(path, {"run": run or {}, "steps": self.summary()})
+
+    def write_chrome_trace(self, path: str) -> None:
+        # Complete events of the Trace Event Format, open the file in chrome://tracing or https://ui.perfetto.dev
+        spans = self.spans
+        origin = min((span.start_ns for span in spans), default=0)
+        events = []
+        for span in spans:
+            span_dict = asdict(span)
+            args = {key: span_dict[key] for key in ("rows_in", "rows_out", "dropped", "bytes_read", "bytes_written", "cpu_seconds")}
+            events.append({
+                "name": span.name, "cat": span.category, "ph": "X", "pid": span.pid, "tid": span.thread_id,
+                "ts": (span.start_ns - origin) / 1000, "dur": span.duration_ns / 1000,
+                "args": {**args, **{key: str(value) for key, value in span.attributes.items()}}
+            })
+        _write_json(path, {"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+def _write_json(path: str, data: Dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+    os.replace(temp_path, path)
+
+
+_recorder = Recorder()
+
+
+def get_recorder() -> Recorder:
+    return _recorder
+
+
+@contextmanager
+def use_recorder(recorder: Recorder) -> Iterator[Recorder]:
+    # Records into another recorder for a while, e.g. to send the spans of a worker's shard back to the parent
+    global _recorder
+    previous, _recorder = _recorder, recorder
+    try:
+        yield recorder
+    finally:
+        _recorder = previous
+
+
+def span(name: str, category: str = "", **attributes):
+    return get_recorder().span(name, category, **attributes)
+
@@ -0,0 +1,217 @@
+import mmap
+import os
+import struct
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"LINEIDX1"
+INDEX_HEADER = struct.Struct("<8sQQQ")
+INDEX_DTYPE = np.dtype("<u8")
+INDEX_CHUNK_SIZE = 1 << 24
+DECODE_CHUNK_LINES = 4096
+NEWLINE = ord("\n")
+CARRIAGE_RETURN = ord("\r")
+
+
+def build_line_offsets(buffer) -> np.ndarray:
+    # Start offset of every line followed by the file size, so line i is buffer[offsets[i]:offsets[i + 1]].
+    # Lines end like in Python's text mode, at "\n", "\r\n" or a lone "\r".
+    size = len(buffer)
+    if size == 0:
+        return np.zeros(1, dtype=INDEX_DTYPE)
+    view = np.frombuffer(buffer, dtype=np.uint8)
+    ends = []
+    for start in range(0, size, INDEX_CHUNK_SIZE):
+        chunk = view[start:start + INDEX_CHUNK_SIZE]
+        terminators = np.flatnonzero(chunk == NEWLINE) + start
+        returns = np.flatnonzero(chunk == CARRIAGE_RETURN) + start
+        if returns.size:
+            # A "\r" directly followed by "\n" is part of a "\r\n" ending at the "\n"
+            lone = returns + 1 >= size
+            lone[~lone] = view[returns[~lone] + 1] != NEWLINE
+            terminators = np.union1d(terminators, returns[lone])
+        ends.append(terminators + 1)
+    del view, chunk
+    ends = np.concatenate(ends)
+    if ends.size == 0 or ends[-1] != size:
+        ends = np.append(ends, size)
+    return np.concatenate(([0], ends)).astype(INDEX_DTYPE)
+
+
+def load_cached_offsets(index_path: str, stat: os.stat_result) -> Optional[np.ndarray]:
+    # The cached index is used only if it was built for a file of the same size and modification time
+    try:
+        with open(index_path, "rb") as index_file:
+            header = index_file.read(INDEX_HEADER.size)
+        if len(header) != INDEX_HEADER.size:
+            return None
+        magic, size, mtime_ns, count = INDEX_HEADER.unpack(header)
+        if magic != INDEX_MAGIC or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+            return None
+        if os.path.getsize(index_path) != INDEX_HEADER.size + count * INDEX_DTYPE.itemsize:
+            return None
+        return np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", offset=INDEX_HEADER.size, shape=(count,))
+    except OSError:
+        return None
+
+
+def save_offsets(index_path: str, stat: os.stat_result, offsets: np.ndarray) -> None:
+    temp_path = index_path + ".tmp"
+    try:
+        with open(temp_path, "wb") as index_file:
+            index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, offsets.shape[0]))
+            index_file.write(offsets.astype(INDEX_DTYPE).tobytes())
+        os.replace(temp_path, index_path)
+    except OSError:
+        # The index is only a cache, e.g. in a read-only directory it is rebuilt every time
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def strip_line_ending(line: bytes) -> bytes:
+    if line.endswith(b"\r\n"):
+        return line[:-2]
+    if line.endswith((b"\n", b"\r")):
+        return line[:-1]
+    return line
+
+
+class TextFile:
+    # Read-only view of a UTF-8 text file as a sequence of lines without their line endings. The file is memory-mapped
+    # and only the requested lines are decoded, the line offsets are cached in <path>.idx.
+    __path: str
+    __file: Optional[object]
+    __buffer: Union[mmap.mmap, bytes]
+    __offsets: np.ndarray
+
+    def __init__(self, path: Union[str, os.PathLike], cache_index: bool = True):
+        self.__path = path = os.fspath(path)
+        self.__buffer = b""
+        self.__offsets = np.zeros(1, dtype=INDEX_DTYPE)
+        self.__file = open(path, "rb")
+        try:
+            stat = os.fstat(self.__file.fileno())
+            self.__buffer = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+            offsets = load_cached_offsets(path + INDEX_SUFFIX, stat) if cache_index else None
+            if offsets is None:
+                offsets = build_line_offsets(self.__buffer)
+                if cache_index:
+                    save_offsets(path + INDEX_SUFFIX, stat, offsets)
+            self.__offsets = offsets
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    def __len__(self) -> int:
+        return self.__offsets.shape[0] - 1
+
+    def __line_bytes(self, row: int) -> bytes:
+        return strip_line_ending(self.__buffer[int(self.__offsets[row]):int(self.__offsets[row + 1])])
+
+    def lines(self, start: int, stop: int) -> List[str]:
+        # Decodes the range at once, only a range containing "\r" line endings is split line by line
+        if stop <= start:
+            return []
+        data = self.__buffer[int(self.__offsets[start]):int(self.__offsets[stop])]
+        if b"\r" in data:
+            return [self.__line_bytes(row).decode("utf-8") for row in range(start, stop)]
+        return data.decode("utf-8").split("\n")[:stop - start]
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self.lines(start, stop)
+            return [self.__line_bytes(row).decode("utf-8") for row in range(start, stop, step)]
+        row = key + len(self) if key < 0 else key
+        if not 0 <= row < len(self):
+            raise IndexError(f"Line {key} out of range for {self.__path} with {len(self)} lines")
+        return self.__line_bytes(row).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for start in range(0, len(self), DECODE_CHUNK_LINES):
+            yield from self.lines(start, min(start + DECODE_CHUNK_LINES, len(self)))
+
+    def close(self) -> None:
+        self.__offsets = np.zeros(1, dtype=INDEX_DTYPE)
+        if isinstance(self.__buffer, mmap.mmap):
+            self.__buffer.close()
+        self.__buffer = b""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self) -> "TextFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ParallelCorpus:
+    # A pair of line aligned text files, e.g. train.pol.txt and train.csb.txt, read as (source, target) pairs.
+    # Pairs beyond the end of the shorter file are ignored, check_aligned raises if the files differ in length.
+    __source: TextFile
+    __target: TextFile
+
+    def __init__(self, source_path: Union[str, os.PathLike], target_path: Union[str, os.PathLike], cache_index: bool = True):
+        self.__source = TextFile(source_path, cache_index)
+        try:
+            self.__target = TextFile(target_path, cache_index)
+        except BaseException:
+            self.__source.close()
+            raise
+
+    @property
+    def source(self) -> TextFile:
+        return self.__source
+
+    @property
+    def target(self) -> TextFile:
+        return self.__target
+
+    def __len__(self) -> int:
+        return min(len(self.__source), len(self.__target))
+
+    def is_aligned(self) -> bool:
+        return len(self.__source) == len(self.__target)
+
+    def check_aligned(self) -> None:
+        if not self.is_aligned():
+            raise ValueError(f"Source and target files have different lengths, first divergent line: {len(self) + 1}")
+
+    def pairs(self, start: int, stop: int) -> List[Tuple[str, str]]:
+        return list(zip(self.__source.lines(start, stop), self.__target.lines(start, stop)))
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[Tuple[str, str], List[Tuple[str, str]]]:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self.pairs(start, stop)
+            return [self[row] for row in range(start, stop, step)]
+        row = key + len(self) if key < 0 else key
+        if not 0 <= row < len(self):
+            raise IndexError(f"Pair {key} out of range for a corpus of {len(self)} pairs")
+        return self.__source[row], self.__target[row]
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for start in range(0, len(self), DECODE_CHUNK_LINES):
+            stop = min(start + DECODE_CHUNK_LINES, len(self))
+            yield from zip(self.__source.lines(start, stop), self.__target.lines(start, stop))
+
+    def close(self) -> None:
+        self.__source.close()
+        self.__target.close()
+
+    def __enter__(self) -> "ParallelCorpus":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,284 @@
+import cProfile
+import linecache
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+PROFILE_MODES = ["cprofile", "sampling", "tracemalloc"]
+SAMPLING_INTERVAL = 0.01
+TRACEBACK_FRAMES = 25
+TOP_ENTRIES = 40
+# Allocations are attributed to the innermost line of these files, i.e. to DataPreparer and DataNormalizer
+ALLOCATION_SITE_FILES = ("*data_preparer.py", "*data_normalizer.py")
+
+
+def profile_name(output_path: str) -> str:
+    # data/output/train.tsv -> train
+    return os.path.splitext(os.path.basename(output_path))[0]
+
+
+class Profiler:
+    # Does nothing, used when no --profile mode is chosen. The other profilers collect their results per profiled
+    # name, e.g. per split. Results collected in worker processes are sent back to the parent and merged there.
+    mode: Optional[str] = None
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        yield
+
+    def memory_checkpoint(self, stage: str) -> None:
+        pass
+
+    def results(self) -> Dict:
+        return {}
+
+    def merge(self, results: Dict) -> None:
+        pass
+
+    def write(self, directory: str) -> List[str]:
+        return []
+
+
+class _StatsData:
+    # Raw cProfile statistics in the form pstats.Stats loads them from a profiler object
+    stats: Dict
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+class CProfileProfiler(Profiler):
+    # Deterministic profile of every function call, written as <name>.pstats for pstats or snakeviz
+    mode = "cprofile"
+    __stats: Dict[str, pstats.Stats]
+
+    def __init__(self):
+        self.__stats = {}
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.create_stats()
+            self.merge({name: profile.stats})
+
+    def results(self) -> Dict:
+        return {name: stats.stats for name, stats in self.__stats.items()}
+
+    def merge(self, results: Dict) -> None:
+        for name, stats in results.items():
+            if name in self.__stats:
+                self.__stats[name].add(_StatsData(stats))
+            else:
+                self.__stats[name] = pstats.Stats(_StatsData(stats))
+
+    def write(self, directory: str) -> List[str]:
+        paths = []
+        for name, stats in self.__stats.items():
+            stats.dump_stats(os.path.join(directory, f"{name}.pstats"))
+            with open(os.path.join(directory, f"{name}.cprofile.txt"), "w", encoding="utf-8") as file:
+                pstats.Stats(_StatsData(stats.stats), stream=file).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_ENTRIES)
+            paths.append(os.path.join(directory, f"{name}.pstats"))
+        return paths
+
+
+def collapse_stack(frame) -> str:
+    # Outermost frame first, in the collapsed format of flamegraph.pl and speedscope
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler(Profiler):
+    # A background thread records the stack of the profiled thread every interval. The profiled code is not slowed
+    # down apart from the sampling thread briefly taking the GIL, so this mode is cheap enough to leave on.
+    mode = "sampling"
+    __interval: float
+    __samples: Dict[str, Counter]
+    __lock: threading.Lock
+
+    def __init__(self, interval: float = SAMPLING_INTERVAL):
+        self.__interval = interval
+        self.__samples = {}
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        stop = threading.Event()
+        sampler = threading.Thread(target=self.__sample, args=(name, threading.get_ident(), stop), daemon=True)
+        sampler.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+
+    def __sample(self, name: str, thread_id: int, stop: threading.Event) -> None:
+        samples = Counter()
+        while not stop.wait(self.__interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                samples[collapse_stack(frame)] += 1
+            del frame
+        self.merge({name: samples})
+
+    def results(self) -> Dict:
+        with self.__lock:
+            return {name: dict(samples) for name, samples in self.__samples.items()}
+
+    def merge(self, results: Dict) -> None:
+        with self.__lock:
+            for name, samples in results.items():
+                self.__samples.setdefault(name, Counter()).update(samples)
+
+    def write(self, directory: str) -> List[str]:
+        paths = []
+        for name, samples in self.results().items():
+            samples = Counter(samples)
+            with open(os.path.join(directory, f"{name}.collapsed.txt"), "w", encoding="utf-8") as file:
+                for stack, count in samples.most_common():
+                    file.write(f"{stack} {count}\n")
+
+            # Share of the samples in which a function was running (self) or on the stack (total)
+            total = sum(samples.values())
+            own, cumulative = Counter(), Counter()
+            for stack, count in samples.items():
+                functions = stack.split(";")
+                own[functions[-1]] += count
+                for function in set(functions):
+                    cumulative[function] += count
+            with open(os.path.join(directory, f"{name}.sampling.txt"), "w", encoding="utf-8") as file:
+                file.write(f"{total} samples every {self.__interval * 1000:g} ms\n\n{'self':>7} {'total':>7}  function\n")
+                for function, count in own.most_common(TOP_ENTRIES):
+                    file.write(f"{count / total:>7.1%} {cumulative[function] / total:>7.1%}  {function}\n")
+            paths.append(os.path.join(directory, f"{name}.collapsed.txt"))
+        return paths
+
+
+def allocation_sites(snapshot: tracemalloc.Snapshot) -> List[Tuple[str, int, int, int]]:
+    # (filename, line, bytes, blocks) of the innermost DataPreparer or DataNormalizer line of the live allocations.
+    # Every distinct traceback is matched once, Snapshot.filter_traces would match every frame of every allocation.
+    matches: Dict[str, bool] = {}
+    sites: Dict[Tuple[str, int], List[int]] = {}
+    for statistic in snapshot.statistics("traceback"):
+        for frame in reversed(statistic.traceback):
+            if frame.filename not in matches:
+                matches[frame.filename] = any(fnmatch(frame.filename, pattern) for pattern in ALLOCATION_SITE_FILES)
+            if matches[frame.filename]:
+                site = sites.setdefault((frame.filename, frame.lineno), [0, 0])
+                site[0] += statistic.size
+                site[1] += statistic.count
+                break
+    return sorted(((filename, line, size, blocks) for (filename, line), (size, blocks) in sites.items()), key=lambda site: -site[2])
+
+
+class TracemallocProfiler(Profiler):
+    # Keeps the allocation sites of the largest memory checkpoint of every stage of every profiled name. The checkpoints
+    # are placed where DataPreparer and DataNormalizer hold the most data, the end of a split would miss it.
+    mode = "tracemalloc"
+    __frames: int
+    __active: List[str]
+    __results: Dict[str, Dict]
+
+    def __init__(self, frames: int = TRACEBACK_FRAMES):
+        self.__frames = frames
+        self.__active = []
+        self.__results = {}
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        # Tracing goes on until the profile is written, so the data prepared for a split is still traced while it is
+        # normalized
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.__frames)
+        tracemalloc.reset_peak()
+        self.__active.append(name)
+        try:
+            yield
+        finally:
+            self.__active.pop()
+            self.merge({name: {"peak": tracemalloc.get_traced_memory()[1], "checkpoints": {}}})
+
+    def memory_checkpoint(self, stage: str) -> None:
+        if not self.__active or not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        name = self.__active[-1]
+        previous = self.__results.get(name, {"checkpoints": {}})["checkpoints"].get(stage)
+        if previous is not None and current <= previous[0]:
+            return
+        self.merge({name: {"peak": peak, "checkpoints": {stage: (current, allocation_sites(tracemalloc.take_snapshot()))}}})
+
+    def results(self) -> Dict:
+        return {name: {"peak": result["peak"], "checkpoints": dict(result["checkpoints"])} for name, result in self.__results.items()}
+
+    def merge(self, results: Dict) -> None:
+        for name, result in results.items():
+            merged = self.__results.setdefault(name, {"peak": 0, "checkpoints": {}})
+            merged["peak"] = max(merged["peak"], result["peak"])
+            for stage, (current, sites) in result["checkpoints"].items():
+                if stage not in merged["checkpoints"] or current > merged["checkpoints"][stage][0]:
+                    merged["checkpoints"][stage] = (current, sites)
+
+    def write(self, directory: str) -> List[str]:
+        tracemalloc.stop()
+        paths = []
+        for name, result in self.__results.items():
+            path = os.path.join(directory, f"{name}.tracemalloc.txt")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(f"Peak traced memory: {result['peak'] / 2 ** 20:.1f} MiB\n")
+                for stage, (current, sites) in result["checkpoints"].items():
+                    file.write(f"\n{stage}: {current / 2 ** 20:.1f} MiB traced at the largest checkpoint\n")
+                    file.write(f"{'KiB':>10} {'blocks':>8}  allocation site\n")
+                    for filename, line, size, blocks in sites[:TOP_ENTRIES]:
+                        source = linecache.getline(filename, line).strip()
+                        file.write(f"{size / 1024:>10.1f} {blocks:>8}  {os.path.basename(filename)}:{line}  {source}\n")
+            paths.append(path)
+        return paths
+
+
+def create_profiler(mode: Optional[str]) -> Profiler:
+    profilers = {"cprofile": CProfileProfiler, "sampling": SamplingProfiler, "tracemalloc": TracemallocProfiler}
+    if mode is None:
+        return Profiler()
+    if mode not in profilers:
+        raise ValueError(f"Unknown profile mode: {mode}, expected one of {', '.join(PROFILE_MODES)}")
+    return profilers[mode]()
+
+
+_profiler = Profiler()
+
+
+def get_profiler() -> Profiler:
+    return _profiler
+
+
+@contextmanager
+def use_profiler(profiler: Profiler) -> Iterator[Profiler]:
+    global _profiler
+    previous, _profiler = _profiler, profiler
+    try:
+        yield profiler
+    finally:
+        _profiler = previous
+
+
+def memory_checkpoint(stage: str) -> None:
+    get_profiler().memory_checkpoint(stage)
@@ -0,0 +1,187 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import closing
+from multiprocessing.util import Finalize
+from logging import Logger
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from data_processor.columnar import ColumnarWriter
+from data_processor.data_normalizer import DataNormalizer, normalizer_settings
+from data_processor.instrumentation import Recorder, Span, get_recorder, span, use_recorder
+from data_processor.logger import set_up_logger
+from data_processor.profiling import create_profiler, get_profiler, profile_name, use_profiler
+from data_processor.token_cache import DEFAULT_MAX_ENTRIES, TokenCache
+from data_processor.tokenizer_provider import configure_tokenizer, get_tokenizer_provider, load_tokenizer
+from data_processor.tsv_writer import write_batches
+
+if TYPE_CHECKING:
+    from transformers import NllbTokenizerFast
+
+
+SHARD_SIZE = 10000
+# Shards submitted ahead of the one being written, per worker. Bounds the memory of a streamed split to a few shards.
+SHARDS_IN_FLIGHT_PER_JOB = 2
+
+Split = Tuple[Iterable[pd.DataFrame], str]
+
+_worker_logger: Optional[Logger] = None
+_worker_tokenizer: Optional["NllbTokenizerFast"] = None
+_worker_token_cache: Optional[TokenCache] = None
+_worker_keep_input_ids: bool = False
+_worker_profile_mode: Optional[str] = None
+
+
+def _open_token_cache(tokenizer: "NllbTokenizerFast", token_cache_path: Optional[str], token_cache_size: int,
+                      clock: Optional[int] = None) -> Optional[TokenCache]:
+    if token_cache_path is None:
+        return None
+    return TokenCache.for_tokenizer(token_cache_path, tokenizer, token_cache_size, clock)
+
+
+def _init_worker(token_cache_path: Optional[str], token_cache_size: int, keep_input_ids: bool = False, profile_mode: Optional[str] = None,
+                 tokenizer_model_dir: Optional[str] = None, tokenizer_cache_dir: Optional[str] = None,
+                 token_cache_clock: Optional[int] = None) -> None:
+    # Every worker loads the tokenizer once and reuses it for all the shards it receives, a forked worker reuses the
+    # tokenizer of its parent if it was loaded already
+    global _worker_logger, _worker_tokenizer, _worker_token_cache, _worker_keep_input_ids, _worker_profile_mode
+    _worker_logger = set_up_logger(__name__, "INFO")
+    configure_tokenizer(tokenizer_model_dir, tokenizer_cache_dir)
+    _worker_tokenizer = load_tokenizer()
+    _worker_token_cache = _open_token_cache(_worker_tokenizer, token_cache_path, token_cache_size, token_cache_clock)
+    if _worker_token_cache is not None:
+        # Worker processes exit without running atexit handlers, multiprocessing runs its own finalizers instead
+        Finalize(_worker_token_cache, _worker_token_cache.close, exitpriority=10)
+    _worker_keep_input_ids = keep_input_ids
+    _worker_profile_mode = profile_mode
+
+
+def _normalize_shard(shard: pd.DataFrame, name: str) -> Tuple[Optional[pd.DataFrame], List[Span], Dict]:
+    # The spans and profiles recorded in the worker are returned along with the result and added to the parent's
+    normalizer = DataNormalizer(_worker_logger, token_cache=_worker_token_cache, keep_input_ids=_worker_keep_input_ids)
+    with use_recorder(Recorder()) as recorder, use_profiler(create_profiler(_worker_profile_mode)) as profiler:
+        with profiler.profile(name):
+            result = normalizer.normalize_dataframe(shard, _worker_tokenizer)
+    return result, recorder.spans, profiler.results()
+
+
+def split_into_shards(train_df: pd.DataFrame, shard_size: int) -> List[pd.DataFrame]:
+    if train_df.empty:
+        return [train_df]
+    return [train_df.iloc[start:start + shard_size] for start in range(0, train_df.shape[0], shard_size)]
+
+
+def _normalize_shards(executor: ProcessPoolExecutor, batches: Iterable[pd.DataFrame], shard_size: int, name: str,
+                      max_in_flight: int) -> Iterator[Optional[pd.DataFrame]]:
+    # Reads the batches only as far as max_in_flight shards ahead of the result yielded next, results keep their order
+    in_flight: deque[Future] = deque()
+    shards = (shard for batch in batches for shard in split_into_shards(batch, shard_size))
+    try:
+        for shard in shards:
+            in_flight.append(executor.submit(_normalize_shard, shard, name))
+            if len(in_flight) >= max_in_flight:
+                yield _shard_result(in_flight.popleft())
+        while in_flight:
+            yield _shard_result(in_flight.popleft())
+    finally:
+        # A failed read or write leaves shards that nobody will collect
+        for future in in_flight:
+            future.cancel()
+
+
+def _shard_result(future: Future) -> Optional[pd.DataFrame]:
+    result, spans, profile_results = future.result()
+    get_recorder().add(spans)
+    get_profiler().merge(profile_results)
+    return result
+
+
+def _require_normalized(results: Iterable[Optional[pd.DataFrame]]) -> Iterator[pd.DataFrame]:
+    for result in results:
+        if result is None:
+            raise ValueError("Normalization of a batch failed")
+        yield result
+
+
+class SplitScheduler:
+    __logger: Logger
+    __jobs: int
+    __shard_size: int
+    __token_cache_path: Optional[str]
+    __token_cache_size: int
+    __columnar: bool
+
+    def __init__(self, logger: Logger, jobs: int = 1, shard_size: int = SHARD_SIZE, token_cache_path: Optional[str] = None, token_cache_size: int = DEFAULT_MAX_ENTRIES,
+                 columnar: bool = False):
+        self.__logger = logger
+        self.__jobs = jobs
+        self.__shard_size = shard_size
+        self.__token_cache_path = token_cache_path
+        self.__token_cache_size = token_cache_size
+        # Also write every split as text and token ID arrays next to its TSV file, see ColumnarWriter
+        self.__columnar = columnar
+
+    def __normalize_serially(self, splits: List[Split]) -> List[str]:
+        tokenizer = load_tokenizer()
+        token_cache = _open_token_cache(tokenizer, self.__token_cache_path, self.__token_cache_size)
+        written = []
+        try:
+            for batches, output_path in splits:
+                self.__logger.info(f"Normalizing data for {output_path}")
+                normalizer = DataNormalizer(self.__logger, token_cache=token_cache, keep_input_ids=self.__columnar)
+                with get_profiler().profile(profile_name(output_path)):
+                    if self.__write((normalizer.normalize_dataframe(batch, tokenizer) for batch in batches), output_path):
+                        written.append(output_path)
+        finally:
+            if token_cache is not None:
+                token_cache.close()
+        return written
+
+    def __normalize_in_parallel(self, splits: List[Split]) -> List[str]:
+        profiler = get_profiler()
+        provider = get_tokenizer_provider()
+        token_cache_clock = None
+        if self.__token_cache_path is not None:
+            # The run advances the eviction clock of the token cache once and every worker uses it
+            token_cache = _open_token_cache(load_tokenizer(), self.__token_cache_path, self.__token_cache_size)
+            token_cache_clock = token_cache.clock
+            token_cache.close()
+        initargs = (self.__token_cache_path, self.__token_cache_size, self.__columnar, profiler.mode, provider.model_dir, provider.cache_dir,
+                    token_cache_clock)
+        with ProcessPoolExecutor(max_workers=self.__jobs, initializer=_init_worker, initargs=initargs) as executor:
+            # The splits are read lazily one after another and their shards are spread across the workers, a streamed
+            # split never has more than a few shards in memory
+            written = []
+            for batches, output_path in splits:
+                name = profile_name(output_path)
+                self.__logger.info(f"Normalizing data for {output_path} in shards of {self.__shard_size} rows")
+                results = _normalize_shards(executor, batches, self.__shard_size, name, self.__jobs * SHARDS_IN_FLIGHT_PER_JOB)
+                with profiler.profile(name), closing(results):
+                    if self.__write(results, output_path):
+                        written.append(output_path)
+            return written
+
+    def __write(self, results: Iterable[Optional[pd.DataFrame]], output_path: str) -> bool:
+        columnar_writer = ColumnarWriter(output_path, normalizer_settings()) if self.__columnar else None
+        try:
+            batches = _require_normalized(results)
+            if columnar_writer is not None:
+                batches = columnar_writer.passthrough(batches)
+            rows = write_batches(batches, output_path)
+            self.__logger.info(f"{rows} rows successfully written to {output_path}")
+            if columnar_writer is not None:
+                with span("write.columnar_commit", "io", path=output_path):
+                    self.__logger.info(f"Columnar data written to {columnar_writer.commit()}")
+            return True
+        except Exception as e:
+            if columnar_writer is not None:
+                columnar_writer.abort()
+            self.__logger.error(f"Normalization failed, {output_path} will not be written: {e}")
+            return False
+
+    def normalize(self, splits: List[Split]) -> List[str]:
+        # Returns the output paths that were successfully written
+        if self.__jobs <= 1:
+            return self.__normalize_serially(splits)
+        return self.__normalize_in_parallel(splits)
@@ -0,0 +1,20 @@
+from typing import Dict
+
+
+# Kept free of pandas and transformers so that the entry point can read them without importing the ML stack
+TOKENIZER_NAME = "facebook/nllb-200-distilled-600M"
+ADDITIONAL_SPECIAL_TOKENS = ["csb_Latn"]
+PUNCT_NORMALIZER_LANGUAGE = "en"
+STREAM_CHUNK_SIZE = 10000
+# The stored token IDs are the sentence alone, without the language code and </s> the tokenizer adds by default. It
+# would add the eng_Latn code to every pol_Latn and csb_Latn sentence, a trainer adds the right codes itself.
+ADD_SPECIAL_TOKENS = False
+
+
+def normalizer_settings() -> Dict:
+    return {
+        "tokenizer": TOKENIZER_NAME,
+        "additional_special_tokens": ADDITIONAL_SPECIAL_TOKENS,
+        "punct_normalizer_language": PUNCT_NORMALIZER_LANGUAGE,
+        "add_special_tokens": ADD_SPECIAL_TOKENS
+    }
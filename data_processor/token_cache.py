@@ -0,0 +1,129 @@
+import hashlib
+import os
+import sqlite3
+from array import array
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from data_processor.settings import ADD_SPECIAL_TOKENS
+
+if TYPE_CHECKING:
+    from transformers import PreTrainedTokenizerBase
+
+
+DEFAULT_MAX_ENTRIES = 1000000
+QUERY_BATCH_SIZE = 500
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def tokenizer_fingerprint(tokenizer: "PreTrainedTokenizerBase") -> str:
+    # Everything that can change the produced token IDs, a different value invalidates the whole cache
+    fingerprint = hashlib.sha256()
+    for part in (
+        type(tokenizer).__name__,
+        tokenizer.name_or_path,
+        len(tokenizer),
+        tokenizer.unk_token_id,
+        tokenizer.all_special_tokens,
+        tokenizer.all_special_ids,
+        ADD_SPECIAL_TOKENS
+    ):
+        fingerprint.update(repr(part).encode("utf-8"))
+    backend_tokenizer = getattr(tokenizer, "backend_tokenizer", None)
+    if backend_tokenizer is not None:
+        fingerprint.update(backend_tokenizer.to_str().encode("utf-8"))
+    return fingerprint.hexdigest()
+
+
+class TokenCache:
+    __connection: sqlite3.Connection
+    __max_entries: int
+    __clock: int
+
+    def __init__(self, path: str, fingerprint: str, max_entries: int = DEFAULT_MAX_ENTRIES, clock: Optional[int] = None):
+        # Every run advances the clock that orders the entries for eviction. The worker processes of a run pass the
+        # clock their parent advanced instead of advancing it again.
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.__max_entries = max_entries
+        self.__connection = sqlite3.connect(path, timeout=60)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        with self.__connection:
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS tokens ("
+                "key BLOB PRIMARY KEY, input_ids BLOB NOT NULL, unknown INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+            )
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS tokens_last_used ON tokens (last_used)")
+
+            if self.__get_meta("fingerprint") != fingerprint:
+                self.__connection.execute("DELETE FROM tokens")
+                self.__set_meta("fingerprint", fingerprint)
+                self.__set_meta("clock", "0")
+            if clock is None:
+                clock = int(self.__get_meta("clock")) + 1
+                self.__set_meta("clock", str(clock))
+            self.__clock = clock
+
+    @classmethod
+    def for_tokenizer(cls, path: str, tokenizer: "PreTrainedTokenizerBase", max_entries: int = DEFAULT_MAX_ENTRIES,
+                      clock: Optional[int] = None) -> "TokenCache":
+        return cls(path, tokenizer_fingerprint(tokenizer), max_entries, clock)
+
+    @property
+    def clock(self) -> int:
+        return self.__clock
+
+    def __get_meta(self, name: str):
+        row = self.__connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def __set_meta(self, name: str, value: str) -> None:
+        self.__connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    @staticmethod
+    def __batched(items: List, size: int = QUERY_BATCH_SIZE) -> Iterable[List]:
+        for start in range(0, len(items), size):
+            yield items[start:start + size]
+
+    def get_many(self, keys: Iterable[bytes]) -> Dict[bytes, Tuple[List[int], bool]]:
+        keys = list(set(keys))
+        found = {}
+        with self.__connection:
+            for batch in self.__batched(keys):
+                placeholders = ",".join("?" * len(batch))
+                rows = self.__connection.execute(
+                    f"SELECT key, input_ids, unknown FROM tokens WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, input_ids, unknown in rows:
+                    found[key] = (array("i", input_ids).tolist(), bool(unknown))
+                # Entries read in this run are the most recently used ones
+                self.__connection.execute(
+                    f"UPDATE tokens SET last_used = ? WHERE key IN ({placeholders})", [self.__clock, *batch]
+                )
+        return found
+
+    def put_many(self, entries: Dict[bytes, Tuple[List[int], bool]]) -> None:
+        with self.__connection:
+            self.__connection.executemany(
+                "INSERT OR REPLACE INTO tokens (key, input_ids, unknown, last_used) VALUES (?, ?, ?, ?)",
+                ((key, array("i", input_ids).tobytes(), int(unknown), self.__clock) for key, (input_ids, unknown) in entries.items())
+            )
+            self.__evict()
+
+    def __evict(self) -> None:
+        excess = self.__connection.execute("SELECT COUNT(*) FROM tokens").fetchone()[0] - self.__max_entries
+        if excess > 0:
+            self.__connection.execute(
+                "DELETE FROM tokens WHERE key IN (SELECT key FROM tokens ORDER BY last_used, rowid LIMIT ?)", (excess,)
+            )
+
+    def __len__(self) -> int:
+        return self.__connection.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+
+    def close(self) -> None:
+        self.__connection.close()
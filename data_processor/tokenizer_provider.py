@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+from data_processor.instrumentation import span
+from data_processor.settings import ADDITIONAL_SPECIAL_TOKENS, TOKENIZER_NAME
+
+if TYPE_CHECKING:
+    from transformers import NllbTokenizerFast
+
+
+def source_fingerprint(model_dir: Optional[str]) -> Dict:
+    # Everything a serialized tokenizer is built from. A local model directory is identified by the size and
+    # modification time of its files, like the line index of a TextFile.
+    fingerprint = {"source": model_dir or TOKENIZER_NAME, "additional_special_tokens": ADDITIONAL_SPECIAL_TOKENS}
+    if model_dir is not None:
+        fingerprint["files"] = {
+            entry.name: [entry.stat().st_size, entry.stat().st_mtime_ns]
+            for entry in sorted(os.scandir(model_dir), key=lambda entry: entry.name) if entry.is_file()
+        }
+    return fingerprint
+
+
+def serialized_tokenizer_dir(cache_dir: str, model_dir: Optional[str]) -> str:
+    import tokenizers
+    import transformers
+
+    fingerprint = source_fingerprint(model_dir)
+    fingerprint["versions"] = [transformers.__version__, tokenizers.__version__]
+    digest = hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, digest[:16])
+
+
+class TokenizerProvider:
+    # Loads the NLLB fast tokenizer with the csb_Latn special token at most once and hands out the same instance to
+    # every split. The built tokenizer is serialized to <cache_dir>/<fingerprint>/tokenizer.json, later loads only parse
+    # that file. With a local model directory the hub is never contacted.
+    __model_dir: Optional[str]
+    __cache_dir: Optional[str]
+    __tokenizer: Optional["NllbTokenizerFast"]
+    __lock: threading.Lock
+
+    def __init__(self, model_dir: Optional[str] = None, cache_dir: Optional[str] = None):
+        self.__model_dir = model_dir
+        self.__cache_dir = cache_dir
+        self.__tokenizer = None
+        self.__lock = threading.Lock()
+
+    @property
+    def model_dir(self) -> Optional[str]:
+        return self.__model_dir
+
+    @property
+    def cache_dir(self) -> Optional[str]:
+        return self.__cache_dir
+
+    def get(self) -> "NllbTokenizerFast":
+        with self.__lock:
+            if self.__tokenizer is None:
+                with span("tokenizer.load", "io", path=self.__model_dir or TOKENIZER_NAME):
+                    self.__tokenizer = self.__load()
+            return self.__tokenizer
+
+    def __load(self) -> "NllbTokenizerFast":
+        from transformers import NllbTokenizerFast
+
+        serialized_dir = None if self.__cache_dir is None else serialized_tokenizer_dir(self.__cache_dir, self.__model_dir)
+        if serialized_dir is not None and os.path.isfile(os.path.join(serialized_dir, "tokenizer.json")):
+            tokenizer = NllbTokenizerFast.from_pretrained(serialized_dir, local_files_only=True)
+        else:
+            tokenizer = NllbTokenizerFast.from_pretrained(
+                self.__model_dir or TOKENIZER_NAME,
+                additional_special_tokens=ADDITIONAL_SPECIAL_TOKENS,
+                local_files_only=self.__model_dir is not None
+            )
+            if serialized_dir is not None:
+                self.__save(tokenizer, serialized_dir)
+        # The token cache fingerprint includes the name, it must not depend on where the tokenizer was loaded from
+        tokenizer.name_or_path = self.__model_dir or TOKENIZER_NAME
+        return tokenizer
+
+    @staticmethod
+    def __save(tokenizer: "NllbTokenizerFast", serialized_dir: str) -> None:
+        # Written to a temporary directory and renamed, so that worker processes loading the tokenizer at the same
+        # time never see a partial file. The cache is optional, a failure only means the next load builds it again.
+        temp_dir = None
+        try:
+            os.makedirs(os.path.dirname(serialized_dir), exist_ok=True)
+            temp_dir = tempfile.mkdtemp(dir=os.path.dirname(serialized_dir))
+            tokenizer.save_pretrained(temp_dir, legacy_format=False)
+            os.replace(temp_dir, serialized_dir)
+        except OSError:
+            if temp_dir is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+_provider = TokenizerProvider()
+
+
+def get_tokenizer_provider() -> TokenizerProvider:
+    return _provider
+
+
+def configure_tokenizer(model_dir: Optional[str] = None, cache_dir: Optional[str] = None) -> TokenizerProvider:
+    # Replaces the process-wide provider unless it already uses these settings, so that a loaded tokenizer is kept,
+    # e.g. the one a worker process inherits from its parent
+    global _provider
+    if (_provider.model_dir, _provider.cache_dir) != (model_dir, cache_dir):
+        _provider = TokenizerProvider(model_dir, cache_dir)
+    return _provider
+
+
+@contextmanager
+def use_tokenizer_provider(provider: TokenizerProvider) -> Iterator[TokenizerProvider]:
+    global _provider
+    previous, _provider = _provider, provider
+    try:
+        yield provider
+    finally:
+        _provider = previous
+
+
+def load_tokenizer() -> "NllbTokenizerFast":
+    return get_tokenizer_provider().get()
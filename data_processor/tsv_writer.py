@@ -0,0 +1,32 @@
+import os
+from typing import Iterable
+
+import pandas as pd
+
+from data_processor.instrumentation import span
+
+
+def write_batches(batches: Iterable[pd.DataFrame], output_path: str) -> int:
+    # Batches are renumbered and appended one by one, the result matches writing their concatenation at once.
+    # The data is written to a temporary file first so that a failure never leaves a partial output behind.
+    temp_path = output_path + '.tmp'
+    rows = 0
+    header_written = False
+    try:
+        with open(temp_path, "w", encoding="utf-8", newline="") as output_file:
+            for batch in batches:
+                with span("write.tsv_batch", "io", path=output_path) as step:
+                    position = output_file.tell()
+                    batch = batch.set_axis(pd.RangeIndex(rows, rows + batch.shape[0]), axis=0)
+                    batch.to_csv(output_file, sep="\t", header=not header_written)
+                    header_written = True
+                    rows += batch.shape[0]
+                    step.rows_in, step.bytes_written = batch.shape[0], output_file.tell() - position
+        if not header_written:
+            raise ValueError("No data to write")
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return rows
@@ -0,0 +1,95 @@
+import json
+import os
+from typing import Dict, Iterable, List, Optional, TextIO
+
+
+def partial_output_path(output_path: str) -> str:
+    return output_path + '.partial'
+
+
+class Checkpoint:
+    # A JSON journal of crawl progress together with the size of every output file at the moment the progress was
+    # recorded. Resuming truncates the outputs back to those sizes, so lines written after the last checkpoint are
+    # fetched and written again exactly once. Progress that only grows, like the set of words already written, goes to
+    # an append-only journal next to the checkpoint that is truncated the same way, so a commit does not rewrite it.
+    # The outputs are written to <output>.partial and replace the previous outputs only when the crawl finishes, which
+    # also removes the checkpoint. An interrupted or failing crawl leaves the files of the last finished crawl intact.
+    def __init__(self, path: str, output_paths: List[str]):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.output_paths = output_paths
+        self.files: List[TextIO] = []
+        self.journal: Optional[TextIO] = None
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        self.progress: Dict = state.get("progress", {})
+        self.offsets: Dict[str, int] = state.get("offsets", {})
+
+    def __open_truncated(self, output_path: str) -> TextIO:
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(output_path, "a", encoding="utf-8"):
+            pass
+        os.truncate(output_path, self.offsets.get(output_path, 0))
+        return open(output_path, "a", encoding="utf-8")
+
+    def open_outputs(self) -> List[TextIO]:
+        for output_path in self.output_paths:
+            self.files.append(self.__open_truncated(partial_output_path(output_path)))
+        return self.files
+
+    def open_journal(self) -> List[str]:
+        # The committed journal entries, one per line
+        self.journal = self.__open_truncated(self.journal_path)
+        with open(self.journal_path, "r", encoding="utf-8") as file:
+            return file.read().splitlines()
+
+    def commit(self, progress: Dict, journal_entries: Iterable[str] = ()) -> None:
+        if self.journal is not None:
+            self.journal.writelines(f"{entry}\n" for entry in journal_entries)
+        files = self.files + ([self.journal] if self.journal is not None else [])
+        # The outputs reach the disk before the checkpoint that points past them does
+        for file in files:
+            file.flush()
+            os.fsync(file.fileno())
+        self.progress = progress
+        self.offsets = {file.name: os.fstat(file.fileno()).st_size for file in files}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"progress": self.progress, "offsets": self.offsets}, file, indent=2, sort_keys=True)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+    def close(self) -> None:
+        for file in self.files:
+            file.close()
+        self.files = []
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def finish(self) -> None:
+        self.close()
+        for output_path in self.output_paths:
+            os.replace(partial_output_path(output_path), output_path)
+        for path in (self.path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.progress, self.offsets = {}, {}
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None and self.files:
+            self.finish()
+        else:
+            self.close()
@@ -0,0 +1,73 @@
+from typing import Any, List
+
+from scrapers.utils import send_request_with_retries, send_request_with_retries_async
+
+
+DEFAULT_BATCH_SIZE = 50
+
+
+def build_batched_query(field: str, arguments: List[str], selection: str) -> str:
+    # One aliased lookup per argument set, e.g. `e0: findKashubianEntry(id: 1) { word }`
+    lookups = "\n".join(f"  e{idx}: {field}({argument}) {{ {selection} }}" for idx, argument in enumerate(arguments))
+    return f"query Batched {{\n{lookups}\n}}"
+
+
+def entry_arguments(entry_ids: List[int]) -> List[str]:
+    return [f"id: {entry_id}" for entry_id in entry_ids]
+
+
+def page_arguments(start: int, page_count: int, limit: int) -> List[str]:
+    return [
+        f'page: {{start: {page}, limit: {limit}}}, where: {{normalizedWord: {{BY_NORMALIZED: ""}}}}'
+        for page in range(start, start + page_count)
+    ]
+
+
+class GraphQLBatcher:
+    def __init__(self, api_url: str, batch_size: int = DEFAULT_BATCH_SIZE, transport=None):
+        self.api_url = api_url
+        self.batch_size = batch_size
+        self.transport = transport
+
+    def _results(self, field: str, arguments: List[str], response) -> List[Any]:
+        if response is None:
+            raise RuntimeError(f"Batched {field} query to {self.api_url} failed")
+        data = response.json()['data']
+        return [data[f"e{idx}"] for idx in range(len(arguments))]
+
+    def _query_batch(self, field: str, arguments: List[str], selection: str) -> List[Any]:
+        query = build_batched_query(field, arguments, selection)
+        response = send_request_with_retries(self.api_url, 'post', json={'query': query}, transport=self.transport)
+        return self._results(field, arguments, response)
+
+    async def _query_batch_async(self, field: str, arguments: List[str], selection: str) -> List[Any]:
+        query = build_batched_query(field, arguments, selection)
+        response = await send_request_with_retries_async(self.api_url, 'post', json={'query': query}, transport=self.transport)
+        return self._results(field, arguments, response)
+
+    def query(self, field: str, arguments: List[str], selection: str) -> List[Any]:
+        # Folds up to batch_size lookups into every request, the results are returned in the order of arguments
+        results = []
+        for start in range(0, len(arguments), self.batch_size):
+            results.extend(self._query_batch(field, arguments[start:start + self.batch_size], selection))
+        return results
+
+    async def query_async(self, field: str, arguments: List[str], selection: str) -> List[Any]:
+        # Same as query, the requests are sent one after another without blocking the event loop
+        results = []
+        for start in range(0, len(arguments), self.batch_size):
+            results.extend(await self._query_batch_async(field, arguments[start:start + self.batch_size], selection))
+        return results
+
+    def fetch_entries(self, entry_ids: List[int], selection: str) -> List[Any]:
+        return self.query("findKashubianEntry", entry_arguments(entry_ids), selection)
+
+    async def fetch_entries_async(self, entry_ids: List[int], selection: str) -> List[Any]:
+        return await self.query_async("findKashubianEntry", entry_arguments(entry_ids), selection)
+
+    def fetch_entry_pages(self, start: int, page_count: int, limit: int, selection: str) -> List[Any]:
+        return [result['select'] for result in self.query("findAllKashubianEntries", page_arguments(start, page_count, limit), selection)]
+
+    async def fetch_entry_pages_async(self, start: int, page_count: int, limit: int, selection: str) -> List[Any]:
+        results = await self.query_async("findAllKashubianEntries", page_arguments(start, page_count, limit), selection)
+        return [result['select'] for result in results]
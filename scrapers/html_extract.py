@@ -0,0 +1,35 @@
+import importlib.util
+from typing import List, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import Tag
+
+
+TRANSLATIONS_LIST_CLASS = 'translations-list'
+
+
+def default_parser() -> str:
+    # lxml builds the tree in C and is several times faster than the pure Python html.parser, it is optional
+    return 'lxml' if importlib.util.find_spec('lxml') is not None else 'html.parser'
+
+
+HTML_PARSER = default_parser()
+
+
+def parse_only(html, strainer: SoupStrainer, parser: Optional[str] = None) -> BeautifulSoup:
+    # Only the elements matched by the strainer and their subtrees are built, the rest of the page is skipped
+    return BeautifulSoup(html, parser or HTML_PARSER, parse_only=strainer)
+
+
+def has_class(name: str):
+    # While straining the class attribute is still the raw string, it is split into a list only in the built tree
+    return lambda value: value is not None and name in value.split()
+
+
+def extract_translations(html, parser: Optional[str] = None) -> List[str]:
+    soup = parse_only(html, SoupStrainer('ul', class_=has_class(TRANSLATIONS_LIST_CLASS)), parser)
+    return [li.text.strip() for ul in soup.find_all('ul', class_=TRANSLATIONS_LIST_CLASS) for li in ul.find_all('li')]
+
+
+def extract_first_table(html, parser: Optional[str] = None) -> Optional[Tag]:
+    return parse_only(html, SoupStrainer('table'), parser).find('table')
@@ -1,66 +1,87 @@
 import string
-from bs4 import BeautifulSoup
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-from scrapers.utils import send_request_with_retries
+from data_processor.instrumentation import get_recorder
+from scrapers.checkpoint import Checkpoint
+from scrapers.html_extract import extract_translations
+from scrapers.utils import get_default_transport, send_request_with_retries
 
 suggestions_url = 'https://kaszebe.org/ajax/suggestions'
+checkpoint_path = '../data/cache/kaszebe.checkpoint.json'
+report_path = '../data/cache/kaszebe.report.json'
 word_url_prefix = 'https://kaszebe.org/pl/'
 polish_alphabet = list(string.ascii_lowercase) + ['ą', 'ć', 'ę', 'ł', 'ń', 'ó', 'ś', 'ź', 'ż']
+# The endpoint returns at most this many suggestions, a full list means the prefix has to be narrowed down
+suggestions_limit = 10
+default_workers = 8
+chunk_size_per_worker = 4
+# The queue is saved every this many chunks, a resumed crawl fetches at most that many chunks again
+chunks_per_checkpoint = 10
 
 
-def add_letter(data, letter):
-    data['q'] += letter
-
-
-def remove_last_letter(data):
-    data['q'] = data['q'][:len(data['q']) - 1]
+def fetch_suggestions(request_data, prefix):
+    response = send_request_with_retries(suggestions_url, 'post', data={**request_data, 'q': prefix})
+    if response is None:
+        raise RuntimeError(f"Fetching suggestions for {prefix} failed")
+    return response.json()
 
 
 def fetch_translations(word):
     word_url = f"{word_url_prefix}{word}"
     response = send_request_with_retries(word_url)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        translations = soup.find_all('ul', class_='translations-list')
-        results = []
-        for ul in translations:
-            results.extend([li.text.strip() for li in ul.find_all('li')])
-        return results
+    if response is not None:
+        return extract_translations(response.text)
     else:
         return ["ERROR"]
 
 
-def fetch_and_save_phrases_with_translations(request_data, pl_file, csb_file, start_letter='a'):
-    for letter in polish_alphabet:
-        if polish_alphabet.index(letter) < polish_alphabet.index(start_letter):
-            continue
-        add_letter(request_data, letter)
-        words_response = send_request_with_retries(suggestions_url, 'post', data=request_data)
-        if len(words_response.json()) < 10:
-            for word in words_response.json():
-                translations = fetch_translations(word['polish'])
+def fetch_and_save_phrases_with_translations(request_data, pl_file, csb_file, start_letter='a', checkpoint=None,
+                                             workers=default_workers):
+    # Prefixes are expanded breadth first from a queue, a chunk of them at a time across the worker pool. A prefix with
+    # a full list of suggestions is narrowed down by queueing it with every letter appended. Words are written in
+    # queue order and only the first time they are suggested. The checkpoint keeps the queue, the written words are
+    # appended to its journal.
+    progress = checkpoint.progress if checkpoint is not None else {}
+    queue = deque(progress.get("queue", polish_alphabet[polish_alphabet.index(start_letter):]))
+    seen = set(checkpoint.open_journal()) if checkpoint is not None else set()
+    unsaved_words, unsaved_chunks = [], 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while queue:
+            prefixes = [queue.popleft() for _ in range(min(len(queue), workers * chunk_size_per_worker))]
+            words = []
+            for prefix, suggestions in zip(prefixes, executor.map(partial(fetch_suggestions, request_data), prefixes)):
+                if len(suggestions) < suggestions_limit:
+                    words.extend(word['polish'] for word in suggestions)
+                else:
+                    queue.extend(prefix + letter for letter in polish_alphabet)
+            new_words = [word for word in dict.fromkeys(words) if word not in seen]
+            for word, translations in zip(new_words, executor.map(fetch_translations, new_words)):
                 for translation in translations:
-                    pl_file.write(f"{word['polish']}\n")
+                    pl_file.write(f"{word}\n")
                     csb_file.write(f"{translation}\n")
-            remove_last_letter(request_data)
-        else:
-            fetch_and_save_phrases_with_translations(request_data, pl_file, csb_file)
-            remove_last_letter(request_data)
+            seen.update(new_words)
+            unsaved_words.extend(new_words)
+            unsaved_chunks += 1
+            if checkpoint is not None and (unsaved_chunks == chunks_per_checkpoint or not queue):
+                checkpoint.commit({"queue": list(queue)}, unsaved_words)
+                unsaved_words, unsaved_chunks = [], 0
 
 
 def main():
-    pl_file = open("../data/raw/bilingual/kaszebe.pl.txt", "w")
-    csb_file = open("../data/raw/bilingual/kaszebe.csb.txt", "w")
-
     request_data = {
         'q': '',
         'l': 'pl',
     }
 
-    fetch_and_save_phrases_with_translations(request_data, pl_file, csb_file)
-
-    pl_file.close()
-    csb_file.close()
+    output_paths = ["../data/raw/bilingual/kaszebe.pl.txt", "../data/raw/bilingual/kaszebe.csb.txt"]
+    with Checkpoint(checkpoint_path, output_paths) as checkpoint:
+        pl_file, csb_file = checkpoint.open_outputs()
+        fetch_and_save_phrases_with_translations(request_data, pl_file, csb_file, checkpoint=checkpoint)
+    print(get_default_transport().stats.report())
+    get_recorder().write_report(report_path)
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,32 @@
+import json
+import os
 import re
-from typing import TextIO, List, Dict
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, TextIO, List, Dict, Optional
 
-import requests
 from urllib.parse import quote
-from bs4 import BeautifulSoup
 from bs4.element import Tag
 
-from scrapers.utils import send_request_with_retries
+from data_processor.instrumentation import get_recorder
+from scrapers.checkpoint import Checkpoint
+from scrapers.graphql_batch import DEFAULT_BATCH_SIZE, GraphQLBatcher
+from scrapers.html_extract import extract_first_table
+from scrapers.utils import get_default_transport, send_request_with_retries
 
 
 API_URL = "https://sloworz.org/api/graphql"
 POLISH_NOUN_API_URL = "https://odmiana.net/odmiana-przez-przypadki-rzeczownika-"
+PAGES_PER_REQUEST = 4
+CHECKPOINT_PATH = "../data/cache/declension.checkpoint.json"
+REPORT_PATH = "../data/cache/declension.report.json"
+DECLENSION_CACHE_PATH = "../data/cache/declensions.sqlite"
+DECLENSION_CACHE_SIZE = 10000
+
+ENTRY_SELECTION = "word variation meanings { id(orderBy: ASC) translation { polish } } partOfSpeech"
+ENTRY_IDS_SELECTION = "select { id normalizedWord(orderBy: ASC) }"
 
 
 class PolishNounDeclensionFetcher:
@@ -18,15 +34,18 @@ class PolishNounDeclensionFetcher:
         self.noun = noun.strip()
         self.url = f"{POLISH_NOUN_API_URL}{quote(self.noun)}"
 
-    def fetch_declensions(self) -> Dict:
-        response = requests.get(self.url)
-        if response.status_code != 200:
-            print(f"ERROR: Received status code {response.status_code}")
+    def fetch_declensions(self) -> Optional[Dict]:
+        # None when the request failed or the server had an error, an empty dict when the noun has no declension
+        # page or its page has no declension table
+        response = send_request_with_retries(self.url, accept_client_errors=True)
+        if response is None:
+            print(f"ERROR: Failed to fetch declensions of {self.noun}")
+            return None
+        if response.status_code >= 400:
+            print(f"ERROR: No declensions of {self.noun}, status code {response.status_code}")
             return {}
 
-        html_content = response.content
-        parsed_html = BeautifulSoup(html_content, 'html.parser')
-        declension_table = parsed_html.find('table')
+        declension_table = extract_first_table(response.content)
         if not declension_table:
             print("ERROR: Failed to find declension table in parsed HTML")
             return {}
@@ -89,11 +108,103 @@ class TextNormalizer:
         return s.strip() + '\n'
 
 
+def fetch_noun_declensions(noun: str) -> Optional[Dict]:
+    return PolishNounDeclensionFetcher(noun).fetch_declensions()
+
+
+class DeclensionCache:
+    # Declensions by noun, the most recently used ones in memory and all of them in an optional SQLite file.
+    # Nouns without a declension page or table are cached as an empty dict, so they are not requested again either. A
+    # failed request or a server error is returned as an empty dict but not cached, the next lookup requests it again.
+    def __init__(self, max_entries: int = DECLENSION_CACHE_SIZE, path: Optional[str] = None,
+                 fetch: Callable[[str], Optional[Dict]] = fetch_noun_declensions):
+        self.max_entries = max_entries
+        self.fetch = fetch
+        self.entries: OrderedDict[str, Dict] = OrderedDict()
+        self.pending: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            with self.connection:
+                self.connection.execute("CREATE TABLE IF NOT EXISTS declensions (noun TEXT PRIMARY KEY, declensions TEXT NOT NULL)")
+
+    @staticmethod
+    def key(noun: str) -> str:
+        return noun.strip()
+
+    def get(self, noun: str) -> Dict:
+        key = self.key(noun)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            # Concurrent lookups of the same noun wait for the first one instead of sending their own requests
+            future = self.pending.get(key)
+            owner = future is None
+            if owner:
+                future = self.pending[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if not owner:
+            return future.result()
+        try:
+            declensions = self._load(key)
+            if declensions is None:
+                declensions = self.fetch(key)
+                if declensions is None:
+                    future.set_result({})
+                    return {}
+                self._store(key, declensions)
+            with self.lock:
+                self.entries[key] = declensions
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            future.set_result(declensions)
+            return declensions
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.pending[key]
+
+    def _load(self, key: str) -> Optional[Dict]:
+        if self.connection is None:
+            return None
+        with self.lock:
+            row = self.connection.execute("SELECT declensions FROM declensions WHERE noun = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _store(self, key: str, declensions: Dict) -> None:
+        if self.connection is None:
+            return
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO declensions (noun, declensions) VALUES (?, ?)",
+                                    (key, json.dumps(declensions, ensure_ascii=False)))
+
+    def report(self) -> str:
+        return f"Declension cache: {self.hits} hits, {self.misses} misses"
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
 class KashubianWordProcessor:
-    def __init__(self, pl_file: TextIO, csb_file: TextIO, entry: Dict):
+    def __init__(self, pl_file: TextIO, csb_file: TextIO, entry: Dict, declension_cache: Optional[DeclensionCache] = None):
         self.pl_file = pl_file
         self.csb_file = csb_file
         self.entry = entry
+        self.declension_cache = declension_cache
 
     def save_words_and_translations(self) -> None:
         if self.entry['partOfSpeech'] != "NOUN":
@@ -109,7 +220,11 @@ class KashubianWordProcessor:
 
     def _process_polish_translations(self, polish_translations: List[str], word_meaning: str) -> None:
         for polish_translation in polish_translations:
-            declensions = PolishNounDeclensionFetcher(TextNormalizer.normalize_word(polish_translation)).fetch_declensions()
+            noun = TextNormalizer.normalize_word(polish_translation)
+            if self.declension_cache is not None:
+                declensions = self.declension_cache.get(noun)
+            else:
+                declensions = fetch_noun_declensions(noun)
             self._process_declensions(declensions, word_meaning)
 
     def _process_declensions(self, declensions: Dict, word_meaning: str) -> None:
@@ -137,60 +252,60 @@ class KashubianWordProcessor:
 
 
 class KashubianEntryFetcher:
-    def __init__(self, api_url: str):
+    def __init__(self, api_url: str, batch_size: int = DEFAULT_BATCH_SIZE):
         self.api_url = api_url
+        self.batcher = GraphQLBatcher(api_url, batch_size)
 
     def fetch_entry(self, entry_id: int) -> Dict:
-        query = f"""
-        query KashubianEntry {{
-            findKashubianEntry(id: {entry_id}) {{
-                word
-                variation
-                meanings {{
-                    id(orderBy: ASC)
-                    translation {{ polish }}
-                }}
-                partOfSpeech
-            }}
-        }}
-        """
-        response = send_request_with_retries(self.api_url, 'post', json={'query': query})
-        return response.json()['data']['findKashubianEntry']
+        return self.fetch_entries([entry_id])[0]
+
+    def fetch_entries(self, entry_ids: List[int]) -> List[Dict]:
+        return self.batcher.fetch_entries(entry_ids, ENTRY_SELECTION)
 
     def fetch_all_entries(self, start: int, limit: int) -> List[Dict]:
-        query = f"""
-        query AllKashubianEntries {{
-            findAllKashubianEntries(page: {{start: {start}, limit: {limit}}}, where: {{normalizedWord: {{BY_NORMALIZED: ""}}}}) {{
-                select {{ id normalizedWord(orderBy: ASC) }}
-            }}
-        }}
-        """
-        response = send_request_with_retries(self.api_url, 'post', json={'query': query})
-        return response.json()['data']['findAllKashubianEntries']['select']
+        return self.fetch_all_entries_pages(start, 1, limit)[0]
+
+    def fetch_all_entries_pages(self, start: int, page_count: int, limit: int) -> List[List[Dict]]:
+        return self.batcher.fetch_entry_pages(start, page_count, limit, ENTRY_IDS_SELECTION)
 
 
 class PhraseFetcher:
-    def __init__(self, pl_file: TextIO, csb_file: TextIO):
+    def __init__(self, pl_file: TextIO, csb_file: TextIO, api_url: str = API_URL, pages_per_request: int = PAGES_PER_REQUEST,
+                 checkpoint: Optional[Checkpoint] = None, declension_cache: Optional[DeclensionCache] = None):
         self.pl_file = pl_file
         self.csb_file = csb_file
-        self.entry_fetcher = KashubianEntryFetcher(API_URL)
+        self.entry_fetcher = KashubianEntryFetcher(api_url)
+        self.pages_per_request = pages_per_request
+        self.checkpoint = checkpoint
+        self.declension_cache = declension_cache or DeclensionCache()
 
     def fetch_and_save_phrases(self, start: int = 0, limit: int = 500) -> None:
-        entries = self.entry_fetcher.fetch_all_entries(start, limit)
-        while entries:
-            for entry in entries:
-                word_entry = self.entry_fetcher.fetch_entry(entry['id'])
-                processor = KashubianWordProcessor(self.pl_file, self.csb_file, word_entry)
-                processor.save_words_and_translations()
-            start += 1
-            entries = self.entry_fetcher.fetch_all_entries(start, limit)
+        if self.checkpoint is not None:
+            start = self.checkpoint.progress.get("page", start)
+        while True:
+            pages = self.entry_fetcher.fetch_all_entries_pages(start, self.pages_per_request, limit)
+            for page, entries in enumerate(pages, start):
+                if not entries:
+                    return
+                for word_entry in self.entry_fetcher.fetch_entries([entry['id'] for entry in entries]):
+                    processor = KashubianWordProcessor(self.pl_file, self.csb_file, word_entry, self.declension_cache)
+                    processor.save_words_and_translations()
+                if self.checkpoint is not None:
+                    self.checkpoint.commit({"page": page + 1})
+            start += len(pages)
 
 
 def main():
-    with open("../data/raw/bilingual/declension.pl.txt", "w", encoding="utf-8") as pl_file, \
-            open("../data/raw/bilingual/declension.csb.txt", "w", encoding="utf-8") as csb_file:
-        fetcher = PhraseFetcher(pl_file, csb_file)
+    output_paths = ["../data/raw/bilingual/declension.pl.txt", "../data/raw/bilingual/declension.csb.txt"]
+    declension_cache = DeclensionCache(path=DECLENSION_CACHE_PATH)
+    with Checkpoint(CHECKPOINT_PATH, output_paths) as checkpoint:
+        pl_file, csb_file = checkpoint.open_outputs()
+        fetcher = PhraseFetcher(pl_file, csb_file, checkpoint=checkpoint, declension_cache=declension_cache)
         fetcher.fetch_and_save_phrases()
+    print(declension_cache.report())
+    declension_cache.close()
+    print(get_default_transport().stats.report())
+    get_recorder().write_report(REPORT_PATH)
 
 
 if __name__ == "__main__":
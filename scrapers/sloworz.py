@@ -1,7 +1,18 @@
+import asyncio
 import re
-from scrapers.utils import send_request_with_retries
+from data_processor.instrumentation import get_recorder
+from scrapers.checkpoint import Checkpoint
+from scrapers.graphql_batch import DEFAULT_BATCH_SIZE, GraphQLBatcher
+from scrapers.utils import Transport
 
 api_url = "https://sloworz.org/api/graphql"
+default_concurrency = 8
+default_pages_per_request = 4
+checkpoint_path = "../data/cache/sloworz.checkpoint.json"
+report_path = "../data/cache/sloworz.report.json"
+
+entry_selection = "word meanings { id(orderBy: ASC) translation { polish } examples { example } }"
+entry_ids_selection = "select { id normalizedWord(orderBy: ASC) }"
 
 
 def process_word(s):
@@ -17,28 +28,7 @@ def process_word(s):
     return s.strip() + '\n'
 
 
-def find_kashubian_entry(pl_file, csb_file, csb_sentences_file, entry_id):
-    find_kashubian_entry_query = \
-        f"""
-        query KashubianEntry {{
-          findKashubianEntry(id: {entry_id})
-          {{
-            word
-            meanings
-            {{
-              id(orderBy: ASC)
-              translation {{
-                polish
-              }}
-              examples {{
-                example
-              }}
-            }}
-          }}
-        }}
-        """
-    response = send_request_with_retries(api_url, 'post', json={'query': find_kashubian_entry_query})
-    entry = response.json()['data']['findKashubianEntry']
+def save_kashubian_entry(pl_file, csb_file, csb_sentences_file, entry):
     kashubian_words = [part.strip() for part in entry['word'].split('/')]
     meanings = entry['meanings']
     for meaning in meanings:
@@ -52,45 +42,72 @@ def find_kashubian_entry(pl_file, csb_file, csb_sentences_file, entry_id):
             csb_sentences_file.write(f"{example_json['example']}\n")
 
 
-def find_all_kashubian_entries(pl_file, csb_file, csb_sentences_file, start, limit):
-    find_all_kashubian_entries_query = \
-        f"""
-        query AllKashubianEntries {{
-          findAllKashubianEntries(
-            page: {{start: {start}, limit: {limit}}}
-            where: {{normalizedWord: {{BY_NORMALIZED: ""}}}}
-          ) {{
-            select {{
-              id
-              normalizedWord(orderBy: ASC)
-            }}
-          }}
-        }}
-        """
-    response = send_request_with_retries(api_url, 'post', json={'query': find_all_kashubian_entries_query})
-    entries = response.json()['data']['findAllKashubianEntries']['select']
-    for entry in entries:
-        find_kashubian_entry(pl_file, csb_file, csb_sentences_file, entry['id'])
-    return len(entries)
-
-
-def fetch_and_save_phrases_with_translations(pl_file, csb_file, csb_sentences_file, start=0, limit=500):
-    entries_num = find_all_kashubian_entries(pl_file, csb_file, csb_sentences_file, start, limit)
-    while entries_num > 0:
-        start += 1
-        entries_num = find_all_kashubian_entries(pl_file, csb_file, csb_sentences_file, start, limit)
+async def fetch_kashubian_entry_id_pages_async(start, page_count, limit, batcher):
+    pages = await batcher.fetch_entry_pages_async(start, page_count, limit, entry_ids_selection)
+    return [[entry['id'] for entry in page] for page in pages]
+
+
+async def fetch_kashubian_entries_async(entry_ids, batcher, semaphore):
+    async def fetch(batch):
+        async with semaphore:
+            return await batcher.fetch_entries_async(batch, entry_selection)
+
+    batches = [entry_ids[idx:idx + batcher.batch_size] for idx in range(0, len(entry_ids), batcher.batch_size)]
+    # gather keeps the results in the order of entry_ids, whatever order the responses arrive in
+    return [entry for batch in await asyncio.gather(*(fetch(batch) for batch in batches)) for entry in batch]
+
+
+async def fetch_and_save_phrases_with_translations_async(pl_file, csb_file, csb_sentences_file, start=0, limit=500,
+                                                         concurrency=default_concurrency, batch_size=DEFAULT_BATCH_SIZE,
+                                                         pages_per_request=default_pages_per_request, url=api_url,
+                                                         transport=None, checkpoint=None):
+    # At most `concurrency` requests are in flight at once, all of them sharing one pool of keep-alive connections.
+    # Every request folds batch_size entry lookups, or pages_per_request pages of entry IDs, into one GraphQL document.
+    # With a checkpoint the crawl resumes from the first page that was not saved completely.
+    if checkpoint is not None:
+        start = checkpoint.progress.get("page", start)
+    own_transport = transport is None
+    transport = transport or Transport(pool_size=concurrency)
+    batcher = GraphQLBatcher(url, batch_size, transport)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def fetch_pages(first_page):
+        return asyncio.create_task(fetch_kashubian_entry_id_pages_async(first_page, pages_per_request, limit, batcher))
+
+    try:
+        next_pages = fetch_pages(start)
+        while next_pages is not None:
+            pages = await next_pages
+            page = start
+            start += pages_per_request
+            # The next pages of IDs are fetched while the entries of the current ones are downloaded
+            next_pages = fetch_pages(start) if all(pages) else None
+            for entry_ids in pages:
+                if not entry_ids:
+                    break
+                for entry in await fetch_kashubian_entries_async(entry_ids, batcher, semaphore):
+                    save_kashubian_entry(pl_file, csb_file, csb_sentences_file, entry)
+                page += 1
+                if checkpoint is not None:
+                    checkpoint.commit({"page": page})
+    finally:
+        print(transport.stats.report())
+        if own_transport:
+            transport.close()
 
 
 def main():
-    pl_file = open("../data/raw/bilingual/sloworz.pl.txt", "a")
-    csb_file = open("../data/raw/bilingual/sloworz.csb.txt", "a")
-    csb_sentences_file = open("../data/raw/kashubian_only/sloworz.sentences.csb.txt", "a")
-
-    fetch_and_save_phrases_with_translations(pl_file, csb_file, csb_sentences_file)
-
-    pl_file.close()
-    csb_file.close()
-    csb_sentences_file.close()
-
-
-main()
+    output_paths = [
+        "../data/raw/bilingual/sloworz.pl.txt",
+        "../data/raw/bilingual/sloworz.csb.txt",
+        "../data/raw/kashubian_only/sloworz.sentences.csb.txt"
+    ]
+    with Checkpoint(checkpoint_path, output_paths) as checkpoint:
+        pl_file, csb_file, csb_sentences_file = checkpoint.open_outputs()
+        asyncio.run(fetch_and_save_phrases_with_translations_async(pl_file, csb_file, csb_sentences_file,
+                                                                   checkpoint=checkpoint))
+    get_recorder().write_report(report_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,242 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
 import requests
-from typing import Optional
-from time import sleep
+from requests.adapters import HTTPAdapter
+
+from data_processor.instrumentation import span
+
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 6
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 10
+TIMEOUT = 60
+# Client errors other than these will not go away by asking again
+RETRYABLE_CLIENT_ERRORS = (408, 425, 429)
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE) -> requests.Session:
+    # Keep-alive connections are reused across requests, up to pool_size of them per host
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        # Takes a token and returns how long the caller has to wait before using it, tokens may go into debt
+        # so that concurrent callers queue up one interval apart instead of all waking up at the same time
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
 
+class RequestStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.retries = 0
+        self.failures = 0
 
-def send_request(url, method, data, json, attempt):
+    def record_attempt(self, latency: float) -> None:
+        with self.lock:
+            self.latencies.append(latency)
+
+    def record_retry(self) -> None:
+        with self.lock:
+            self.retries += 1
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+
+    def summary(self) -> Dict:
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {"requests": 0, "retries": self.retries, "failures": self.failures}
+        return {
+            "requests": len(latencies),
+            "retries": self.retries,
+            "failures": self.failures,
+            "latency_mean": sum(latencies) / len(latencies),
+            "latency_p50": latencies[len(latencies) // 2],
+            "latency_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        }
+
+    def report(self) -> str:
+        summary = self.summary()
+        report = f"{summary['requests']} requests sent, {summary['retries']} retries, {summary['failures']} failures"
+        if summary['requests']:
+            report += (f", latency mean {summary['latency_mean']:.3f}s, p50 {summary['latency_p50']:.3f}s, "
+                       f"p95 {summary['latency_p95']:.3f}s")
+        return report
+
+
+def retry_after_delay(response: requests.Response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
     try:
-        if method == 'post':
-            response = requests.post(url, data=data, json=json)
-        elif method == 'get':
-            response = requests.get(url)
-        else:
-            print("Method not implemented")
-            return None
-        if 200 <= response.status_code < 300:
-            return response
-        print(f"Attempt {attempt} failed: Unsuccessful status code {response.status_code}\n"
-              f"Response JSON body: {response.json()}\n")
-    except requests.RequestException as e:
-        print(f"Attempt {attempt} failed: Request failed: {e}\n")
-    return None
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
 
-def send_request_with_retries(url, method='get', data=None, json=None, retries=6, delay=10) -> Optional[requests.Response]:
-    print(f"Sending {method.upper()} request to {url}\n")
-    for idx in range(retries):
-        response = send_request(url, method, data, json, idx + 1)
+def is_permanent_client_error(response: Optional[requests.Response], retryable: bool) -> bool:
+    return response is not None and not retryable and 400 <= response.status_code < 500
+
+
+class Transport:
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.session = create_session(pool_size)
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.buckets_lock = threading.Lock()
+        self.stats = RequestStats()
+
+    def bucket_wait(self, url: str) -> float:
+        if not self.rate:
+            return 0.0
+        host = urlsplit(url).netloc
+        with self.buckets_lock:
+            bucket = self.buckets.setdefault(host, TokenBucket(self.rate, self.burst))
+        return bucket.reserve()
+
+    def backoff_delay(self, attempt: int, response: Optional[requests.Response], delay: Optional[float] = None) -> float:
+        # A fixed delay given by the caller replaces the backoff policy
+        if delay is not None:
+            return delay
         if response is not None:
+            delay = retry_after_delay(response)
+            if delay is not None:
+                return min(delay, self.max_delay)
+        # Full jitter keeps clients that failed together from retrying together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def send(self, url, method, data, json, attempt):
+        # Returns the response and whether it is worth retrying
+        start = time.perf_counter()
+        with span("scraper.request", "http", method=method, host=urlsplit(url).netloc, attempt=attempt) as request_span:
+            try:
+                if method == 'post':
+                    response = self.session.post(url, data=data, json=json, timeout=TIMEOUT)
+                elif method == 'get':
+                    response = self.session.get(url, timeout=TIMEOUT)
+                else:
+                    print("Method not implemented")
+                    return None, False
+            except requests.RequestException as e:
+                print(f"Attempt {attempt} failed: Request failed: {e}\n")
+                request_span.attributes["error"] = type(e).__name__
+                return None, True
+            finally:
+                self.stats.record_attempt(time.perf_counter() - start)
+            request_span.attributes["status"] = response.status_code
+            request_span.bytes_read = len(response.content)
+            request_span.bytes_written = len(response.request.body or b"") if response.request is not None else 0
+        if 200 <= response.status_code < 300:
+            return response, False
+        print(f"Attempt {attempt} failed: Unsuccessful status code {response.status_code}\n")
+        return response, response.status_code >= 500 or response.status_code in RETRYABLE_CLIENT_ERRORS
+
+    def request(self, url, method='get', data=None, json=None, retries=None, delay=None,
+                accept_client_errors=False) -> Optional[requests.Response]:
+        # retries and delay override the attempts and the backoff of the transport for this request. With
+        # accept_client_errors, a client error that asking again will not fix is returned instead of None, so that the
+        # caller can tell a missing page from a failed request.
+        retries = retries or self.retries
+        print(f"Sending {method.upper()} request to {url}\n")
+        for attempt in range(1, retries + 1):
+            time.sleep(self.bucket_wait(url))
+            response, retryable = self.send(url, method, data, json, attempt)
+            if response is not None and 200 <= response.status_code < 300:
+                return response
+            if not retryable or attempt == retries:
+                break
+            wait = self.backoff_delay(attempt, response, delay)
+            self.stats.record_retry()
+            print(f"Retrying in {wait:.1f} seconds...\n")
+            time.sleep(wait)
+        self.stats.record_failure()
+        print("Request failed, giving up\n")
+        if accept_client_errors and is_permanent_client_error(response, retryable):
+            return response
+        return None
+
+    async def request_async(self, url, method='get', data=None, json=None, retries=None, delay=None,
+                            accept_client_errors=False) -> Optional[requests.Response]:
+        # Same policy as request, but waiting happens on the event loop and only the blocking send runs in a thread
+        retries = retries or self.retries
+        print(f"Sending {method.upper()} request to {url}\n")
+        for attempt in range(1, retries + 1):
+            await asyncio.sleep(self.bucket_wait(url))
+            response, retryable = await asyncio.to_thread(self.send, url, method, data, json, attempt)
+            if response is not None and 200 <= response.status_code < 300:
+                return response
+            if not retryable or attempt == retries:
+                break
+            wait = self.backoff_delay(attempt, response, delay)
+            self.stats.record_retry()
+            print(f"Retrying in {wait:.1f} seconds...\n")
+            await asyncio.sleep(wait)
+        self.stats.record_failure()
+        print("Request failed, giving up\n")
+        if accept_client_errors and is_permanent_client_error(response, retryable):
             return response
-        print(f"Retrying in {delay} seconds...\n")
-        sleep(delay)
-    print("Maximum number of retries exceeded\n")
-    return None
+        return None
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_default_transport: Optional[Transport] = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport() -> Transport:
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = Transport()
+        return _default_transport
+
+
+def send_request_with_retries(url, method='get', data=None, json=None, retries=None, delay=None, transport=None,
+                              accept_client_errors=False) -> Optional[requests.Response]:
+    return (transport or get_default_transport()).request(url, method, data, json, retries, delay, accept_client_errors)
+
+
+async def send_request_with_retries_async(url, method='get', data=None, json=None, retries=None, delay=None, transport=None,
+                                          accept_client_errors=False) -> Optional[requests.Response]:
+    return await (transport or get_default_transport()).request_async(url, method, data, json, retries, delay,
+                                                                      accept_client_errors)
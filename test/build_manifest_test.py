@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from data_processor.build_manifest import BuildManifest, inputs_digest
+
+
+@pytest.fixture(name="create_temp_file")
+def create_temp_file_fixture(tmp_path: Path) -> Callable[[str, str], str]:
+    def _create_temp_file(filename: str, content: str) -> str:
+        file_path = tmp_path / filename
+        file_path.write_text(content, encoding="utf-8")
+        return str(file_path)
+    return _create_temp_file
+
+
+def test_inputs_digest_changes_with_content_and_settings(create_temp_file) -> None:
+    source_path = create_temp_file("source.txt", "a\n")
+    digest = inputs_digest([source_path], {"tokenizer": "a"})
+
+    assert inputs_digest([source_path], {"tokenizer": "a"}) == digest
+    assert inputs_digest([source_path], {"tokenizer": "b"}) != digest
+    create_temp_file("source.txt", "b\n")
+    assert inputs_digest([source_path], {"tokenizer": "a"}) != digest
+
+
+def test_is_up_to_date_returns_true_after_record_and_save(tmp_path: Path, create_temp_file) -> None:
+    output_path = create_temp_file("train.tsv", "output")
+    manifest = BuildManifest(str(tmp_path / "manifest.json"))
+    manifest.record("TRAINING", "digest", output_path)
+    manifest.save()
+
+    manifest = BuildManifest(str(tmp_path / "manifest.json"))
+
+    assert manifest.is_up_to_date("TRAINING", "digest", output_path)
+    assert not manifest.is_up_to_date("TRAINING", "changed digest", output_path)
+    assert not manifest.is_up_to_date("TEST", "digest", output_path)
+
+
+@pytest.mark.parametrize(
+    "change_output",
+    [
+        # test case 1: output edited by hand
+        lambda path: Path(path).write_text("edited", encoding="utf-8"),
+        # test case 2: output removed
+        lambda path: Path(path).unlink(),
+    ]
+)
+def test_is_up_to_date_returns_false_when_output_changed(tmp_path: Path, create_temp_file, change_output: Callable[[str], None]) -> None:
+    output_path = create_temp_file("train.tsv", "output")
+    manifest = BuildManifest(str(tmp_path / "manifest.json"))
+    manifest.record("TRAINING", "digest", output_path)
+
+    change_output(output_path)
+
+    assert not manifest.is_up_to_date("TRAINING", "digest", output_path)
+
+
+def test_manifest_ignores_corrupted_file(create_temp_file) -> None:
+    manifest = BuildManifest(create_temp_file("manifest.json", "{"))
+
+    assert not manifest.is_up_to_date("TRAINING", "digest", "train.tsv")
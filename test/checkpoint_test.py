@@ -0,0 +1,178 @@
+import asyncio
+import json
+from contextlib import nullcontext
+from pathlib import Path
+from typing import List
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from scrapers import kaszebe, sloworz
+from scrapers.checkpoint import Checkpoint, partial_output_path
+from scrapers.noun_declension import PhraseFetcher, PolishNounDeclensionFetcher
+from test.conftest import StubGraphQLServer
+
+
+def read_outputs(paths: List[str]) -> List[str]:
+    return [Path(path).read_text(encoding="utf-8") for path in paths]
+
+
+def interrupt_after(mocker: MockerFixture, target, calls: int) -> None:
+    original = getattr(target[0], target[1])
+    count = {"calls": 0}
+
+    def wrapper(*args, **kwargs):
+        count["calls"] += 1
+        if count["calls"] > calls:
+            raise KeyboardInterrupt
+        return original(*args, **kwargs)
+
+    mocker.patch.object(target[0], target[1], side_effect=wrapper)
+
+
+def test_open_outputs_truncates_lines_written_after_last_commit(tmp_path: Path) -> None:
+    output_path = str(tmp_path / "out.txt")
+    with pytest.raises(KeyboardInterrupt), Checkpoint(str(tmp_path / "checkpoint.json"), [output_path]) as checkpoint:
+        output_file, = checkpoint.open_outputs()
+        output_file.write("kept\n")
+        checkpoint.commit({"page": 1})
+        output_file.write("discarded\n")
+        raise KeyboardInterrupt
+
+    with Checkpoint(str(tmp_path / "checkpoint.json"), [output_path]) as checkpoint:
+        checkpoint.open_outputs()
+
+        assert checkpoint.progress == {"page": 1}
+    assert read_outputs([output_path]) == ["kept\n"]
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def test_open_outputs_keeps_previous_outputs_until_crawl_finishes(tmp_path: Path) -> None:
+    output_path = tmp_path / "out.txt"
+    output_path.write_text("previous\n", encoding="utf-8")
+
+    for interrupted in (True, False):
+        with pytest.raises(KeyboardInterrupt) if interrupted else nullcontext():
+            with Checkpoint(str(tmp_path / "checkpoint.json"), [str(output_path)]) as checkpoint:
+                output_file, = checkpoint.open_outputs()
+                output_file.write("new\n")
+                if interrupted:
+                    raise KeyboardInterrupt
+        if interrupted:
+            assert output_path.read_text(encoding="utf-8") == "previous\n"
+
+    assert output_path.read_text(encoding="utf-8") == "new\n"
+    assert not Path(partial_output_path(str(output_path))).exists()
+
+
+def test_sloworz_resumes_without_duplicates(tmp_path: Path, stub_server: StubGraphQLServer, mocker: MockerFixture) -> None:
+    output_paths = [str(tmp_path / name) for name in ("pl.txt", "csb.txt", "sentences.txt")]
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    def crawl() -> None:
+        with Checkpoint(checkpoint_path, output_paths) as checkpoint:
+            asyncio.run(sloworz.fetch_and_save_phrases_with_translations_async(
+                *checkpoint.open_outputs(), limit=5, pages_per_request=2, url=stub_server.url, checkpoint=checkpoint
+            ))
+
+    crawl()
+    expected = read_outputs(output_paths)
+    assert not Path(checkpoint_path).exists()
+
+    interrupt_after(mocker, (sloworz, "save_kashubian_entry"), 12)
+    with pytest.raises(KeyboardInterrupt):
+        crawl()
+    assert json.loads(Path(checkpoint_path).read_text(encoding="utf-8"))["progress"] == {"page": 2}
+    # The outputs of the finished crawl are only replaced when the resumed crawl finishes
+    assert read_outputs(output_paths) == expected
+    mocker.stopall()
+    requests_before_resume = stub_server.requests
+    crawl()
+
+    assert read_outputs(output_paths) == expected
+    # Pages 0 and 1 are not listed or fetched again, two requests list pages 2 to 5 and three fetch their entries
+    assert stub_server.requests - requests_before_resume == 2 + 3
+
+
+def test_phrase_fetcher_resumes_without_duplicates(tmp_path: Path, stub_server: StubGraphQLServer, mocker: MockerFixture) -> None:
+    mocker.patch.object(PolishNounDeclensionFetcher, "fetch_declensions", return_value={"nounVariation": {"genitive": "słowa"}})
+    output_paths = [str(tmp_path / "pl.txt"), str(tmp_path / "csb.txt")]
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    def crawl() -> None:
+        with Checkpoint(checkpoint_path, output_paths) as checkpoint:
+            PhraseFetcher(*checkpoint.open_outputs(), api_url=stub_server.url, checkpoint=checkpoint).fetch_and_save_phrases(limit=10)
+
+    crawl()
+    expected = read_outputs(output_paths)
+    assert not Path(checkpoint_path).exists()
+
+    interrupt_after(mocker, (PolishNounDeclensionFetcher, "fetch_declensions"), 25)
+    with pytest.raises(KeyboardInterrupt):
+        crawl()
+    mocker.patch.object(PolishNounDeclensionFetcher, "fetch_declensions", return_value={"nounVariation": {"genitive": "słowa"}})
+    crawl()
+
+    assert read_outputs(output_paths) == expected
+
+
+def test_kaszebe_resumes_without_refetching_completed_prefixes(tmp_path: Path, mocker: MockerFixture) -> None:
+    mocker.patch.object(kaszebe, "polish_alphabet", ["a", "b", "c"])
+    mocker.patch.object(kaszebe, "chunk_size_per_worker", 1)
+    mocker.patch.object(kaszebe, "chunks_per_checkpoint", 1)
+    mocker.patch.object(kaszebe, "fetch_translations", side_effect=lambda word: [f"{word}-csb"])
+    queried_prefixes = []
+
+    def suggestions(request_data, prefix):
+        queried_prefixes.append(prefix)
+        # Single letters have too many suggestions and are expanded into two letter prefixes
+        return [{"polish": f"{prefix}{idx}"} for idx in range(10 if len(prefix) == 1 else 1)]
+
+    mocker.patch.object(kaszebe, "fetch_suggestions", side_effect=suggestions)
+    output_paths = [str(tmp_path / "pl.txt"), str(tmp_path / "csb.txt")]
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    def crawl() -> None:
+        with Checkpoint(checkpoint_path, output_paths) as checkpoint:
+            kaszebe.fetch_and_save_phrases_with_translations({'l': 'pl'}, *checkpoint.open_outputs(), checkpoint=checkpoint, workers=2)
+
+    crawl()
+    expected = read_outputs(output_paths)
+    assert not Path(checkpoint_path).exists()
+    interrupt_after(mocker, (kaszebe, "fetch_translations"), 3)
+    with pytest.raises(KeyboardInterrupt):
+        crawl()
+    mocker.patch.object(kaszebe, "fetch_translations", side_effect=lambda word: [f"{word}-csb"])
+    queried_prefixes.clear()
+    crawl()
+
+    assert read_outputs(output_paths) == expected
+    # Chunks of two prefixes: a b, c aa, ab ac, ba bb ... the fourth word, in the chunk of ba and bb, was interrupted
+    assert queried_prefixes == ["ba", "bb", "bc", "ca", "cb", "cc"]
+
+
+def test_kaszebe_journals_written_words_instead_of_rewriting_them(tmp_path: Path, mocker: MockerFixture) -> None:
+    mocker.patch.object(kaszebe, "polish_alphabet", ["a", "b", "c"])
+    mocker.patch.object(kaszebe, "chunk_size_per_worker", 1)
+    mocker.patch.object(kaszebe, "chunks_per_checkpoint", 2)
+    mocker.patch.object(kaszebe, "fetch_translations", side_effect=lambda word: [f"{word}-csb"])
+    mocker.patch.object(kaszebe, "fetch_suggestions", side_effect=lambda request_data, prefix: [{"polish": f"{prefix}0"}])
+    output_paths = [str(tmp_path / "pl.txt"), str(tmp_path / "csb.txt")]
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    # A crawl interrupted after the first chunk
+    offsets = {checkpoint_path + ".journal": len("a0\n")}
+    Path(checkpoint_path).write_text(json.dumps({"progress": {"queue": ["b", "c", "aa"]}, "offsets": offsets}), encoding="utf-8")
+    Path(checkpoint_path + ".journal").write_text("a0\n", encoding="utf-8")
+    commit = mocker.spy(Checkpoint, "commit")
+    # Keeps the checkpoint and the partial outputs a finished crawl would remove
+    mocker.patch.object(Checkpoint, "finish", autospec=True, side_effect=Checkpoint.close)
+
+    with Checkpoint(checkpoint_path, output_paths) as checkpoint:
+        kaszebe.fetch_and_save_phrases_with_translations({'l': 'pl'}, *checkpoint.open_outputs(), checkpoint=checkpoint, workers=1)
+
+    # Saved after two chunks and once more when the queue is empty
+    assert [call.args[1:] for call in commit.call_args_list] == [({"queue": ["aa"]}, ["b0", "c0"]), ({"queue": []}, ["aa0"])]
+    assert json.loads(Path(checkpoint_path).read_text(encoding="utf-8"))["progress"] == {"queue": []}
+    assert Path(checkpoint_path + ".journal").read_text(encoding="utf-8") == "a0\nb0\nc0\naa0\n"
+    assert read_outputs([partial_output_path(path) for path in output_paths]) == ["b0\nc0\naa0\n", "b0-csb\nc0-csb\naa0-csb\n"]
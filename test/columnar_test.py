@@ -0,0 +1,155 @@
+from logging import Logger
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+import pandas as pd
+from tokenizers import Tokenizer, models, pre_tokenizers
+from transformers import NllbTokenizerFast
+
+from data_processor.columnar import ColumnarDataset, ColumnarWriter, columnar_path
+from data_processor.data_normalizer import DataNormalizer
+from data_processor.scheduler import SplitScheduler
+from test.conftest import StubTokenizer
+
+pytestmark = pytest.mark.usefixtures("stub_tokenizer")
+
+
+@pytest.fixture
+def mock_logger(mocker):
+    return mocker.create_autospec(Logger, instance=True)
+
+
+@pytest.fixture
+def train_df() -> pd.DataFrame:
+    return pd.DataFrame({
+        "pol_Latn": [f"Zdanie numer {i} „żółw”" if i % 7 else "unknown" for i in range(40)],
+        "csb_Latn": [f"Zdónié {'ò' * (i % 4)} {i}" for i in range(40)]
+    })
+
+
+def read_tsv(path: str) -> pd.DataFrame:
+    return pd.read_csv(path, sep="\t", index_col=0, keep_default_na=False)
+
+
+def test_columnar_writer_returns_true_rows_match_written_batches(tmp_path: Path) -> None:
+    batches = [
+        pd.DataFrame({"pol_Latn": ["Ala", "żółw"], "csb_Latn": ["Ala", ""],
+                      "pol_Latn_input_ids": [[5, 6], [7]], "csb_Latn_input_ids": [[5], []]}),
+        pd.DataFrame({"pol_Latn": ["kot"], "csb_Latn": ["kòt"],
+                      "pol_Latn_input_ids": [[2 ** 31 - 1]], "csb_Latn_input_ids": [[8, 9, 10]]})
+    ]
+    writer = ColumnarWriter(str(tmp_path / "train.tsv"), {"tokenizer": "stub"}, parquet=False)
+    written = list(writer.passthrough(batches))
+    writer.commit()
+
+    dataset = ColumnarDataset(str(tmp_path / "train.tsv"))
+    assert [batch.columns.tolist() for batch in written] == [["pol_Latn", "csb_Latn"]] * 2
+    assert len(dataset) == 3
+    assert dataset.metadata["tokenizer"] == "stub"
+    assert [dataset.text("pol_Latn", row) for row in range(3)] == ["Ala", "żółw", "kot"]
+    assert [dataset.text("csb_Latn", row) for row in range(3)] == ["Ala", "", "kòt"]
+    assert [dataset.input_ids("csb_Latn", row).tolist() for row in range(3)] == [[5], [], [8, 9, 10]]
+    assert dataset.input_ids("pol_Latn", 2).tolist() == [2 ** 31 - 1]
+    assert dataset.array("pol_Latn.input_ids").dtype == np.int32
+    assert isinstance(dataset.array("pol_Latn.input_ids"), np.memmap)
+    assert dataset.array("pol_Latn.input_ids_offsets").tolist() == [0, 2, 3, 4]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["train.columnar"]
+
+
+@pytest.mark.parametrize(
+    "jobs, token_cache",
+    [
+        # test case 1: serial run
+        (1, False),
+        # test case 2: parallel run over several shards
+        (2, False),
+        # test case 3: token IDs read back from the token cache
+        (1, True),
+    ]
+)
+def test_normalize_columnar_returns_true_matches_tsv_and_tokenizer(tmp_path: Path, mock_logger, train_df: pd.DataFrame, jobs: int, token_cache: bool) -> None:
+    token_cache_path = str(tmp_path / "token_cache.sqlite") if token_cache else None
+    if token_cache:
+        # Warm the cache so that the IDs of the second run come from it
+        SplitScheduler(mock_logger, token_cache_path=token_cache_path).normalize([([train_df.copy()], str(tmp_path / "warm.tsv"))])
+    SplitScheduler(mock_logger).normalize([([train_df.copy()], str(tmp_path / "plain.tsv"))])
+    SplitScheduler(mock_logger, jobs=jobs, shard_size=8, token_cache_path=token_cache_path, columnar=True).normalize(
+        [([train_df.copy()], str(tmp_path / "columnar.tsv"))]
+    )
+
+    assert (tmp_path / "columnar.tsv").read_bytes() == (tmp_path / "plain.tsv").read_bytes()
+    expected_df = read_tsv(str(tmp_path / "columnar.tsv"))
+    dataset = ColumnarDataset(str(tmp_path / "columnar.tsv"))
+    assert len(dataset) == expected_df.shape[0]
+    for column in expected_df.columns:
+        texts = [dataset.text(column, row) for row in range(len(dataset))]
+        assert texts == expected_df[column].tolist()
+        assert [dataset.input_ids(column, row).tolist() for row in range(len(dataset))] == StubTokenizer()(texts, add_special_tokens=False).input_ids
+
+
+def test_normalize_columnar_stores_input_ids_without_special_tokens(tmp_path: Path, mock_logger, mocker: Any) -> None:
+    # A tiny word level NLLB tokenizer, by default it would wrap every sentence in eng_Latn ... </s>
+    vocabulary = ["<s>", "<pad>", "</s>", "<unk>", "ala", "ma", "kota", "mô", "kòta", "eng_Latn", "pol_Latn", "<mask>"]
+    backend = Tokenizer(models.WordLevel({word: index for index, word in enumerate(vocabulary)}, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer = NllbTokenizerFast(tokenizer_object=backend, additional_special_tokens=["csb_Latn"])
+    mocker.patch("data_processor.scheduler.load_tokenizer", return_value=tokenizer)
+    train_df = pd.DataFrame({"pol_Latn": ["ala ma kota"], "csb_Latn": ["ala mô kòta"]})
+
+    SplitScheduler(mock_logger, columnar=True).normalize([([train_df], str(tmp_path / "train.tsv"))])
+
+    dataset = ColumnarDataset(str(tmp_path / "train.tsv"))
+    assert dataset.metadata["add_special_tokens"] is False
+    for column, text in [("pol_Latn", "ala ma kota"), ("csb_Latn", "ala mô kòta")]:
+        input_ids = dataset.input_ids(column, 0).tolist()
+        assert input_ids[0] == tokenizer.convert_tokens_to_ids(text.split()[0])
+        assert input_ids[-1] == tokenizer.convert_tokens_to_ids(text.split()[-1])
+        assert tokenizer(text).input_ids[1:-1] == input_ids
+
+
+def test_normalize_columnar_returns_true_empty_arrays_when_all_rows_removed(tmp_path: Path, mock_logger) -> None:
+    train_df = pd.DataFrame({"pol_Latn": ["unknown"] * 3, "csb_Latn": ["Ala mô kòta"] * 3})
+
+    SplitScheduler(mock_logger, columnar=True).normalize([([train_df], str(tmp_path / "dropped.tsv"))])
+
+    dataset = ColumnarDataset(str(tmp_path / "dropped.columnar"))
+    assert len(dataset) == 0
+    assert dataset.array("csb_Latn.input_ids").shape == (0,)
+    assert dataset.array("csb_Latn.input_ids_offsets").tolist() == [0]
+
+
+def test_normalize_columnar_does_not_write_output_when_batch_fails(tmp_path: Path, mock_logger) -> None:
+    def failing_batches():
+        yield pd.DataFrame({"pol_Latn": ["Ala ma kota"], "csb_Latn": ["Ala mô kòta"]})
+        raise ValueError("Source and target files have different lengths, first divergent line: 2")
+
+    SplitScheduler(mock_logger, columnar=True).normalize([(failing_batches(), str(tmp_path / "failed.tsv"))])
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_normalize_file_returns_true_columnar_matches_scheduler(tmp_path: Path, mock_logger, train_df: pd.DataFrame) -> None:
+    input_path = tmp_path / "input.tsv"
+    train_df.to_csv(input_path, sep="\t")
+
+    DataNormalizer(mock_logger, keep_input_ids=True).normalize(str(input_path), str(tmp_path / "file.tsv"), StubTokenizer())
+    SplitScheduler(mock_logger, columnar=True).normalize([([train_df], str(tmp_path / "fused.tsv"))])
+
+    assert (tmp_path / "file.tsv").read_bytes() == (tmp_path / "fused.tsv").read_bytes()
+    for name in ["pol_Latn.text", "pol_Latn.input_ids", "csb_Latn.input_ids_offsets"]:
+        assert (Path(columnar_path(str(tmp_path / "file.tsv"))) / f"{name}.npy").read_bytes() == \
+            (Path(columnar_path(str(tmp_path / "fused.tsv"))) / f"{name}.npy").read_bytes()
+
+
+def test_columnar_writer_writes_parquet_when_pyarrow_is_installed(tmp_path: Path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    batch = pd.DataFrame({"pol_Latn": ["Ala"], "csb_Latn": ["kòt"], "pol_Latn_input_ids": [[5, 6]], "csb_Latn_input_ids": [[7]]})
+
+    writer = ColumnarWriter(str(tmp_path / "train.tsv"), parquet=True)
+    writer.write(batch)
+    writer.commit()
+
+    table = pq.read_table(tmp_path / "train.columnar" / "data.parquet")
+    assert table.to_pydict() == {"pol_Latn": ["Ala"], "csb_Latn": ["kòt"], "pol_Latn_input_ids": [[5, 6]], "csb_Latn_input_ids": [[7]]}
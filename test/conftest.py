@@ -0,0 +1,112 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Iterator, List
+
+import pytest
+
+
+ENTRY_COUNT = 23
+
+LOOKUP_PATTERN = re.compile(r"(?:(\w+): )?(findKashubianEntry|findAllKashubianEntries)\((.*)\) \{")
+PAGE_PATTERN = re.compile(r"page: \{start: (\d+), limit: (\d+)}")
+ENTRY_ID_PATTERN = re.compile(r"id: (\d+)")
+
+
+def stub_entry(entry_id: int) -> dict:
+    return {
+        "word": f"słowo{entry_id} / wariant{entry_id}",
+        "variation": {"nounVariation": {"nominative": f"słowo{entry_id}", "genitive": f"słowa{entry_id}"}},
+        "meanings": [{"translation": {"polish": f"słowo{entry_id}, wyraz{entry_id} (1)"}, "examples": [{"example": f"Przykład {entry_id}"}]}],
+        "partOfSpeech": "NOUN"
+    }
+
+
+class StubGraphQLServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubGraphQLHandler)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api/graphql"
+
+
+class StubGraphQLHandler(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    @staticmethod
+    def resolve(field: str, arguments: str):
+        if field == "findAllKashubianEntries":
+            start, limit = map(int, PAGE_PATTERN.search(arguments).groups())
+            ids = list(range(ENTRY_COUNT))[start * limit:(start + 1) * limit]
+            return {"select": [{"id": entry_id, "normalizedWord": str(entry_id)} for entry_id in ids]}
+        return stub_entry(int(ENTRY_ID_PATTERN.search(arguments).group(1)))
+
+    def do_POST(self) -> None:
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["query"]
+            lookups = LOOKUP_PATTERN.findall(query)
+            if lookups[0][1] == "findKashubianEntry":
+                # Later entries answer sooner so that responses arrive out of order
+                first_id = int(ENTRY_ID_PATTERN.search(lookups[0][2]).group(1))
+                time.sleep(0.002 * (ENTRY_COUNT - first_id))
+            data = {alias or field: self.resolve(field, arguments) for alias, field, arguments in lookups}
+            body = json.dumps({"data": data}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def stub_server() -> Iterator[StubGraphQLServer]:
+    server = StubGraphQLServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class StubTokenizer:
+    # Stands in for the NLLB tokenizer: every word becomes its length, a text containing "unknown" becomes the unknown
+    # token. Remembers the texts of every call.
+    unk_token_id = 0
+    name_or_path = "stub"
+    all_special_tokens = ["<unk>", "csb_Latn"]
+    all_special_ids = [0, 5]
+
+    def __init__(self):
+        self.calls = []
+
+    def __len__(self) -> int:
+        return 100
+
+    def __call__(self, texts: List[str], add_special_tokens: bool = True) -> SimpleNamespace:
+        self.calls.append(list(texts))
+        return SimpleNamespace(input_ids=[[0] if "unknown" in text else [len(word) for word in text.split()] + [2] * add_special_tokens for text in texts])
+
+
+@pytest.fixture
+def stub_tokenizer(mocker: Any) -> None:
+    # The scheduler and its worker processes load the stub instead of the NLLB tokenizer
+    mocker.patch("data_processor.scheduler.load_tokenizer", side_effect=StubTokenizer)
@@ -0,0 +1,53 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from utils.data_cleaner import compile_phrases, phrases_to_remove, remove_matching_phrases, remove_phrases
+
+
+def remove_sequentially(line: str, phrases: List[str]) -> str:
+    line = line.strip()
+    for phrase in phrases:
+        line = line.replace(phrase, '').strip()
+    return line
+
+
+@pytest.mark.parametrize(
+    "line, phrases",
+    [
+        # test case 1: no phrase in the line
+        ("  Dobri dzéń  ", ["GIMP", "action"]),
+        # test case 2: phrases sharing a prefix
+        ("item Undo action item x", ["item Undo action item", "item", "action"]),
+        # test case 3: removing a phrase joins the text around it into a later phrase
+        ("acXtion", ["X", "action"]),
+        # test case 4: the joined phrase comes earlier in the list and is kept
+        ("acXtion", ["action", "X"]),
+        # test case 5: overlapping occurrences
+        ("....", ["...", ".."]),
+        # test case 6: removal exposes whitespace that is stripped
+        ("1 GIMP", ["1", "GIMP"]),
+    ]
+)
+def test_remove_phrases_matches_sequential_replace(line: str, phrases: List[str]) -> None:
+    assert remove_phrases(line, phrases, compile_phrases(phrases)) == remove_sequentially(line, phrases)
+
+
+def test_remove_phrases_matches_sequential_replace_for_cleaner_phrases() -> None:
+    phrase_pattern = compile_phrases(phrases_to_remove)
+    lines = ["view-action (1) Otwórz", "Dzéń: Monday", "Ethiopian ‘kalãdôrz’", "Lëdze", "tools-actionaction", "imagexyz"]
+
+    assert [remove_phrases(line, phrases_to_remove, phrase_pattern) for line in lines] == \
+        [remove_sequentially(line, phrases_to_remove) for line in lines]
+
+
+def test_remove_matching_phrases_rewrites_both_files(tmp_path: Path) -> None:
+    polish_path, kashubian_path = tmp_path / "dataset.pl.txt", tmp_path / "dataset.csb.txt"
+    polish_path.write_text("GIMP  Otwórz   plik\nGIMP\nDom\n", encoding="utf-8")
+    kashubian_path.write_text("Òtemkni   lopk\nGIMP\nDóm 1\n", encoding="utf-8")
+
+    remove_matching_phrases(str(polish_path), str(kashubian_path), ["GIMP", "1"])
+
+    assert polish_path.read_text(encoding="utf-8") == "Otwórz plik\nDom\n"
+    assert kashubian_path.read_text(encoding="utf-8") == "Òtemkni lopk\nDóm\n"
@@ -3,23 +3,21 @@ from typing import Any
 
 import pytest
 import pandas as pd
-from transformers import NllbTokenizer
+from transformers import NllbTokenizerFast
+from sacremoses import MosesPunctNormalizer
 from unittest.mock import MagicMock
 
-from data_processor.data_normalizer import DataNormalizer
+from data_processor.data_normalizer import DataNormalizer, PunctNormalizer
 
 
 @pytest.fixture
 def mock_nllb_tokenizer(mocker: Any) -> MagicMock:
-    mock_nllb_tokenizer = mocker.MagicMock(spec=NllbTokenizer)
+    mock_nllb_tokenizer = mocker.MagicMock(spec=NllbTokenizerFast)
 
     mock_nllb_tokenizer.unk_token_id = 0
 
-    def mock_tokenize(text: str) -> MagicMock:
-        if text == "unknown_token":
-            return mocker.MagicMock(input_ids=[0, 1, 2])
-        else:
-            return mocker.MagicMock(input_ids=[1, 2, 3])
+    def mock_tokenize(texts: list[str], add_special_tokens: bool = True) -> MagicMock:
+        return mocker.MagicMock(input_ids=[[0, 1, 2] if text == "unknown_token" else [1, 2, 3] for text in texts])
 
     mock_nllb_tokenizer.side_effect = mock_tokenize
 
@@ -28,10 +26,8 @@ def mock_nllb_tokenizer(mocker: Any) -> MagicMock:
 
 @pytest.fixture
 def mock_moses_punct_normalizer(mocker):
-    mock_mpn = mocker.patch("data_processor.data_normalizer.MosesPunctNormalizer", autospec=True)
-    mock_instance = mock_mpn.return_value
-
-    mock_instance.substitutions = []
+    mock_instance = mocker.create_autospec(PunctNormalizer, instance=True)
+    mocker.patch("data_processor.data_normalizer.get_punct_normalizer", return_value=mock_instance)
 
     def normalize_side_effect(text):
         if text is None:
@@ -69,50 +65,74 @@ def mock_logger(mocker):
          3)
     ]
 )
-def test_check_for_unknown_tokens_returns_true_found_tokens(mock_nllb_tokenizer, capsys, mock_logger, input_data: dict[str, list[str]], csb_expected_unknown_tokens: int, pl_expected_unknown_tokens: int) -> None:
+def test_check_for_unknown_tokens_returns_true_found_tokens(mock_nllb_tokenizer, mock_logger, input_data: dict[str, list[str]], csb_expected_unknown_tokens: int, pl_expected_unknown_tokens: int) -> None:
     train_df = pd.DataFrame(input_data)
     normalizer = DataNormalizer(logger=mock_logger)
-    normalizer._DataNormalizer__check_for_unknown_tokens(mock_nllb_tokenizer, train_df)
-    output = capsys.readouterr().out.rstrip()
+    unknown_tokens = normalizer._DataNormalizer__find_unknown_tokens(mock_nllb_tokenizer, train_df)
+    normalizer._DataNormalizer__check_for_unknown_tokens(unknown_tokens)
 
     mock_logger.info.assert_any_call(f"Found {csb_expected_unknown_tokens} unknown tokens in the CSB data")
     mock_logger.info.assert_any_call(f"Found {pl_expected_unknown_tokens} unknown tokens in the PL data")
 
 
 @pytest.mark.parametrize(
-    "input_data, column_name, expected_output_data",
+    "input_data, expected_output_data",
     [
         # test case 1: removes unknown tokens amidst known tokens
         (
             {"csb": ["known_token", "unknown_token", "known_token"], "pl": ["known_token", "unknown_token", "known_token"]},
-            "csb",
             {"csb": ["known_token", "known_token"], "pl": ["known_token", "known_token"]}
         ),
         # test case 2: no unknown tokens to remove
         (
             {"csb": ["known_token", "known_token"], "pl": ["known_token", "known_token"]},
-            "pl",
             {"csb": ["known_token", "known_token"], "pl": ["known_token", "known_token"]}
         ),
         # test case 3: all unknown tokens to remove
         (
             {"csb": ["unknown_token", "unknown_token"], "pl": ["unknown_token", "unknown_token"]},
-            "csb",
             {"csb": [], "pl": []}
         ),
+        # test case 4: unknown tokens in either column remove the row
+        (
+            {"csb": ["unknown_token", "known_token", "known_token"], "pl": ["known_token", "known_token", "unknown_token"]},
+            {"csb": ["known_token"], "pl": ["known_token"]}
+        ),
     ]
 )
-def test_remove_rows_with_unknown_tokens_returns_true_dataframe_match(mock_nllb_tokenizer, mock_logger, input_data: dict[str, list[str]], column_name: str, expected_output_data: dict[str, list[Any]]) -> None:
+def test_remove_rows_with_unknown_tokens_returns_true_dataframe_match(mock_nllb_tokenizer, mock_logger, input_data: dict[str, list[str]], expected_output_data: dict[str, list[Any]]) -> None:
     train_df = pd.DataFrame(input_data)
-    train_df_col = train_df[column_name]
     normalizer = DataNormalizer(logger=mock_logger)
-    result_df = normalizer._DataNormalizer__remove_rows_with_unknown_tokens(mock_nllb_tokenizer, train_df, train_df_col)
+    unknown_tokens = normalizer._DataNormalizer__find_unknown_tokens(mock_nllb_tokenizer, train_df)
+    result_df = normalizer._DataNormalizer__remove_rows_with_unknown_tokens(train_df, unknown_tokens)
 
     expected_df = pd.DataFrame(expected_output_data).astype({"csb": "object", "pl": "object"}).reset_index(drop=True)
 
     pd.testing.assert_frame_equal(result_df, expected_df)
 
 
+@pytest.mark.parametrize(
+    "rows, batch_size, expected_calls",
+    [
+        # test case 1: single batch
+        (3, 1024, 2),
+        # test case 2: rows split into several batches
+        (5, 2, 6),
+        # test case 3: empty dataset is never tokenized
+        (0, 2, 0),
+    ]
+)
+def test_find_unknown_tokens_tokenizes_in_batches(mock_nllb_tokenizer, mock_logger, rows: int, batch_size: int, expected_calls: int) -> None:
+    train_df = pd.DataFrame({"csb_Latn": ["unknown_token"] * rows, "pol_Latn": ["known_token"] * rows})
+    normalizer = DataNormalizer(logger=mock_logger, batch_size=batch_size)
+
+    unknown_tokens = normalizer._DataNormalizer__find_unknown_tokens(mock_nllb_tokenizer, train_df)
+
+    assert mock_nllb_tokenizer.call_count == expected_calls
+    assert unknown_tokens.csb_Latn.tolist() == [True] * rows
+    assert unknown_tokens.pol_Latn.tolist() == [False] * rows
+
+
 @pytest.mark.parametrize(
     "input_data, expected_data",
     [
@@ -141,3 +161,81 @@ def test_normalize_translation_dataset_returns_true_dataframe_match_call_count_m
     expected_df = pd.DataFrame(expected_data)
 
     pd.testing.assert_frame_equal(normalized_df, expected_df)
+
+
+def test_normalize_translation_dataset_normalizes_repeated_values_once(mock_moses_punct_normalizer, mock_logger) -> None:
+    input_df = pd.DataFrame({"csb": ["Line 1", "Line 1", "Line 2"], "pl": ["Linia 1", "Linia 1", "Linia 1"]})
+    normalizer = DataNormalizer(logger=mock_logger)
+
+    normalized_df = normalizer._DataNormalizer__normalize_translation_dataset(input_df)
+
+    assert mock_moses_punct_normalizer.normalize.call_count == 3
+    assert normalized_df["pl"].tolist() == ["Linia 1_normalized"] * 3
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "„Cytat” – tekst — dalej…",
+        "  ( a )  :  ;  `x´  ''y''  ´´z´´ ",
+        "it‘s don’t ‘quoted’ ‚low’",
+        "\u00a0«\u00a0a\u00a0»\u00a0 «b\u00a0» c\u00a0%  nº\u00a0 1\u00a0000 5\u00a0ºC 3\u00a0cm\u00a0? x\u00a0! y\u00a0; z,\u00a0w",
+        "\"quoted\",. 50 % done) . and \r\n",
+        "",
+    ]
+)
+def test_punct_normalizer_returns_true_matches_moses_punct_normalizer(text: str) -> None:
+    assert PunctNormalizer("en").normalize(text) == MosesPunctNormalizer(lang="en").normalize(text)
+
+
+@pytest.mark.parametrize(
+    "input_data, expected_reasons",
+    [
+        # test case 1: all rows printable
+        (
+            {"csb_Latn": ["Line 1", "Line 2"], "pol_Latn": ["Linia 1", "Linia 2"]},
+            [None, None]
+        ),
+        # test case 2: first failing column and code point are reported
+        (
+            {"csb_Latn": ["Line\u200b1", "Line 2", "Line\t3"], "pol_Latn": ["Linia\n1", "Linia\x852", "Linia 3"]},
+            ["csb_Latn:U+200B", "pol_Latn:U+0085", "csb_Latn:U+0009"]
+        ),
+        # test case 3: non-string cells are checked by their string representation
+        (
+            {"csb_Latn": [float("nan"), "\u2028"], "pol_Latn": ["Linia 1", "Linia 2"]},
+            [None, "csb_Latn:U+2028"]
+        ),
+    ]
+)
+def test_find_unprintable_rows_returns_true_reasons_match(mock_logger, input_data: dict[str, list[Any]], expected_reasons: list[Any]) -> None:
+    train_df = pd.DataFrame(input_data, index=[5, 3, 5][:len(expected_reasons)])
+    normalizer = DataNormalizer(logger=mock_logger)
+
+    reasons = normalizer._DataNormalizer__find_unprintable_rows(train_df)
+
+    assert reasons.tolist() == expected_reasons
+    assert reasons.index.equals(train_df.index)
+
+
+def test_remove_unprintable_rows_returns_true_dataframe_match(mock_logger) -> None:
+    train_df = pd.DataFrame({"csb_Latn": ["Line 1", "Line\u200b2", "Line 3"], "pol_Latn": ["Linia 1", "Linia 2", "Linia\x003"]})
+    normalizer = DataNormalizer(logger=mock_logger)
+
+    result_df = normalizer._DataNormalizer__remove_unprintable_rows(train_df)
+
+    pd.testing.assert_frame_equal(result_df, train_df.iloc[[0]])
+    mock_logger.debug.assert_any_call("Removing unprintable row 1: csb_Latn:U+200B")
+    mock_logger.debug.assert_any_call("Removing unprintable row 2: pol_Latn:U+0000")
+    mock_logger.info.assert_called_with("Removed 2 unprintable rows")
+
+
+@pytest.mark.filterwarnings("error::pandas.errors.SettingWithCopyWarning")
+def test_normalize_dataframe_returns_true_normalized_rows_after_unprintable_filter(mock_nllb_tokenizer, mock_logger) -> None:
+    train_df = pd.DataFrame({"pol_Latn": ["Ala  ma kota", "Linia\u200b2"], "csb_Latn": ["Ala mô kòta", "Linijô 2"]})
+    normalizer = DataNormalizer(logger=mock_logger)
+
+    result_df = normalizer.normalize_dataframe(train_df, mock_nllb_tokenizer)
+
+    assert result_df.to_dict("list") == {"pol_Latn": ["Ala ma kota"], "csb_Latn": ["Ala mô kòta"]}
+    mock_logger.error.assert_not_called()
@@ -99,3 +99,48 @@ def test_prepare_translation_dataset_returns_true_dataframe_match(mocker: Any, m
     df_expected = pd.DataFrame(data_expected)
 
     pd.testing.assert_frame_equal(df, df_expected)
+
+
+def test_prepare_dataframe_returns_none_on_length_mismatch(mocker: Any, mock_logger) -> None:
+    mocker.patch("data_processor.data_preparer.DataPreparer._DataPreparer__read_text_file", side_effect=[["Polish sentence 1"], []])
+
+    preparer = DataPreparer(logger=mock_logger)
+    df = preparer.prepare_dataframe("dummy_source_path", "dummy_target_path", "pl", "csb")
+
+    mock_logger.error.assert_called_with("Dataset preparation failed")
+    assert df is None
+
+
+@pytest.mark.parametrize(
+    "source_content, target_content, chunk_size",
+    [
+        # test case 1: rows split into several chunks
+        ("a\nb\nc\nd\ne\n", "f\ng\nh\ni\nj\n", 2),
+        # test case 2: single chunk with surrounding whitespace and quotes
+        (" \"a\" \nb\tc\n", "d \n e\n", 10),
+        # test case 3: empty files
+        ("", "", 2),
+    ]
+)
+def test_prepare_streaming_returns_true_output_matches_prepare(create_temp_file, tmp_path: Path, mock_logger, source_content: str, target_content: str, chunk_size: int) -> None:
+    source_path = create_temp_file("source.txt", source_content, "utf-8")
+    target_path = create_temp_file("target.txt", target_content, "utf-8")
+    preparer = DataPreparer(logger=mock_logger)
+
+    preparer.prepare(source_path, target_path, str(tmp_path / "expected.tsv"), "pl", "csb")
+    preparer.prepare_streaming(source_path, target_path, str(tmp_path / "result.tsv"), "pl", "csb", chunk_size)
+
+    assert (tmp_path / "result.tsv").read_bytes() == (tmp_path / "expected.tsv").read_bytes()
+
+
+def test_prepare_streaming_reports_first_divergent_line(create_temp_file, tmp_path: Path, mock_logger) -> None:
+    source_path = create_temp_file("source.txt", "a\nb\nc\n", "utf-8")
+    target_path = create_temp_file("target.txt", "d\n", "utf-8")
+    output_path = tmp_path / "result.tsv"
+    preparer = DataPreparer(logger=mock_logger)
+
+    preparer.prepare_streaming(source_path, target_path, str(output_path), "pl", "csb", 1)
+
+    mock_logger.error.assert_called_with("Dataset preparation failed, no output file will be written: Source and target files have different lengths, first divergent line: 2")
+    assert not output_path.exists()
+    assert not (tmp_path / "result.tsv.tmp").exists()
@@ -0,0 +1,91 @@
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pytest
+
+from utils.data_splitter import split_data
+
+
+def write_corpus(tmp_path: Path, name: str, pairs: List[Tuple[str, str]]) -> str:
+    (tmp_path / f"{name}.pl.txt").write_text("".join(f"{polish}\n" for polish, _ in pairs), encoding="utf-8")
+    (tmp_path / f"{name}.csb.txt").write_text("".join(f"{kashubian}\n" for _, kashubian in pairs), encoding="utf-8")
+    return str(tmp_path / name)
+
+
+def read_splits(output_dir: Path) -> Dict[str, List[Tuple[str, str]]]:
+    splits = {}
+    for split in ("train", "val", "test", "val_debug"):
+        polish_lines = (output_dir / f"{split}.pol.txt").read_text(encoding="utf-8").splitlines()
+        kashubian_lines = (output_dir / f"{split}.csb.txt").read_text(encoding="utf-8").splitlines()
+        splits[split] = list(zip(polish_lines, kashubian_lines))
+    return splits
+
+
+def corpus_pairs(name: str, count: int) -> List[Tuple[str, str]]:
+    return [(f"{name} zdanie {idx}", f"{name} zdanié {idx}") for idx in range(count)]
+
+
+@pytest.fixture(name="split")
+def split_fixture(tmp_path: Path):
+    def _split(corpora: Dict[str, List[Tuple[str, str]]], **kwargs) -> Dict[str, List[Tuple[str, str]]]:
+        output_dir = tmp_path / f"output{len(list(tmp_path.glob('output*')))}"
+        output_dir.mkdir()
+        prefixes = [write_corpus(tmp_path, name, pairs) for name, pairs in corpora.items()]
+        split_data(corpora=prefixes, output_dir=str(output_dir), **kwargs)
+        return read_splits(output_dir)
+    return _split
+
+
+def test_split_data_is_reproducible_and_depends_on_seed(split) -> None:
+    corpora = {"a": corpus_pairs("a", 500)}
+
+    assert split(corpora) == split(corpora)
+    assert split(corpora, seed=1)["test"] != split(corpora)["test"]
+
+
+def test_split_data_keeps_pairs_in_their_split_when_corpus_grows(split) -> None:
+    before = split({"a": corpus_pairs("a", 300)})
+    after = split({"a": corpus_pairs("a", 600)})
+
+    for name in ("train", "val", "test"):
+        assert set(before[name]) <= set(after[name])
+
+
+def test_split_data_writes_every_pair_once_in_roughly_requested_ratios(split) -> None:
+    pairs = corpus_pairs("a", 2000)
+
+    splits = split({"a": pairs})
+
+    assert sorted(splits["train"] + splits["val"] + splits["test"]) == sorted(pairs)
+    assert 1500 < len(splits["train"]) < 1700
+    assert 130 < len(splits["val"]) < 270
+
+
+def test_split_data_spreads_every_corpus_over_the_splits(split) -> None:
+    corpora = {"large": corpus_pairs("large", 2000), "small": corpus_pairs("small", 500)}
+
+    splits = split(corpora)
+
+    for name, pairs in corpora.items():
+        counts = [sum(pair[0].startswith(name) for pair in splits[split_name]) for split_name in ("train", "val", "test")]
+        assert all(abs(count - ratio * len(pairs)) < 0.05 * len(pairs) for count, ratio in zip(counts, (0.8, 0.1, 0.1)))
+
+
+def test_split_data_keeps_pairs_of_every_corpus_in_their_split_when_one_corpus_grows(split) -> None:
+    before = split({"large": corpus_pairs("large", 300), "small": corpus_pairs("small", 50)})
+    after = split({"large": corpus_pairs("large", 600), "small": corpus_pairs("small", 50)})
+
+    for name in ("train", "val", "test"):
+        assert set(before[name]) <= set(after[name])
+
+
+def test_split_data_picks_val_debug_from_val(split) -> None:
+    splits = split({"a": corpus_pairs("a", 500)}, val_debug_size=5)
+
+    assert len(splits["val_debug"]) == 5
+    assert set(splits["val_debug"]) <= set(splits["val"])
+
+
+def test_split_data_rejects_ratios_not_summing_to_one(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        split_data(0.8, 0.1, 0.2, corpora=[], output_dir=str(tmp_path))
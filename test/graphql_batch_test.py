@@ -0,0 +1,35 @@
+import pytest
+
+from scrapers.graphql_batch import GraphQLBatcher, build_batched_query
+from test.conftest import ENTRY_COUNT, StubGraphQLServer, stub_entry
+
+
+def test_build_batched_query_aliases_every_lookup() -> None:
+    query = build_batched_query("findKashubianEntry", ["id: 4", "id: 2"], "word")
+
+    assert query == "query Batched {\n  e0: findKashubianEntry(id: 4) { word }\n  e1: findKashubianEntry(id: 2) { word }\n}"
+
+
+@pytest.mark.parametrize(
+    "batch_size, expected_requests",
+    [
+        # test case 1: every lookup in one request
+        (50, 1),
+        # test case 2: lookups split across requests
+        (10, 3),
+        # test case 3: one lookup per request
+        (1, ENTRY_COUNT),
+    ]
+)
+def test_fetch_entries_returns_entries_in_requested_order(stub_server: StubGraphQLServer, batch_size: int, expected_requests: int) -> None:
+    entry_ids = list(reversed(range(ENTRY_COUNT)))
+
+    entries = GraphQLBatcher(stub_server.url, batch_size).fetch_entries(entry_ids, "word")
+
+    assert entries == [stub_entry(entry_id) for entry_id in entry_ids]
+    assert stub_server.requests == expected_requests
+
+
+def test_fetch_entries_does_not_send_empty_requests(stub_server: StubGraphQLServer) -> None:
+    assert GraphQLBatcher(stub_server.url).fetch_entries([], "word") == []
+    assert stub_server.requests == 0
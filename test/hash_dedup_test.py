@@ -0,0 +1,90 @@
+import random
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from utils.data_cleaner import remove_duplicated_phrases
+from utils.hash_dedup import HashSet, deduplicate_pairs, first_occurrences_external, normalized_key, pair_hash
+
+
+def write_pairs(tmp_path: Path, pairs: List[Tuple[str, str]]) -> Tuple[str, str]:
+    polish_path, kashubian_path = tmp_path / "dataset.pl.txt", tmp_path / "dataset.csb.txt"
+    polish_path.write_text("".join(f"{polish}\n" for polish, _ in pairs), encoding="utf-8")
+    kashubian_path.write_text("".join(f"{kashubian}\n" for _, kashubian in pairs), encoding="utf-8")
+    return str(polish_path), str(kashubian_path)
+
+
+def read_pairs(polish_path: str, kashubian_path: str) -> List[Tuple[str, str]]:
+    polish_lines = Path(polish_path).read_text(encoding="utf-8").splitlines()
+    kashubian_lines = Path(kashubian_path).read_text(encoding="utf-8").splitlines()
+    return list(zip(polish_lines, kashubian_lines))
+
+
+def keep_first(pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return list(dict.fromkeys((polish.strip(), kashubian.strip()) for polish, kashubian in pairs))
+
+
+PAIRS = [("Dom", "Dóm"), ("Kot", "Kòt"), (" Dom ", "Dóm"), ("Dom", "Chëcz"), ("Kot", "Kòt"), ("dom!", "dóm")]
+
+
+@pytest.mark.parametrize(
+    "hash_bits, external",
+    [
+        # test case 1: 64-bit hashes in memory
+        (64, False),
+        # test case 2: 128-bit hashes in memory
+        (128, False),
+        # test case 3: external sort
+        (64, True),
+        # test case 4: external sort with 128-bit hashes
+        (128, True),
+    ]
+)
+def test_deduplicate_pairs_keeps_first_occurrences_in_order(tmp_path: Path, hash_bits: int, external: bool) -> None:
+    paths = write_pairs(tmp_path, PAIRS)
+
+    written = deduplicate_pairs(*paths, hash_bits=hash_bits, external=external)
+
+    assert read_pairs(*paths) == keep_first(PAIRS)
+    assert written == len(keep_first(PAIRS))
+
+
+def test_deduplicate_pairs_falls_back_to_external_sort(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    paths = write_pairs(tmp_path, PAIRS)
+
+    deduplicate_pairs(*paths, max_entries=2)
+
+    assert read_pairs(*paths) == keep_first(PAIRS)
+    assert "external sort" in capsys.readouterr().out
+
+
+def test_deduplicate_pairs_removes_near_duplicates(tmp_path: Path) -> None:
+    paths = write_pairs(tmp_path, PAIRS)
+
+    remove_duplicated_phrases(*paths, near_duplicates=True)
+
+    assert read_pairs(*paths) == [("Dom", "Dóm"), ("Kot", "Kòt"), ("Dom", "Chëcz")]
+
+
+def test_first_occurrences_external_merges_several_runs() -> None:
+    random.seed(0)
+    pairs = [(str(random.randrange(50)), "x") for _ in range(1000)]
+
+    keep = first_occurrences_external(iter(pairs), str, 64, run_size=64)
+
+    kept = [pair for line_number, pair in enumerate(pairs) if keep[line_number >> 3] & (1 << (line_number & 7))]
+    assert kept == keep_first(pairs)
+
+
+def test_hash_set_grows_and_detects_duplicates() -> None:
+    hash_set = HashSet(128, capacity=4)
+    keys = [pair_hash(str(idx), "x", 128) for idx in range(100)] + [5 << 64]
+
+    assert all(hash_set.add(key) for key in keys)
+    assert not any(hash_set.add(key) for key in keys)
+    assert len(hash_set) == 101
+
+
+def test_normalized_key_ignores_case_punctuation_and_spacing() -> None:
+    assert normalized_key("  Dobri   dzéń! ") == normalized_key("dobri, DZÉŃ")
@@ -0,0 +1,31 @@
+import pytest
+
+from scrapers.html_extract import extract_first_table, extract_translations
+
+
+PAGE = """
+<html><body>
+<nav><ul class="menu"><li>Start</li></ul></nav>
+<ul class="translations-list"><li> dom </li><li>chata</li></ul>
+<table><tr><th>Przypadek</th></tr><tr><td>Mianownik</td></tr></table>
+<ul class="translations-list other"><li>checz</li></ul>
+<table><tr><td>Druga</td></tr></table>
+</body></html>
+"""
+
+
+@pytest.mark.parametrize("parser", [None, "html.parser"])
+def test_extract_translations_returns_items_of_every_translations_list(parser) -> None:
+    assert extract_translations(PAGE, parser) == ["dom", "chata", "checz"]
+
+
+@pytest.mark.parametrize("parser", [None, "html.parser"])
+def test_extract_first_table_returns_only_first_table(parser) -> None:
+    table = extract_first_table(PAGE, parser)
+
+    assert [td.get_text() for td in table.find_all("td")] == ["Mianownik"]
+
+
+def test_extract_returns_nothing_when_content_is_missing() -> None:
+    assert extract_translations("<html><body><p>Brak</p></body></html>") == []
+    assert extract_first_table("<html><body><p>Brak</p></body></html>") is None
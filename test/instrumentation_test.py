@@ -0,0 +1,108 @@
+import json
+from logging import Logger
+from pathlib import Path
+
+import pytest
+import pandas as pd
+
+from data_processor.data_normalizer import DataNormalizer
+from data_processor.instrumentation import Recorder, span, use_recorder
+from data_processor.scheduler import SplitScheduler
+from test.conftest import StubTokenizer
+
+pytestmark = pytest.mark.usefixtures("stub_tokenizer")
+
+
+@pytest.fixture
+def mock_logger(mocker):
+    return mocker.create_autospec(Logger, instance=True)
+
+
+@pytest.fixture
+def train_df() -> pd.DataFrame:
+    return pd.DataFrame({
+        "pol_Latn": ["Ala ma kota", "unknown", "Kot", "Pies\u200b", "unknown", "Dom"],
+        "csb_Latn": ["Ala mô kòta", "Kòt", "unknown", "Pies", "unknown", "Dóm\u200b"]
+    })
+
+
+def test_span_records_time_rows_and_errors() -> None:
+    with use_recorder(Recorder()) as recorder:
+        with span("step", "test", path="input.txt") as step:
+            step.rows_in, step.rows_out = 5, 3
+            step.drop("too short", 2)
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("broken")
+
+    first, second = recorder.spans
+    assert (first.name, first.category, first.rows_in, first.rows_out, first.dropped) == ("step", "test", 5, 3, {"too short": 2})
+    assert first.attributes == {"path": "input.txt"}
+    assert first.wall_seconds >= 0 and first.cpu_seconds >= 0
+    assert second.attributes == {"error": "ValueError"}
+
+
+def test_summary_adds_up_spans_of_the_same_step() -> None:
+    with use_recorder(Recorder()) as recorder:
+        for rows in (3, 4):
+            with span("read", "io") as step:
+                step.rows_out, step.bytes_read = rows, 10 * rows
+                step.drop("empty", 1)
+        with span("write", "io"):
+            pass
+
+    read, write = recorder.summary()
+    assert (read["name"], read["count"], read["rows_out"], read["bytes_read"], read["dropped"]) == ("read", 2, 7, 70, {"empty": 2})
+    assert (write["name"], write["count"]) == ("write", 1)
+
+
+def test_normalize_dataframe_records_rows_dropped_per_reason(mock_logger, train_df: pd.DataFrame) -> None:
+    with use_recorder(Recorder()) as recorder:
+        DataNormalizer(mock_logger).normalize_dataframe(train_df, StubTokenizer())
+
+    steps = {step["name"]: step for step in recorder.summary()}
+    assert list(steps) == ["normalize.printable_filter", "normalize.punctuation", "normalize.tokenize", "normalize.unknown_filter"]
+    assert (steps["normalize.printable_filter"]["rows_in"], steps["normalize.printable_filter"]["rows_out"]) == (6, 4)
+    assert steps["normalize.printable_filter"]["dropped"] == {"unprintable pol_Latn:U+200B": 1, "unprintable csb_Latn:U+200B": 1}
+    assert (steps["normalize.unknown_filter"]["rows_in"], steps["normalize.unknown_filter"]["rows_out"]) == (4, 1)
+    assert steps["normalize.unknown_filter"]["dropped"] == {"unknown token pol_Latn": 2, "unknown token csb_Latn": 1}
+
+
+@pytest.mark.parametrize(
+    "jobs",
+    [
+        # test case 1: serial run
+        1,
+        # test case 2: spans recorded in the worker processes
+        2,
+    ]
+)
+def test_scheduler_records_spans_of_every_shard(tmp_path: Path, mock_logger, train_df: pd.DataFrame, jobs: int) -> None:
+    with use_recorder(Recorder()) as recorder:
+        SplitScheduler(mock_logger, jobs=jobs, shard_size=2).normalize([([train_df], str(tmp_path / "train.tsv"))])
+
+    steps = {step["name"]: step for step in recorder.summary()}
+    assert steps["normalize.printable_filter"]["rows_in"] == 6
+    assert steps["normalize.unknown_filter"]["rows_out"] == 1
+    assert steps["write.tsv_batch"]["bytes_written"] == (tmp_path / "train.tsv").stat().st_size
+
+
+def test_write_report_and_chrome_trace(tmp_path: Path) -> None:
+    with use_recorder(Recorder()) as recorder:
+        with span("outer", "test"):
+            with span("inner", "test") as step:
+                step.rows_out = 2
+
+    recorder.write_report(str(tmp_path / "report.json"), {"args": {"jobs": 1}})
+    recorder.write_chrome_trace(str(tmp_path / "trace.json"))
+
+    report = json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))
+    assert report["run"] == {"args": {"jobs": 1}}
+    assert [step["name"] for step in report["steps"]] == ["outer", "inner"]
+    events = json.loads((tmp_path / "trace.json").read_text(encoding="utf-8"))["traceEvents"]
+    outer, inner = sorted(events, key=lambda event: event["ts"])
+    assert outer["ph"] == inner["ph"] == "X"
+    assert outer["ts"] == 0
+    # Rounding of the microsecond floats only
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"] + 1e-6
+    assert inner["args"]["rows_out"] == 2
@@ -0,0 +1,47 @@
+import io
+from typing import List
+
+import pytest
+from pytest_mock import MockerFixture
+
+from scrapers import kaszebe
+
+
+SUGGESTIONS = {
+    # Full lists are narrowed down
+    "a": [{"polish": f"a{idx}"} for idx in range(10)],
+    "b": [{"polish": "bok"}, {"polish": "ab"}],
+    "c": [{"polish": "cel"}, {"polish": "cel"}],
+    "aa": [{"polish": "aaa"}],
+    # Words suggested under several prefixes are written once
+    "ab": [{"polish": "ab"}, {"polish": "bok"}],
+    "ac": [],
+}
+
+
+@pytest.fixture
+def crawl(mocker: MockerFixture):
+    mocker.patch.object(kaszebe, "polish_alphabet", ["a", "b", "c"])
+    mocker.patch.object(kaszebe, "fetch_suggestions", side_effect=lambda request_data, prefix: SUGGESTIONS[prefix])
+    fetch_translations = mocker.patch.object(kaszebe, "fetch_translations", side_effect=lambda word: [f"{word}-1", f"{word}-2"])
+
+    def _crawl(workers: int) -> List[str]:
+        pl_file, csb_file = io.StringIO(), io.StringIO()
+        kaszebe.fetch_and_save_phrases_with_translations({'l': 'pl'}, pl_file, csb_file, workers=workers)
+        return [pl_file.getvalue(), csb_file.getvalue(), [call.args[0] for call in fetch_translations.call_args_list]]
+    return _crawl
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_fetch_and_save_phrases_crawls_breadth_first_without_duplicates(crawl, workers: int) -> None:
+    pl_output, csb_output, fetched_words = crawl(workers)
+
+    # The single letters come before the two letter prefixes a was narrowed down to
+    expected_words = ["bok", "ab", "cel", "aaa"]
+    assert sorted(fetched_words) == sorted(expected_words)
+    assert pl_output.splitlines() == [word for word in expected_words for _ in range(2)]
+    assert csb_output.splitlines() == [f"{word}-{idx}" for word in expected_words for idx in (1, 2)]
+
+
+def test_fetch_and_save_phrases_output_does_not_depend_on_worker_count(crawl) -> None:
+    assert crawl(1)[:2] == crawl(8)[:2]
@@ -0,0 +1,187 @@
+import configparser
+import subprocess
+import sys
+from argparse import Namespace
+from logging import Logger
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from data_processor.__main__ import SPLITS, check, prepare_data, prepare_lazily, split_digest
+from data_processor.build_manifest import BuildManifest
+from data_processor.config_loader import validate
+from data_processor.scheduler import SplitScheduler
+
+
+@pytest.fixture
+def mock_logger(mocker):
+    return mocker.create_autospec(Logger, instance=True)
+
+
+def write_config(tmp_path: Path, target_text: str = "Ala mô kòta\nKòt\n", max_entries: str = "10") -> configparser.ConfigParser:
+    (tmp_path / "pol.txt").write_text("Ala ma kota\nKot\n", encoding="utf-8")
+    (tmp_path / "csb.txt").write_text(target_text, encoding="utf-8")
+    config = configparser.ConfigParser(interpolation=configparser.ExtendedInterpolation())
+    config.read_dict({
+        "DIRECTORIES": {"dir": str(tmp_path), "build_manifest_file": "${dir}/manifest.json", "run_report_file": "${dir}/run_report.json",
+                        "run_trace_file": "${dir}/run_trace.json", "profile_data_dir": "${dir}/profile"},
+        "LANGUAGE": {"source_language": "pol_Latn", "target_language": "csb_Latn"},
+        "CACHE": {"token_cache_file": "${DIRECTORIES:dir}/token_cache.sqlite", "token_cache_max_entries": max_entries},
+        "TOKENIZER": {"model_dir": "", "cache_dir": "${DIRECTORIES:dir}/tokenizer"},
+        **{
+            section: {"source_file": "${DIRECTORIES:dir}/pol.txt", "target_file": "${DIRECTORIES:dir}/csb.txt",
+                      "output_file": f"${{DIRECTORIES:dir}}/{section.lower()}.tsv"}
+            for section in SPLITS
+        }
+    })
+    return config
+
+
+def test_importing_entry_point_defers_ml_stack() -> None:
+    code = "import sys, data_processor.__main__; print(sorted({'pandas', 'transformers', 'sacremoses', 'tqdm'} & set(sys.modules)))"
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert completed.stdout.strip() == "[]"
+
+
+def test_check_reports_splits_that_would_be_rebuilt(tmp_path: Path, mock_logger) -> None:
+    config = write_config(tmp_path)
+    args = Namespace(force=False, columnar=False, write_intermediate=False, stream=False, chunk_size=4)
+
+    assert check(config, BuildManifest(config["DIRECTORIES"]["build_manifest_file"]), args, mock_logger)
+    messages = [call.args[0] for call in mock_logger.info.call_args_list]
+    assert len(messages) == len(SPLITS)
+    assert all("2 aligned pairs" in message and "would be rebuilt" in message for message in messages)
+    mock_logger.error.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "stream, options, rebuilt",
+    [
+        # test case 1: intermediate files written
+        (False, {"write_intermediate": True}, True),
+        # test case 2: streamed
+        (False, {"stream": True}, True),
+        # test case 3: columnar output
+        (False, {"columnar": True}, True),
+        # test case 4: another chunk size when streaming
+        (True, {"chunk_size": 2}, True),
+        # test case 5: another chunk size without streaming
+        (False, {"chunk_size": 2}, False),
+    ]
+)
+def test_split_digest_changes_with_output_options(tmp_path: Path, mock_logger, stream: bool, options: dict, rebuilt: bool) -> None:
+    config = write_config(tmp_path)
+    args = Namespace(force=False, columnar=False, write_intermediate=False, stream=stream, chunk_size=4)
+
+    digest = split_digest(config["TRAINING"], args, mock_logger)
+
+    assert digest is not None
+    assert (split_digest(config["TRAINING"], Namespace(**{**vars(args), **options}), mock_logger) != digest) == rebuilt
+
+
+def test_split_digest_changes_with_normalizer_code(tmp_path: Path, mock_logger, mocker: Any) -> None:
+    config = write_config(tmp_path)
+    args = Namespace(force=False, columnar=False, write_intermediate=False, stream=False, chunk_size=4)
+    module_path = tmp_path / "data_normalizer.py"
+    module_path.write_text("STRIP = True\n", encoding="utf-8")
+    mocker.patch("data_processor.__main__.OUTPUT_MODULES", [str(module_path)])
+    digest = split_digest(config["TRAINING"], args, mock_logger)
+
+    module_path.write_text("STRIP = False\n", encoding="utf-8")
+
+    assert split_digest(config["TRAINING"], args, mock_logger) != digest
+
+
+@pytest.mark.parametrize(
+    "target_text, max_entries, expected_error",
+    [
+        # test case 1: input files of different lengths
+        ("Ala mô kòta\n", "10", "different lengths"),
+        # test case 2: option that is not a number
+        ("Ala mô kòta\nKòt\n", "many", "token_cache_max_entries"),
+    ]
+)
+def test_check_returns_false_on_invalid_inputs(tmp_path: Path, mock_logger, target_text: str, max_entries: str, expected_error: str) -> None:
+    config = write_config(tmp_path, target_text, max_entries)
+    args = Namespace(force=False, columnar=False, write_intermediate=False, stream=False, chunk_size=4)
+
+    assert not check(config, BuildManifest(config["DIRECTORIES"]["build_manifest_file"]), args, mock_logger)
+    assert expected_error in mock_logger.error.call_args_list[0].args[0]
+
+
+@pytest.mark.parametrize(
+    "section, option, value, expected_error",
+    [
+        # test case 1: missing option
+        ("CACHE", "token_cache_file", None, "Missing option token_cache_file"),
+        # test case 2: reference to an undefined option
+        ("CACHE", "token_cache_file", "${DIRECTORIES:missing}/token_cache.sqlite", "Invalid option token_cache_file"),
+        # test case 3: missing section
+        ("LANGUAGE", None, None, "Missing section [LANGUAGE]"),
+    ]
+)
+def test_validate_reports_invalid_config(tmp_path: Path, mock_logger, section: str, option: str, value: str, expected_error: str) -> None:
+    config = write_config(tmp_path)
+    if option is None:
+        config.remove_section(section)
+    elif value is None:
+        config.remove_option(section, option)
+    else:
+        config.set(section, option, value)
+
+    assert not validate(config, {section: ["token_cache_file"] if option else ["source_language"]}, mock_logger)
+    mock_logger.error.assert_called_once()
+    assert expected_error in mock_logger.error.call_args.args[0]
+
+
+@pytest.mark.parametrize(
+    "stream",
+    [
+        # test case 1: whole split in memory
+        False,
+        # test case 2: streamed in chunks
+        True,
+    ]
+)
+def test_write_intermediate_returns_true_same_output_as_in_memory_path(tmp_path: Path, mock_logger, stub_tokenizer, stream: bool) -> None:
+    (tmp_path / "pol.txt").write_text("NA\nnull\n\nnan\nAla „ma” kota\n#N/A\n", encoding="utf-8")
+    (tmp_path / "csb.txt").write_text("\nNone\nn/a\nNaN\nAla mô kòta\nTRUE\n", encoding="utf-8")
+    data_paths = {"source_file": str(tmp_path / "pol.txt"), "target_file": str(tmp_path / "csb.txt")}
+    language = {"source_language": "pol_Latn", "target_language": "csb_Latn"}
+
+    outputs = []
+    for write_intermediate in (False, True):
+        output_path = str(tmp_path / f"intermediate_{write_intermediate}.tsv")
+        args = Namespace(write_intermediate=write_intermediate, stream=stream, chunk_size=4)
+        batches = prepare_data({**data_paths, "output_file": output_path}, language, mock_logger, args)
+        SplitScheduler(mock_logger).normalize([(batches, output_path)])
+        outputs.append(Path(output_path).read_text(encoding="utf-8"))
+
+    assert outputs[0] == outputs[1]
+    assert "nan" not in outputs[0].split("\n", 2)[1]
+
+
+def test_prepare_lazily_prepares_split_when_the_scheduler_reads_it(tmp_path: Path, mock_logger, mocker: Any, stub_tokenizer) -> None:
+    config = write_config(tmp_path)
+    args = Namespace(write_intermediate=False, stream=False, chunk_size=4)
+    prepare = mocker.patch("data_processor.__main__.prepare_data", wraps=prepare_data)
+    splits = [(prepare_lazily(config[section], config["LANGUAGE"], section, mock_logger, args), config[section]["output_file"]) for section in ("TRAINING", "TEST")]
+    prepare.assert_not_called()
+
+    written = SplitScheduler(mock_logger).normalize(splits)
+
+    assert [call.args[0].name for call in prepare.call_args_list] == ["TRAINING", "TEST"]
+    assert written == [config["TRAINING"]["output_file"], config["TEST"]["output_file"]]
+
+
+def test_prepare_lazily_fails_the_split_when_preparing_fails(tmp_path: Path, mock_logger, mocker: Any, stub_tokenizer) -> None:
+    config = write_config(tmp_path)
+    mocker.patch("data_processor.__main__.prepare_data", return_value=None)
+    args = Namespace(write_intermediate=False, stream=False, chunk_size=4)
+
+    written = SplitScheduler(mock_logger).normalize([(prepare_lazily(config["TRAINING"], config["LANGUAGE"], "training data", mock_logger, args), "train.tsv")])
+
+    assert written == []
+    assert "Failed to prepare the training data" in mock_logger.error.call_args.args[0]
@@ -0,0 +1,139 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pytest
+import requests
+from pytest_mock import MockerFixture
+
+from scrapers.noun_declension import DeclensionCache, KashubianEntryFetcher, PhraseFetcher, PolishNounDeclensionFetcher
+from test.conftest import ENTRY_COUNT, StubGraphQLServer
+
+
+def test_fetch_all_entries_returns_requested_page(stub_server: StubGraphQLServer) -> None:
+    entries = KashubianEntryFetcher(stub_server.url).fetch_all_entries(2, 10)
+
+    assert [entry["id"] for entry in entries] == list(range(20, ENTRY_COUNT))
+
+
+def test_fetch_and_save_phrases_batches_entry_lookups(stub_server: StubGraphQLServer, mocker: MockerFixture) -> None:
+    mocker.patch.object(PolishNounDeclensionFetcher, "fetch_declensions", return_value={"nounVariation": {"genitive": "słowa"}})
+    pl_file, csb_file = io.StringIO(), io.StringIO()
+
+    PhraseFetcher(pl_file, csb_file, api_url=stub_server.url, pages_per_request=2).fetch_and_save_phrases(limit=10)
+
+    # Two requests list the 3 non-empty pages and the empty one after them, one request per page fetches the entries
+    assert stub_server.requests == 2 + 3
+    assert csb_file.getvalue() == "".join(f"słowo{entry_id}, wyraz{entry_id}\n" * 2 for entry_id in range(ENTRY_COUNT))
+    assert pl_file.getvalue() == "słowa\n" * 2 * ENTRY_COUNT
+
+
+def test_declension_cache_fetches_every_noun_once(mocker: MockerFixture) -> None:
+    fetch = mocker.MagicMock(side_effect=lambda noun: {"nounVariation": {"genitive": f"{noun}a"}} if noun != "brak" else {})
+    cache = DeclensionCache(fetch=fetch)
+
+    results = [cache.get(noun) for noun in ("dom\n", "brak\n", "dom", " brak ")]
+
+    assert results == [{"nounVariation": {"genitive": "doma"}}, {}, {"nounVariation": {"genitive": "doma"}}, {}]
+    assert fetch.call_args_list == [mocker.call("dom"), mocker.call("brak")]
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_declension_cache_evicts_least_recently_used(mocker: MockerFixture) -> None:
+    fetch = mocker.MagicMock(side_effect=lambda noun: {"noun": noun})
+    cache = DeclensionCache(max_entries=2, fetch=fetch)
+
+    for noun in ("a", "b", "a", "c", "a", "b"):
+        cache.get(noun)
+
+    assert [call.args[0] for call in fetch.call_args_list] == ["a", "b", "c", "b"]
+
+
+def test_declension_cache_persists_to_disk(tmp_path: Path, mocker: MockerFixture) -> None:
+    fetch = mocker.MagicMock(side_effect=lambda noun: {} if noun == "brak" else {"noun": noun})
+    cache = DeclensionCache(path=str(tmp_path / "declensions.sqlite"), fetch=fetch)
+    cache.get("dom")
+    cache.get("brak")
+    cache.close()
+
+    fetch.reset_mock()
+    cache = DeclensionCache(path=str(tmp_path / "declensions.sqlite"), fetch=fetch)
+
+    assert (cache.get("dom"), cache.get("brak")) == ({"noun": "dom"}, {})
+    fetch.assert_not_called()
+    cache.close()
+
+
+def test_declension_cache_does_not_persist_failed_requests(tmp_path: Path, mocker: MockerFixture) -> None:
+    fetch = mocker.MagicMock(side_effect=[None, None, {"noun": "dom"}])
+    cache = DeclensionCache(path=str(tmp_path / "declensions.sqlite"), fetch=fetch)
+
+    assert (cache.get("dom"), cache.get("dom")) == ({}, {})
+    cache.close()
+    cache = DeclensionCache(path=str(tmp_path / "declensions.sqlite"), fetch=fetch)
+
+    assert cache.get("dom") == {"noun": "dom"}
+    assert fetch.call_count == 3
+    cache.close()
+
+
+@pytest.mark.parametrize(
+    "status, expected_declensions, expected_cached",
+    [
+        # test case 1: noun without a declension page
+        (404, {}, True),
+        # test case 2: server error
+        (503, None, False),
+    ]
+)
+def test_declension_cache_persists_only_permanent_client_errors(tmp_path: Path, mocker: MockerFixture, status: int,
+                                                                 expected_declensions: Optional[dict], expected_cached: bool) -> None:
+    response = requests.Response()
+    response.status_code = status
+    send = mocker.patch("scrapers.noun_declension.send_request_with_retries", return_value=response if status < 500 else None)
+
+    assert PolishNounDeclensionFetcher("brak").fetch_declensions() == expected_declensions
+    cache = DeclensionCache(path=str(tmp_path / "declensions.sqlite"))
+    cache.get("brak")
+    cache.close()
+    send.reset_mock()
+
+    cache = DeclensionCache(path=str(tmp_path / "declensions.sqlite"))
+    assert cache.get("brak") == {}
+    assert send.called != expected_cached
+    cache.close()
+
+
+def test_declension_cache_coalesces_concurrent_lookups(mocker: MockerFixture) -> None:
+    release = threading.Event()
+
+    def slow_fetch(noun: str) -> dict:
+        release.wait(5)
+        return {"noun": noun}
+
+    fetch = mocker.MagicMock(side_effect=slow_fetch)
+    cache = DeclensionCache(fetch=fetch)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.get, "dom") for _ in range(8)]
+        while len(cache.pending) == 0 or cache.hits + cache.misses < 8:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == [{"noun": "dom"}] * 8
+    fetch.assert_called_once_with("dom")
+
+
+def test_fetch_and_save_phrases_reuses_cached_declensions(stub_server: StubGraphQLServer, mocker: MockerFixture) -> None:
+    fetch_declensions = mocker.patch.object(PolishNounDeclensionFetcher, "fetch_declensions", return_value={"nounVariation": {"genitive": "słowa"}})
+    declension_cache = DeclensionCache()
+
+    for _ in range(2):
+        PhraseFetcher(io.StringIO(), io.StringIO(), api_url=stub_server.url, declension_cache=declension_cache).fetch_and_save_phrases(limit=10)
+
+    # Every entry has two distinct Polish translations, the second crawl finds all of them in the cache
+    assert fetch_declensions.call_count == 2 * ENTRY_COUNT
@@ -0,0 +1,141 @@
+import os
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from data_processor import parallel_corpus
+from data_processor.parallel_corpus import INDEX_SUFFIX, ParallelCorpus, TextFile
+
+
+def write_bytes(path: Path, content: str) -> str:
+    path.write_bytes(content.encode("utf-8"))
+    return str(path)
+
+
+def text_mode_lines(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as file:
+        return [line.rstrip("\n") for line in file]
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        # test case 1: lines ending with \n
+        "Ala ma kota\nKot mô Ale\n",
+        # test case 2: last line without a line ending
+        "Ala ma kota\nKot mô Ale",
+        # test case 3: \r\n and lone \r line endings
+        "Ala\r\nżółw\rkòt\r\n\r\rmiã\r",
+        # test case 4: empty lines and other whitespace kept inside the lines
+        "\n\n a\tb \x0c c d\n\n",
+        # test case 5: empty file
+        "",
+    ]
+)
+def test_text_file_returns_true_lines_match_text_mode(tmp_path: Path, content: str) -> None:
+    path = write_bytes(tmp_path / "corpus.txt", content)
+    expected = text_mode_lines(path)
+
+    with TextFile(path) as text_file:
+        assert len(text_file) == len(expected)
+        assert list(text_file) == expected
+        assert [text_file[row] for row in range(len(text_file))] == expected
+        assert text_file[1:-1] == expected[1:-1]
+        assert text_file[::2] == expected[::2]
+
+
+@pytest.mark.parametrize(
+    "index_chunk_size, decode_chunk_lines",
+    [
+        # test case 1: a \r\n split between two index chunks
+        (1, 1),
+        # test case 2: chunks not aligned with the lines
+        (3, 2),
+    ]
+)
+def test_text_file_returns_true_lines_match_across_chunks(mocker: Any, tmp_path: Path, index_chunk_size: int, decode_chunk_lines: int) -> None:
+    mocker.patch.object(parallel_corpus, "INDEX_CHUNK_SIZE", index_chunk_size)
+    mocker.patch.object(parallel_corpus, "DECODE_CHUNK_LINES", decode_chunk_lines)
+    path = write_bytes(tmp_path / "corpus.txt", "ab\r\ncd\re\n\nżółw\r\nx")
+
+    with TextFile(path, cache_index=False) as text_file:
+        assert list(text_file) == text_mode_lines(path)
+
+
+def test_text_file_raises_index_error_out_of_range(tmp_path: Path) -> None:
+    path = write_bytes(tmp_path / "corpus.txt", "a\nb\n")
+
+    with TextFile(path) as text_file:
+        assert text_file[-1] == "b"
+        with pytest.raises(IndexError):
+            text_file[2]
+
+
+def test_text_file_reuses_cached_index(mocker: Any, tmp_path: Path) -> None:
+    path = write_bytes(tmp_path / "corpus.txt", "a\nb\nc\n")
+    with TextFile(path):
+        pass
+    build_line_offsets = mocker.spy(parallel_corpus, "build_line_offsets")
+
+    with TextFile(path) as text_file:
+        assert list(text_file) == ["a", "b", "c"]
+
+    assert os.path.exists(path + INDEX_SUFFIX)
+    build_line_offsets.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "new_content, same_size",
+    [
+        # test case 1: size changed
+        ("a\nb\nc\nd\n", False),
+        # test case 2: same size, only the modification time changed
+        ("a\nbc\n\n", True),
+    ]
+)
+def test_text_file_rebuilds_index_when_file_changes(mocker: Any, tmp_path: Path, new_content: str, same_size: bool) -> None:
+    path = write_bytes(tmp_path / "corpus.txt", "a\nb\nc\n")
+    with TextFile(path):
+        pass
+    stat = os.stat(path)
+    write_bytes(tmp_path / "corpus.txt", new_content)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert (os.stat(path).st_size == stat.st_size) == same_size
+    build_line_offsets = mocker.spy(parallel_corpus, "build_line_offsets")
+
+    with TextFile(path) as text_file:
+        assert list(text_file) == text_mode_lines(path)
+
+    build_line_offsets.assert_called_once()
+
+
+def test_text_file_ignores_corrupted_index(tmp_path: Path) -> None:
+    path = write_bytes(tmp_path / "corpus.txt", "a\nb\n")
+    Path(path + INDEX_SUFFIX).write_bytes(b"garbage")
+
+    with TextFile(path) as text_file:
+        assert list(text_file) == ["a", "b"]
+
+
+def test_parallel_corpus_returns_true_aligned_pairs(tmp_path: Path) -> None:
+    source_path = write_bytes(tmp_path / "train.pol.txt", "Ala ma kota\nżółw\r\nkot\n")
+    target_path = write_bytes(tmp_path / "train.csb.txt", "Ala mô kòta\nżôłw\nkòt")
+
+    with ParallelCorpus(source_path, target_path) as corpus:
+        corpus.check_aligned()
+        assert len(corpus) == 3
+        assert list(corpus) == [("Ala ma kota", "Ala mô kòta"), ("żółw", "żôłw"), ("kot", "kòt")]
+        assert corpus[-1] == ("kot", "kòt")
+        assert corpus[1:] == [("żółw", "żôłw"), ("kot", "kòt")]
+
+
+def test_parallel_corpus_raises_value_error_on_length_mismatch(tmp_path: Path) -> None:
+    source_path = write_bytes(tmp_path / "train.pol.txt", "a\nb\nc\n")
+    target_path = write_bytes(tmp_path / "train.csb.txt", "d\n")
+
+    with ParallelCorpus(source_path, target_path) as corpus:
+        assert not corpus.is_aligned()
+        assert list(corpus) == [("a", "d")]
+        with pytest.raises(ValueError, match="first divergent line: 2"):
+            corpus.check_aligned()
@@ -0,0 +1,107 @@
+import pstats
+import time
+from logging import Logger
+from pathlib import Path
+
+import pytest
+import pandas as pd
+
+from data_processor.data_normalizer import DataNormalizer
+from data_processor.data_preparer import DataPreparer
+from data_processor.profiling import (CProfileProfiler, SamplingProfiler, TracemallocProfiler, create_profiler,
+                                      profile_name, use_profiler)
+from data_processor.scheduler import SplitScheduler
+from test.conftest import StubTokenizer
+
+pytestmark = pytest.mark.usefixtures("stub_tokenizer")
+
+
+@pytest.fixture
+def mock_logger(mocker):
+    return mocker.create_autospec(Logger, instance=True)
+
+
+def busy_loop(seconds: float) -> int:
+    total, end = 0, time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+def test_profile_name_returns_true_split_name() -> None:
+    assert profile_name("data/output/val_debug.tsv") == "val_debug"
+
+
+def test_create_profiler_raises_value_error_on_unknown_mode() -> None:
+    assert create_profiler(None).mode is None
+    with pytest.raises(ValueError, match="Unknown profile mode"):
+        create_profiler("perf")
+
+
+def test_cprofile_profiler_writes_merged_stats_per_name(tmp_path: Path) -> None:
+    profiler = CProfileProfiler()
+    for _ in range(2):
+        with profiler.profile("train"):
+            busy_loop(0.01)
+    worker = CProfileProfiler()
+    with worker.profile("train"):
+        busy_loop(0.01)
+    profiler.merge(worker.results())
+
+    assert profiler.write(str(tmp_path)) == [str(tmp_path / "train.pstats")]
+    calls = {function[2]: stats[0] for function, stats in pstats.Stats(str(tmp_path / "train.pstats")).stats.items()}
+    assert calls["busy_loop"] == 3
+    assert "busy_loop" in (tmp_path / "train.cprofile.txt").read_text(encoding="utf-8")
+
+
+def test_sampling_profiler_writes_collapsed_stacks(tmp_path: Path) -> None:
+    profiler = SamplingProfiler(interval=0.001)
+    with profiler.profile("train"):
+        busy_loop(0.2)
+
+    profiler.write(str(tmp_path))
+    lines = (tmp_path / "train.collapsed.txt").read_text(encoding="utf-8").splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stack.split(";")[-1] == "profiling_test.py:busy_loop"
+    assert int(count) > 0
+    assert "profiling_test.py:busy_loop" in (tmp_path / "train.sampling.txt").read_text(encoding="utf-8")
+
+
+def test_tracemalloc_profiler_writes_allocation_sites_of_every_stage(tmp_path: Path, mock_logger) -> None:
+    (tmp_path / "train.pol.txt").write_text("Ala ma kota\n" * 500, encoding="utf-8")
+    (tmp_path / "train.csb.txt").write_text("Ala mô kòta\n" * 500, encoding="utf-8")
+
+    with use_profiler(TracemallocProfiler()) as profiler, profiler.profile("train"):
+        train_df = DataPreparer(mock_logger).prepare_dataframe(str(tmp_path / "train.pol.txt"), str(tmp_path / "train.csb.txt"), "pol_Latn", "csb_Latn")
+        train_df = DataNormalizer(mock_logger).normalize_dataframe(train_df, StubTokenizer())
+
+    assert train_df.shape[0] == 500
+    assert profiler.write(str(tmp_path)) == [str(tmp_path / "train.tracemalloc.txt")]
+    report = (tmp_path / "train.tracemalloc.txt").read_text(encoding="utf-8")
+    prepare_report, normalize_report = report.split("\nprepare.dataframe: ")[1].split("\nnormalize.dataframe: ")
+    assert "data_preparer.py:" in prepare_report
+    assert "data_normalizer.py:" in normalize_report
+
+
+@pytest.mark.parametrize(
+    "jobs",
+    [
+        # test case 1: serial run
+        1,
+        # test case 2: profiles recorded in the worker processes
+        2,
+    ]
+)
+def test_scheduler_profiles_every_split(tmp_path: Path, mock_logger, jobs: int) -> None:
+    splits = [
+        ([pd.DataFrame({"pol_Latn": ["Ala ma kota", "Kot"] * 3, "csb_Latn": ["Ala mô kòta", "Kòt"] * 3})], str(tmp_path / name))
+        for name in ("train.tsv", "val.tsv")
+    ]
+
+    with use_profiler(CProfileProfiler()) as profiler:
+        SplitScheduler(mock_logger, jobs=jobs, shard_size=2).normalize(splits)
+
+    results = profiler.results()
+    assert set(results) == {"train", "val"}
+    for stats in results.values():
+        assert any(function[2] == "normalize_dataframe" for function in stats)
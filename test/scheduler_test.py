@@ -0,0 +1,124 @@
+from pathlib import Path
+from logging import Logger
+from typing import Any, List
+
+import pytest
+import pandas as pd
+
+from data_processor.data_normalizer import DataNormalizer
+from data_processor import scheduler
+from data_processor.scheduler import SplitScheduler, split_into_shards
+from data_processor.token_cache import TokenCache, tokenizer_fingerprint
+from test.conftest import StubTokenizer
+
+pytestmark = pytest.mark.usefixtures("stub_tokenizer")
+
+
+@pytest.fixture
+def mock_logger(mocker):
+    return mocker.create_autospec(Logger, instance=True)
+
+
+@pytest.fixture
+def splits() -> dict[str, pd.DataFrame]:
+    return {
+        "train": pd.DataFrame({
+            "pol_Latn": [f"Zdanie „{i}”" if i % 7 else "unknown" for i in range(50)],
+            "csb_Latn": [f"Zdónié «{i}»" if i % 5 else "bad\u200b" for i in range(50)]
+        }),
+        "test": pd.DataFrame({"pol_Latn": ["Ala ma kota"], "csb_Latn": ["Ala mô kòta"]}),
+        "dropped": pd.DataFrame({"pol_Latn": ["unknown"] * 3, "csb_Latn": ["Ala mô kòta"] * 3})
+    }
+
+
+@pytest.mark.parametrize(
+    "rows, shard_size, expected_shard_lengths",
+    [
+        # test case 1: rows split evenly
+        (4, 2, [2, 2]),
+        # test case 2: last shard is shorter
+        (5, 2, [2, 2, 1]),
+        # test case 3: empty dataset still produces a single shard
+        (0, 2, [0]),
+    ]
+)
+def test_split_into_shards_returns_true_shard_lengths_match(rows: int, shard_size: int, expected_shard_lengths: List[int]) -> None:
+    train_df = pd.DataFrame({"pol_Latn": ["a"] * rows, "csb_Latn": ["b"] * rows})
+
+    shards = split_into_shards(train_df, shard_size)
+
+    assert [shard.shape[0] for shard in shards] == expected_shard_lengths
+
+
+def test_normalize_in_parallel_returns_true_output_matches_serial_run(tmp_path: Path, mock_logger, splits: dict[str, pd.DataFrame]) -> None:
+    serial_splits = [([train_df], str(tmp_path / f"serial_{name}.tsv")) for name, train_df in splits.items()]
+    parallel_splits = [([train_df], str(tmp_path / f"parallel_{name}.tsv")) for name, train_df in splits.items()]
+
+    SplitScheduler(mock_logger, jobs=1).normalize(serial_splits)
+    SplitScheduler(mock_logger, jobs=2, shard_size=8).normalize(parallel_splits)
+
+    for (_, serial_output), (_, parallel_output) in zip(serial_splits, parallel_splits):
+        assert Path(parallel_output).read_bytes() == Path(serial_output).read_bytes()
+
+
+def test_normalize_returns_true_output_matches_intermediate_file_run(tmp_path: Path, mock_logger, splits: dict[str, pd.DataFrame]) -> None:
+    for name, train_df in splits.items():
+        intermediate_path = tmp_path / f"intermediate_{name}.tsv"
+        train_df.to_csv(intermediate_path, sep="\t")
+        DataNormalizer(mock_logger).normalize(str(intermediate_path), str(intermediate_path), StubTokenizer())
+
+    SplitScheduler(mock_logger).normalize([([train_df], str(tmp_path / f"fused_{name}.tsv")) for name, train_df in splits.items()])
+
+    for name in splits:
+        assert (tmp_path / f"fused_{name}.tsv").read_bytes() == (tmp_path / f"intermediate_{name}.tsv").read_bytes()
+
+
+def test_normalize_batches_returns_true_output_matches_single_batch_run(tmp_path: Path, mock_logger, splits: dict[str, pd.DataFrame]) -> None:
+    train_df = splits["train"]
+    batches = (train_df.iloc[start:start + 6] for start in range(0, train_df.shape[0], 6))
+
+    SplitScheduler(mock_logger).normalize([([train_df], str(tmp_path / "whole.tsv")), (batches, str(tmp_path / "batched.tsv"))])
+
+    assert (tmp_path / "batched.tsv").read_bytes() == (tmp_path / "whole.tsv").read_bytes()
+
+
+def test_normalize_does_not_write_output_when_batch_fails(tmp_path: Path, mock_logger) -> None:
+    def failing_batches():
+        yield pd.DataFrame({"pol_Latn": ["Ala ma kota"], "csb_Latn": ["Ala mô kòta"]})
+        raise ValueError("Source and target files have different lengths, first divergent line: 2")
+
+    output_path = tmp_path / "failed.tsv"
+    SplitScheduler(mock_logger).normalize([(failing_batches(), str(output_path))])
+
+    mock_logger.error.assert_called_with(f"Normalization failed, {output_path} will not be written: Source and target files have different lengths, first divergent line: 2")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_parallel_run_advances_token_cache_clock_once_and_closes_it(tmp_path: Path, mock_logger, splits: dict[str, pd.DataFrame]) -> None:
+    token_cache_path = str(tmp_path / "tokens.sqlite")
+    parallel_splits = [([train_df], str(tmp_path / f"{name}.tsv")) for name, train_df in splits.items()]
+
+    SplitScheduler(mock_logger, jobs=2, shard_size=8, token_cache_path=token_cache_path).normalize(parallel_splits)
+
+    # Every worker closed its connection, the last one to close removes the write-ahead log
+    assert not Path(token_cache_path + "-wal").exists()
+    cache = TokenCache(token_cache_path, tokenizer_fingerprint(StubTokenizer()))
+    assert cache.clock == 2
+    assert len(cache) > 0
+    cache.close()
+
+
+def test_parallel_run_reads_batches_lazily_in_order(tmp_path: Path, mock_logger, mocker: Any) -> None:
+    collected = mocker.spy(scheduler, "_shard_result")
+    results_before_read = []
+
+    def batches():
+        for index in range(8):
+            results_before_read.append(collected.call_count)
+            yield pd.DataFrame({"pol_Latn": [f"Zdanie {index}"], "csb_Latn": [f"Zdónié {index}"]})
+
+    SplitScheduler(mock_logger, jobs=2, shard_size=1).normalize([(batches(), str(tmp_path / "train.tsv"))])
+
+    # Two workers have at most four shards in flight, a batch is read once the oldest shard was collected
+    assert results_before_read == [0, 0, 0, 0, 1, 2, 3, 4]
+    assert (tmp_path / "train.tsv").read_text(encoding="utf-8").splitlines()[1:] == [f"{index}\tZdanie {index}\tZdónié {index}" for index in range(8)]
@@ -0,0 +1,66 @@
+import asyncio
+import io
+
+import pytest
+
+from scrapers import sloworz
+from scrapers.graphql_batch import GraphQLBatcher
+from scrapers.utils import Transport
+from test.conftest import ENTRY_COUNT, StubGraphQLServer, stub_entry
+
+
+def write_entries_serially(entry_ids) -> tuple:
+    pl_file, csb_file, csb_sentences_file = io.StringIO(), io.StringIO(), io.StringIO()
+    for entry_id in entry_ids:
+        sloworz.save_kashubian_entry(pl_file, csb_file, csb_sentences_file, stub_entry(entry_id))
+    return pl_file.getvalue(), csb_file.getvalue(), csb_sentences_file.getvalue()
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_fetch_and_save_phrases_async_returns_true_ordered_output(stub_server: StubGraphQLServer, concurrency: int) -> None:
+    pl_file, csb_file, csb_sentences_file = io.StringIO(), io.StringIO(), io.StringIO()
+
+    asyncio.run(sloworz.fetch_and_save_phrases_with_translations_async(
+        pl_file, csb_file, csb_sentences_file, limit=10, concurrency=concurrency, batch_size=3, pages_per_request=2,
+        url=stub_server.url
+    ))
+
+    assert (pl_file.getvalue(), csb_file.getvalue(), csb_sentences_file.getvalue()) == write_entries_serially(range(ENTRY_COUNT))
+    assert stub_server.max_in_flight <= concurrency + 1
+    assert len(pl_file.getvalue().splitlines()) == len(csb_file.getvalue().splitlines())
+
+
+def test_fetch_and_save_phrases_async_runs_requests_concurrently(stub_server: StubGraphQLServer) -> None:
+    asyncio.run(sloworz.fetch_and_save_phrases_with_translations_async(
+        io.StringIO(), io.StringIO(), io.StringIO(), limit=ENTRY_COUNT, concurrency=4, batch_size=2, url=stub_server.url
+    ))
+
+    assert stub_server.max_in_flight > 1
+
+
+def test_fetch_and_save_phrases_async_batches_lookups(stub_server: StubGraphQLServer) -> None:
+    asyncio.run(sloworz.fetch_and_save_phrases_with_translations_async(
+        io.StringIO(), io.StringIO(), io.StringIO(), limit=10, batch_size=10, pages_per_request=4, url=stub_server.url
+    ))
+
+    # One request lists all 4 pages of IDs, the last of them empty, then one request per page of 10 entries
+    assert stub_server.requests == 1 + 3
+
+
+def test_fetch_and_save_phrases_async_sends_requests_from_the_event_loop(stub_server: StubGraphQLServer, mocker) -> None:
+    request = mocker.spy(Transport, "request")
+    request_async = mocker.spy(Transport, "request_async")
+
+    asyncio.run(sloworz.fetch_and_save_phrases_with_translations_async(
+        io.StringIO(), io.StringIO(), io.StringIO(), limit=10, batch_size=10, pages_per_request=4, url=stub_server.url
+    ))
+
+    request.assert_not_called()
+    assert request_async.call_count == stub_server.requests
+
+
+def test_fetch_kashubian_entry_id_pages_async_stops_listing_at_empty_pages(stub_server: StubGraphQLServer) -> None:
+    pages = asyncio.run(sloworz.fetch_kashubian_entry_id_pages_async(1, 3, 10, GraphQLBatcher(stub_server.url)))
+
+    assert pages == [list(range(10, 20)), list(range(20, ENTRY_COUNT)), []]
+    assert stub_server.requests == 1
@@ -0,0 +1,93 @@
+from pathlib import Path
+from logging import Logger
+from typing import Any
+
+import pytest
+import pandas as pd
+
+from data_processor.data_normalizer import DataNormalizer
+from data_processor.token_cache import TokenCache, text_key, tokenizer_fingerprint
+from test.conftest import StubTokenizer
+
+
+@pytest.fixture
+def mock_logger(mocker):
+    return mocker.create_autospec(Logger, instance=True)
+
+
+@pytest.fixture
+def cache_path(tmp_path: Path) -> str:
+    return str(tmp_path / "cache" / "tokens.sqlite")
+
+
+def test_get_many_returns_true_stored_entries(cache_path: str) -> None:
+    cache = TokenCache(cache_path, "fingerprint")
+    cache.put_many({text_key("a"): ([1, 2, 3], False), text_key("b"): ([0], True)})
+
+    result = cache.get_many([text_key("a"), text_key("b"), text_key("c")])
+
+    assert result == {text_key("a"): ([1, 2, 3], False), text_key("b"): ([0], True)}
+
+
+def test_cache_persists_across_instances(cache_path: str) -> None:
+    cache = TokenCache(cache_path, "fingerprint")
+    cache.put_many({text_key("a"): ([1], False)})
+    cache.close()
+
+    assert len(TokenCache(cache_path, "fingerprint")) == 1
+
+
+def test_cache_is_invalidated_when_fingerprint_changes(cache_path: str) -> None:
+    cache = TokenCache(cache_path, "fingerprint")
+    cache.put_many({text_key("a"): ([1], False)})
+    cache.close()
+
+    cache = TokenCache(cache_path, "other fingerprint")
+
+    assert len(cache) == 0
+    assert cache.get_many([text_key("a")]) == {}
+
+
+def test_put_many_evicts_least_recently_used_entries(cache_path: str) -> None:
+    TokenCache(cache_path, "fingerprint", max_entries=2).put_many({text_key("a"): ([1], False), text_key("b"): ([2], False)})
+    cache = TokenCache(cache_path, "fingerprint", max_entries=2)
+    cache.get_many([text_key("a")])
+
+    cache.put_many({text_key("c"): ([3], False)})
+
+    assert set(cache.get_many([text_key("a"), text_key("b"), text_key("c")])) == {text_key("a"), text_key("c")}
+
+
+@pytest.mark.parametrize(
+    "attribute, value",
+    [
+        # test case 1: different special tokens
+        ("all_special_tokens", ["<unk>"]),
+        # test case 2: different unknown token
+        ("unk_token_id", 3),
+        # test case 3: different model
+        ("name_or_path", "other"),
+    ]
+)
+def test_tokenizer_fingerprint_changes_with_tokenizer(attribute: str, value: Any) -> None:
+    tokenizer = StubTokenizer()
+    fingerprint = tokenizer_fingerprint(tokenizer)
+
+    setattr(tokenizer, attribute, value)
+
+    assert tokenizer_fingerprint(tokenizer) != fingerprint
+
+
+def test_find_unknown_tokens_tokenizes_only_cache_misses(cache_path: str, mock_logger) -> None:
+    tokenizer = StubTokenizer()
+    cache = TokenCache.for_tokenizer(cache_path, tokenizer)
+    normalizer = DataNormalizer(logger=mock_logger, token_cache=cache)
+
+    first_df = pd.DataFrame({"csb_Latn": ["unknown", "known", "known"], "pol_Latn": ["known", "known", "known"]})
+    normalizer._DataNormalizer__find_unknown_tokens(tokenizer, first_df)
+    second_df = pd.DataFrame({"csb_Latn": ["unknown", "known", "new unknown"], "pol_Latn": ["known", "new", "known"]})
+    unknown_tokens = normalizer._DataNormalizer__find_unknown_tokens(tokenizer, second_df)
+
+    assert tokenizer.calls == [["unknown", "known"], ["new unknown"], ["new"]]
+    assert unknown_tokens.csb_Latn.tolist() == [True, False, True]
+    assert unknown_tokens.pol_Latn.tolist() == [False, False, False]
@@ -0,0 +1,69 @@
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+from tokenizers import Tokenizer, models, pre_tokenizers
+from transformers import NllbTokenizerFast
+
+from data_processor.token_cache import tokenizer_fingerprint
+from data_processor.tokenizer_provider import (TokenizerProvider, configure_tokenizer, get_tokenizer_provider,
+                                               serialized_tokenizer_dir, use_tokenizer_provider)
+
+
+VOCABULARY = ["<s>", "<pad>", "</s>", "<unk>", "ala", "ma", "kota", "eng_Latn", "pol_Latn", "<mask>"]
+
+
+@pytest.fixture
+def model_dir(tmp_path: Path) -> str:
+    # A tiny word level tokenizer saved like a local copy of the NLLB model
+    backend = Tokenizer(models.WordLevel({word: index for index, word in enumerate(VOCABULARY)}, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    path = str(tmp_path / "model")
+    NllbTokenizerFast(tokenizer_object=backend).save_pretrained(path)
+    return path
+
+
+def test_provider_loads_tokenizer_once(model_dir: str) -> None:
+    provider = TokenizerProvider(model_dir)
+
+    tokenizer = provider.get()
+
+    assert provider.get() is tokenizer
+    assert "csb_Latn" in tokenizer.all_special_tokens
+    assert tokenizer("ala ma csb_Latn").input_ids[-2] == tokenizer.convert_tokens_to_ids("csb_Latn")
+
+
+def test_provider_loads_serialized_tokenizer_from_cache(tmp_path: Path, model_dir: str, mocker: Any) -> None:
+    cache_dir = str(tmp_path / "cache")
+    built = TokenizerProvider(model_dir, cache_dir).get()
+    serialized_dir = serialized_tokenizer_dir(cache_dir, model_dir)
+    assert os.path.isfile(os.path.join(serialized_dir, "tokenizer.json"))
+
+    from_pretrained = mocker.spy(NllbTokenizerFast, "from_pretrained")
+    loaded = TokenizerProvider(model_dir, cache_dir).get()
+
+    assert from_pretrained.call_args.args[0] == serialized_dir
+    assert loaded("ala ma kota csb_Latn").input_ids == built("ala ma kota csb_Latn").input_ids
+    # The token cache stays valid no matter where the tokenizer was loaded from
+    assert tokenizer_fingerprint(loaded) == tokenizer_fingerprint(built)
+
+
+def test_serialized_tokenizer_dir_changes_with_model_files(tmp_path: Path, model_dir: str) -> None:
+    cache_dir = str(tmp_path / "cache")
+    serialized_dir = serialized_tokenizer_dir(cache_dir, model_dir)
+
+    with open(os.path.join(model_dir, "tokenizer_config.json"), "a", encoding="utf-8") as file:
+        file.write("\n")
+
+    assert serialized_tokenizer_dir(cache_dir, model_dir) != serialized_dir
+    assert serialized_tokenizer_dir(cache_dir, None) != serialized_dir
+
+
+def test_configure_tokenizer_keeps_provider_with_same_settings(model_dir: str) -> None:
+    with use_tokenizer_provider(TokenizerProvider()):
+        provider = configure_tokenizer(model_dir, None)
+
+        assert configure_tokenizer(model_dir, None) is provider
+        assert configure_tokenizer(model_dir, "cache") is not provider
+        assert get_tokenizer_provider().cache_dir == "cache"
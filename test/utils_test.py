@@ -0,0 +1,173 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+import pytest
+import requests
+from pytest_mock import MockerFixture
+
+from data_processor.instrumentation import Recorder, use_recorder
+from scrapers.utils import TokenBucket, Transport, retry_after_delay, send_request_with_retries
+
+
+class ScriptedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ScriptedHandler)
+        self.statuses: List[int] = []
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        server = self.server
+        server.requests += 1
+        status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+
+@pytest.fixture
+def scripted_server() -> Iterator[ScriptedServer]:
+    server = ScriptedServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def response_with_headers(headers: dict) -> requests.Response:
+    response = requests.Response()
+    response.headers.update(headers)
+    return response
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        # test case 1: delay in seconds
+        ({"Retry-After": "7"}, 7.0),
+        # test case 2: date in the past
+        ({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0.0),
+        # test case 3: no header
+        ({}, None),
+        # test case 4: malformed header
+        ({"Retry-After": "soon"}, None),
+    ]
+)
+def test_retry_after_delay(headers: dict, expected) -> None:
+    assert retry_after_delay(response_with_headers(headers)) == expected
+
+
+def test_backoff_delay_honors_retry_after_and_caps_jitter() -> None:
+    transport = Transport(base_delay=1, max_delay=5)
+
+    assert transport.backoff_delay(1, response_with_headers({"Retry-After": "3"})) == 3.0
+    assert transport.backoff_delay(1, response_with_headers({"Retry-After": "30"})) == 5.0
+    assert all(0 <= transport.backoff_delay(attempt, None) <= min(5, 2 ** (attempt - 1)) for attempt in range(1, 10))
+
+
+def test_token_bucket_spaces_requests_after_burst(mocker: MockerFixture) -> None:
+    mocker.patch("scrapers.utils.time.monotonic", return_value=100.0)
+    bucket = TokenBucket(rate=2.0, capacity=2)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+
+
+@pytest.mark.parametrize(
+    "statuses, expected_ok, expected_requests, expected_retries",
+    [
+        # test case 1: transient server errors are retried
+        ([503, 500], True, 3, 2),
+        # test case 2: rate limited responses are retried
+        ([429], True, 2, 1),
+        # test case 3: client errors are not retried
+        ([404], False, 1, 0),
+        # test case 4: retries run out
+        ([503, 503, 503], False, 3, 2),
+    ]
+)
+def test_request_retries_only_retryable_failures(scripted_server: ScriptedServer, statuses: List[int], expected_ok: bool,
+                                                 expected_requests: int, expected_retries: int) -> None:
+    scripted_server.statuses = statuses
+    transport = Transport(retries=3, base_delay=0, rate=None)
+
+    response = transport.request(scripted_server.url)
+
+    assert (response is not None) == expected_ok
+    assert scripted_server.requests == expected_requests
+    summary = transport.stats.summary()
+    assert summary["requests"] == expected_requests
+    assert summary["retries"] == expected_retries
+    assert summary["failures"] == (0 if expected_ok else 1)
+
+
+@pytest.mark.parametrize(
+    "statuses, expected_status",
+    [
+        # test case 1: missing page
+        ([404], 404),
+        # test case 2: server errors are still failures
+        ([503, 503, 503], None),
+        # test case 3: rate limited until the retries run out
+        ([429, 429, 429], None),
+    ]
+)
+def test_request_returns_permanent_client_errors_when_accepted(scripted_server: ScriptedServer, statuses: List[int], expected_status: int) -> None:
+    scripted_server.statuses = statuses
+    transport = Transport(retries=3, base_delay=0, rate=None)
+
+    response = transport.request(scripted_server.url, accept_client_errors=True)
+
+    assert (response.status_code if response is not None else None) == expected_status
+    assert transport.stats.summary()["failures"] == 1
+
+
+def test_send_request_with_retries_overrides_transport_policy(scripted_server: ScriptedServer, mocker: MockerFixture) -> None:
+    scripted_server.statuses = [503, 503, 503]
+    sleep = mocker.patch("scrapers.utils.time.sleep")
+    transport = Transport(retries=6, base_delay=10, rate=None)
+
+    response = send_request_with_retries(scripted_server.url, retries=2, delay=0.5, transport=transport)
+
+    assert response is None
+    assert scripted_server.requests == 2
+    sleep.assert_any_call(0.5)
+
+
+def test_request_async_retries_and_returns_response(scripted_server: ScriptedServer) -> None:
+    scripted_server.statuses = [502]
+    transport = Transport(retries=3, base_delay=0, rate=None)
+
+    response = asyncio.run(transport.request_async(scripted_server.url))
+
+    assert response.text == "ok"
+    assert transport.stats.summary()["retries"] == 1
+
+
+def test_request_records_a_span_per_attempt(scripted_server: ScriptedServer) -> None:
+    scripted_server.statuses = [503, 200]
+    transport = Transport(retries=3, base_delay=0, rate=None)
+
+    with use_recorder(Recorder()) as recorder:
+        transport.request(scripted_server.url)
+
+    spans = recorder.spans
+    assert [span.name for span in spans] == ["scraper.request", "scraper.request"]
+    assert [span.attributes["status"] for span in spans] == [503, 200]
+    assert [span.attributes["attempt"] for span in spans] == [1, 2]
+    assert [span.bytes_read for span in spans] == [2, 2]
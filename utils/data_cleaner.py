@@ -1,5 +1,51 @@
+import argparse
 import os
 import re
+import sys
+
+# The script is run from the utils directory, the repository root makes the data_processor and utils packages importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_processor.parallel_corpus import ParallelCorpus  # noqa: E402
+from utils.hash_dedup import DEFAULT_HASH_BITS, deduplicate_pairs  # noqa: E402
+
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def build_phrase_trie(phrases):
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for character in phrase:
+            node = node.setdefault(character, {})
+        node[''] = {}
+    return trie
+
+
+def trie_to_pattern(node):
+    branches = [re.escape(character) + trie_to_pattern(child) for character, child in sorted(node.items()) if character]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    return f'(?:{pattern})?' if '' in node else pattern
+
+
+def compile_phrases(phrases):
+    # One regex matching any of the phrases, shaped as a trie so that a shared prefix is matched once for all the
+    # phrases starting with it instead of once per phrase
+    return re.compile(trie_to_pattern(build_phrase_trie(phrases)))
+
+
+def remove_phrases(line, phrases, phrase_pattern):
+    line = line.strip()
+    # A single scan settles the lines without any of the phrases. The others still remove the phrases one after
+    # another, as removing one of them can join the text around it into a phrase further down the list.
+    if phrase_pattern.search(line) is None:
+        return line
+    for phrase in phrases:
+        line = line.replace(phrase, '').strip()
+    return line
 
 
 def remove_matching_phrases(polish_file_path, kashubian_file_path, search_phrases, search_in='both'):
@@ -8,29 +54,27 @@ def remove_matching_phrases(polish_file_path, kashubian_file_path, search_phrase
 
     temp_polish_path = polish_file_path + '.tmp'
     temp_kashubian_path = kashubian_file_path + '.tmp'
+    phrase_pattern = compile_phrases(search_phrases)
 
-    with open(polish_file_path, 'r', encoding='utf-8') as polish_file, \
-            open(kashubian_file_path, 'r', encoding='utf-8') as kashubian_file, \
+    with ParallelCorpus(polish_file_path, kashubian_file_path) as corpus, \
             open(temp_polish_path, 'w', encoding='utf-8') as temp_polish_file, \
             open(temp_kashubian_path, 'w', encoding='utf-8') as temp_kashubian_file:
 
-        for polish_line, kashubian_line in zip(polish_file, kashubian_file):
+        for polish_line, kashubian_line in corpus:
             modified_polish_line = polish_line.strip()
             modified_kashubian_line = kashubian_line.strip()
 
             if search_in in ['polish', 'both']:
-                for phrase in search_phrases:
-                    modified_polish_line = modified_polish_line.replace(phrase, '').strip()
+                modified_polish_line = remove_phrases(modified_polish_line, search_phrases, phrase_pattern)
 
             if search_in in ['kashubian', 'both']:
-                for phrase in search_phrases:
-                    modified_kashubian_line = modified_kashubian_line.replace(phrase, '').strip()
+                modified_kashubian_line = remove_phrases(modified_kashubian_line, search_phrases, phrase_pattern)
 
             if not modified_polish_line or not modified_kashubian_line or len(modified_polish_line) < 2 or len(modified_kashubian_line) < 2:
                 continue  # We don't want empty nor one-letter lines
 
-            modified_kashubian_line = re.sub(r'\s+', ' ', modified_kashubian_line)
-            modified_polish_line = re.sub(r'\s+', ' ', modified_polish_line)
+            modified_kashubian_line = WHITESPACE_PATTERN.sub(' ', modified_kashubian_line)
+            modified_polish_line = WHITESPACE_PATTERN.sub(' ', modified_polish_line)
 
             temp_polish_file.write(modified_polish_line + '\n')
             temp_kashubian_file.write(modified_kashubian_line + '\n')
@@ -39,70 +83,55 @@ def remove_matching_phrases(polish_file_path, kashubian_file_path, search_phrase
     os.replace(temp_kashubian_path, kashubian_file_path)
 
 
-def remove_duplicated_phrases(polish_file_path, kashubian_file_path):
-    temp_polish_path = polish_file_path + '.tmp'
-    temp_kashubian_path = kashubian_file_path + '.tmp'
-
-    seen_phrases = set()
-    polish_content = []
-    kashubian_content = []
-
-    with open(polish_file_path, 'r', encoding='utf-8') as polish_file, \
-            open(kashubian_file_path, 'r', encoding='utf-8') as kashubian_file:
-
-        for polish_line, kashubian_line in zip(polish_file, kashubian_file):
-            polish_line = polish_line.strip()
-            kashubian_line = kashubian_line.strip()
-
-            line_pair = (polish_line, kashubian_line)
-
-            if line_pair not in seen_phrases:
-                seen_phrases.add(line_pair)
-                polish_content.append(polish_line + '\n')
-                kashubian_content.append(kashubian_line + '\n')
-
-    with open(temp_polish_path, 'w', encoding='utf-8') as temp_polish_file, \
-            open(temp_kashubian_path, 'w', encoding='utf-8') as temp_kashubian_file:
-        temp_polish_file.writelines(polish_content)
-        temp_kashubian_file.writelines(kashubian_content)
-
-    os.replace(temp_polish_path, polish_file_path)
-    os.replace(temp_kashubian_path, kashubian_file_path)
-
-
-def clean_data():
-    phrases_to_remove = [
-        'GNOME', 'File', '_', 'Launchpad Contributions: Mark Kwidzińsczi https://launchpad.net/~kaszeba', 'view-type',
-        'view-size', 'item-set', 'undo-type', 'thumbnail-size', 'dash-preset', 'ink-blob-type', 'GIMP', '%s', '%d', ':',
-        'cap-style', 'join-style', 'fill-type', 'align-reference-type', 'convert-palette-type', '...', '""', '^', '\'',
-        'convert-dither-type', 'cursor-format', 'handedness', 'window-hint', 'help-browser-type', 'Date Modified', '%',
-        'zoom-quality', 'space-bar-action', 'canvas-padding-mode', 'cursor-mode', 'layer-mode-effects', '7zip', 'ACE',
-        'curve-type', 'color-frame-mode', 'histogram-channel', 'message-severity', 'windows-action', '(', ')', 'command',
-        'view-padding-color', 'view-zoom-action', 'view-action', 'vectors-action', 'tools-action', 'text-editor-action',
-        'tool-presets-action', 'text-tool-action', 'tool-options-action', 'split into volumes of 10.0 MB', '&', '[', ']',
-        'templates-action', 'select-action', 'plug-in-action', 'patterns-action', 'palettes-action', '1', '2', '3', '4',
-        '5', '6', '7', '8', '9', '0', '+', 'ColorSmart', 'QSQLiteResult', 'QMYSQLResult', 'QRegExp', 'QIODevice', '/',
-        'palette-editor-action', 'layers-action', 'image-convert-action', 'gradients-action', 'gradient-editor-coloring',
-        'gradient-editor-action', 'gradient-editor-color-type', 'file-action', 'edit-action', 'transform-type', 'action',
-        'dynamics-action', 'image-action', 'drawable-action', 'undo-desc', 'documents-action', 'sample-points-action',
-        'dockable-action', 'tab-style', 'preview-size', 'dock-action', 'dialogs-action', 'cursor-info-action', 'inmenu',
-        'context-action', 'config-action', 'colormap-action', 'channels-action', 'buffers-action', 'The quality of music',
-        'brushes-action', 'dynamics-output-type', 'select-criterion', 'vector-mode', 'tool-preset-editor-action', 'Number',
-        'quick-mask-action', 'images-action', 'help-action', 'gradient-editor-blending', 'phrase', 'fonts-action', 'entries'
-        'error-console-action', 'dynamics-editor-action', 'pre', 'brush-editor-action', 'fill-style', 'stroke-method', '×',
-        'QPrintPreviewDialog', 'QShortcut', '*', 'NativeSocketEngine', 'context menu item', 'QSystemSemaphore', 'column'
-        'Media controller element', 'PulseAudio', 'QIBaseResult', 'QIBaseDriver', 'QUnicodeControlCharacterMenu', 'window',
-        'QFontDatabase', 'MB', 'QNetworkAccessBackend', 'QNetworkAccessDebugPipeBackend', 'QNetworkReply', '@', 'title',
-        'QSocksSocketEngine', 'Name', 'Description', 'Comment', 'item Undo action item', 'XLIFF mark type', 'info tooltip',
-        'dpi x dpi', 'x dpi', 'x DPI', 'Media', 'time', 'description', 'QDialogButtonBox', 'View', 'item', 'inlistbox',
-        'ShortPossessive', 'month', 'National', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'rich',
-        'Sunday', 'LongPossessive', 'Short', 'weekday', 'Day', 'Long', 'Ethiopian', '‘', '’', '”', '“', 'filename', 'plain',
-        "\" \"", 'image'
-    ]
+def remove_duplicated_phrases(polish_file_path, kashubian_file_path, near_duplicates=False, hash_bits=DEFAULT_HASH_BITS,
+                              external=False):
+    # Streams the pairs and keeps only fixed width hashes of the ones already written, see utils.hash_dedup
+    return deduplicate_pairs(polish_file_path, kashubian_file_path, near_duplicates=near_duplicates, hash_bits=hash_bits,
+                             external=external)
+
+
+phrases_to_remove = [
+    'GNOME', 'File', '_', 'Launchpad Contributions: Mark Kwidzińsczi https://launchpad.net/~kaszeba', 'view-type',
+    'view-size', 'item-set', 'undo-type', 'thumbnail-size', 'dash-preset', 'ink-blob-type', 'GIMP', '%s', '%d', ':',
+    'cap-style', 'join-style', 'fill-type', 'align-reference-type', 'convert-palette-type', '...', '""', '^', '\'',
+    'convert-dither-type', 'cursor-format', 'handedness', 'window-hint', 'help-browser-type', 'Date Modified', '%',
+    'zoom-quality', 'space-bar-action', 'canvas-padding-mode', 'cursor-mode', 'layer-mode-effects', '7zip', 'ACE',
+    'curve-type', 'color-frame-mode', 'histogram-channel', 'message-severity', 'windows-action', '(', ')', 'command',
+    'view-padding-color', 'view-zoom-action', 'view-action', 'vectors-action', 'tools-action', 'text-editor-action',
+    'tool-presets-action', 'text-tool-action', 'tool-options-action', 'split into volumes of 10.0 MB', '&', '[', ']',
+    'templates-action', 'select-action', 'plug-in-action', 'patterns-action', 'palettes-action', '1', '2', '3', '4',
+    '5', '6', '7', '8', '9', '0', '+', 'ColorSmart', 'QSQLiteResult', 'QMYSQLResult', 'QRegExp', 'QIODevice', '/',
+    'palette-editor-action', 'layers-action', 'image-convert-action', 'gradients-action', 'gradient-editor-coloring',
+    'gradient-editor-action', 'gradient-editor-color-type', 'file-action', 'edit-action', 'transform-type', 'action',
+    'dynamics-action', 'image-action', 'drawable-action', 'undo-desc', 'documents-action', 'sample-points-action',
+    'dockable-action', 'tab-style', 'preview-size', 'dock-action', 'dialogs-action', 'cursor-info-action', 'inmenu',
+    'context-action', 'config-action', 'colormap-action', 'channels-action', 'buffers-action', 'The quality of music',
+    'brushes-action', 'dynamics-output-type', 'select-criterion', 'vector-mode', 'tool-preset-editor-action', 'Number',
+    'quick-mask-action', 'images-action', 'help-action', 'gradient-editor-blending', 'phrase', 'fonts-action', 'entries'
+    'error-console-action', 'dynamics-editor-action', 'pre', 'brush-editor-action', 'fill-style', 'stroke-method', '×',
+    'QPrintPreviewDialog', 'QShortcut', '*', 'NativeSocketEngine', 'context menu item', 'QSystemSemaphore', 'column'
+    'Media controller element', 'PulseAudio', 'QIBaseResult', 'QIBaseDriver', 'QUnicodeControlCharacterMenu', 'window',
+    'QFontDatabase', 'MB', 'QNetworkAccessBackend', 'QNetworkAccessDebugPipeBackend', 'QNetworkReply', '@', 'title',
+    'QSocksSocketEngine', 'Name', 'Description', 'Comment', 'item Undo action item', 'XLIFF mark type', 'info tooltip',
+    'dpi x dpi', 'x dpi', 'x DPI', 'Media', 'time', 'description', 'QDialogButtonBox', 'View', 'item', 'inlistbox',
+    'ShortPossessive', 'month', 'National', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'rich',
+    'Sunday', 'LongPossessive', 'Short', 'weekday', 'Day', 'Long', 'Ethiopian', '‘', '’', '”', '“', 'filename', 'plain',
+    "\" \"", 'image'
+]
+
+
+def clean_data(near_duplicates=False, hash_bits=DEFAULT_HASH_BITS, external=False):
     polish_file = '../data/input/dataset.pl.txt'
     kashubian_file = '../data/input/dataset.csb.txt'
     remove_matching_phrases(polish_file, kashubian_file, phrases_to_remove, 'both')
-    remove_duplicated_phrases(polish_file, kashubian_file)
+    remove_duplicated_phrases(polish_file, kashubian_file, near_duplicates, hash_bits, external)
 
 
-clean_data()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove noise phrases and duplicated pairs from the dataset")
+    parser.add_argument("--near-duplicates", action="store_true",
+                        help="Treat pairs differing only in case, punctuation or whitespace as duplicates")
+    parser.add_argument("--hash-bits", type=int, choices=[64, 128], default=DEFAULT_HASH_BITS)
+    parser.add_argument("--external", action="store_true", help="Deduplicate with an external sort on disk")
+    args = parser.parse_args()
+    clean_data(args.near_duplicates, args.hash_bits, args.external)
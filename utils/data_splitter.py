@@ -1,44 +1,99 @@
-import random
+import argparse
+import hashlib
+import heapq
+import os
+import sys
+from bisect import bisect_right
+from contextlib import ExitStack
+from typing import Dict, Iterator, List, Tuple
 
+# The script is run from the utils directory, the repository root makes the data_processor package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def load_sentences(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        sentences = f.readlines()
-    return sentences
+from data_processor.parallel_corpus import ParallelCorpus  # noqa: E402
 
 
-def save_sentences(file_path, sentences):
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.writelines(sentences)
+SPLITS = ['train', 'val', 'test']
+DEBUG_SPLIT = 'val_debug'
+SOURCE_EXTENSION = 'pol'
+TARGET_EXTENSION = 'csb'
+HASH_RANGE = 1 << 64
+DEFAULT_SEED = 0
+DEFAULT_VAL_DEBUG_SIZE = 3
 
 
-def split_data(train_size=0.8, val_size=0.1, test_size=0.1):
-    src_sentences = load_sentences('dataset.csb.txt')
-    trg_sentences = load_sentences('dataset.pl.txt')
-    assert len(src_sentences) == len(trg_sentences), "Source and target files must have the same number of sentences."
+def pair_hash(polish_line, kashubian_line, seed, purpose='split'):
+    # Depends only on the content of the pair, so a pair lands in the same split whenever the corpora are re-scraped
+    text = f"{seed}\n{purpose}\n{polish_line.strip()}\n{kashubian_line.strip()}"
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
 
-    num_sentences = len(src_sentences)
-    indices = list(range(num_sentences))
-    random.shuffle(indices)
 
-    train_split = int(train_size * num_sentences)
-    val_split = int(val_size * num_sentences)
+def read_corpus(prefix) -> Iterator[Tuple[str, str]]:
+    # A corpus is a pair of line aligned files, <prefix>.pl.txt and <prefix>.csb.txt
+    with ParallelCorpus(f'{prefix}.pl.txt', f'{prefix}.csb.txt') as corpus:
+        for polish_line, kashubian_line in corpus:
+            yield polish_line + '\n', kashubian_line + '\n'
 
-    train_indices = indices[:train_split]
-    val_indices = indices[train_split:train_split + val_split]
-    test_indices = indices[train_split + val_split:]
 
-    train_src = [src_sentences[i] for i in train_indices]
-    train_trg = [trg_sentences[i] for i in train_indices]
-    save_sentences('../data/input/train.src', train_src)
-    save_sentences('../data/input/train.trg', train_trg)
+def split_bounds(ratios) -> List[int]:
+    # Upper hash bounds of every split but the last one. They do not depend on the corpora, so every corpus is split in
+    # roughly the requested ratios and a pair keeps its split when the corpora gain or lose other pairs.
+    bounds, cumulative = [], 0.0
+    for ratio in ratios[:-1]:
+        cumulative += ratio
+        bounds.append(int(cumulative * HASH_RANGE))
+    return bounds
 
-    val_src = [src_sentences[i] for i in val_indices]
-    val_trg = [trg_sentences[i] for i in val_indices]
-    save_sentences('../data/input/val.src', val_src)
-    save_sentences('../data/input/val.trg', val_trg)
 
-    test_src = [src_sentences[i] for i in test_indices]
-    test_trg = [trg_sentences[i] for i in test_indices]
-    save_sentences('../data/input/test.src', test_src)
-    save_sentences('../data/input/test.trg', test_trg)
+def split_data(train_size=0.8, val_size=0.1, test_size=0.1, corpora=('../data/input/dataset',), output_dir='../data/input',
+               seed=DEFAULT_SEED, val_debug_size=DEFAULT_VAL_DEBUG_SIZE) -> Dict[str, int]:
+    ratios = [train_size, val_size, test_size]
+    if abs(sum(ratios) - 1.0) > 1e-9:
+        raise ValueError("train_size, val_size and test_size must sum up to 1")
+
+    counts = {split: 0 for split in SPLITS + [DEBUG_SPLIT]}
+    # The val_debug pairs are the val pairs with the lowest hashes, kept in a bounded max-heap while streaming
+    val_debug = []
+    with ExitStack() as stack:
+        outputs = {
+            split: [stack.enter_context(open(os.path.join(output_dir, f'{split}.{extension}.txt'), 'w', encoding='utf-8'))
+                    for extension in (SOURCE_EXTENSION, TARGET_EXTENSION)]
+            for split in SPLITS
+        }
+        bounds = split_bounds(ratios)
+        for prefix in corpora:
+            for polish_line, kashubian_line in read_corpus(prefix):
+                split = SPLITS[bisect_right(bounds, pair_hash(polish_line, kashubian_line, seed))]
+                polish_file, kashubian_file = outputs[split]
+                polish_file.write(polish_line)
+                kashubian_file.write(kashubian_line)
+                counts[split] += 1
+                if split == 'val' and val_debug_size > 0:
+                    entry = (-pair_hash(polish_line, kashubian_line, seed, DEBUG_SPLIT), polish_line, kashubian_line)
+                    if len(val_debug) < val_debug_size:
+                        heapq.heappush(val_debug, entry)
+                    elif entry > val_debug[0]:
+                        heapq.heapreplace(val_debug, entry)
+
+    with open(os.path.join(output_dir, f'{DEBUG_SPLIT}.{SOURCE_EXTENSION}.txt'), 'w', encoding='utf-8') as polish_file, \
+            open(os.path.join(output_dir, f'{DEBUG_SPLIT}.{TARGET_EXTENSION}.txt'), 'w', encoding='utf-8') as kashubian_file:
+        for _, polish_line, kashubian_line in sorted(val_debug, reverse=True):
+            polish_file.write(polish_line)
+            kashubian_file.write(kashubian_line)
+            counts[DEBUG_SPLIT] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split parallel corpora into train, val and test sets by content hash")
+    parser.add_argument("corpora", nargs="*", default=['../data/input/dataset'],
+                        help="Corpus prefixes, each expanding to <prefix>.pl.txt and <prefix>.csb.txt")
+    parser.add_argument("--output-dir", default='../data/input')
+    parser.add_argument("--train-size", type=float, default=0.8)
+    parser.add_argument("--val-size", type=float, default=0.1)
+    parser.add_argument("--test-size", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--val-debug-size", type=int, default=DEFAULT_VAL_DEBUG_SIZE)
+    args = parser.parse_args()
+    print(split_data(args.train_size, args.val_size, args.test_size, args.corpora, args.output_dir, args.seed,
+                     args.val_debug_size))
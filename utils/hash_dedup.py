@@ -0,0 +1,203 @@
+import hashlib
+import heapq
+import os
+import tempfile
+import unicodedata
+from array import array
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from data_processor.parallel_corpus import ParallelCorpus
+
+
+DEFAULT_HASH_BITS = 64
+DEFAULT_MAX_ENTRIES = 50_000_000
+SORT_RUN_SIZE = 1_000_000
+INITIAL_CAPACITY = 1 << 16
+WORD_MASK = (1 << 64) - 1
+
+
+def exact_key(text: str) -> str:
+    return text
+
+
+def normalized_key(text: str) -> str:
+    # Pairs differing only in case, punctuation, whitespace or Unicode composition count as duplicates
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = ''.join(' ' if unicodedata.category(character).startswith('P') else character for character in text)
+    return ' '.join(text.split())
+
+
+def pair_hash(polish_line: str, kashubian_line: str, hash_bits: int = DEFAULT_HASH_BITS) -> int:
+    # Lines are stripped, so a newline cannot occur inside either of them and separates the two unambiguously
+    digest = hashlib.blake2b(f"{polish_line}\n{kashubian_line}".encode('utf-8'), digest_size=hash_bits // 8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class HashSet:
+    # Open addressing set of fixed width hashes kept in a flat array of unsigned 64-bit words, 128-bit hashes take two
+    # consecutive words. An empty slot is zero, so a hash whose low word is zero is stored with that word set to 1.
+    def __init__(self, hash_bits: int = DEFAULT_HASH_BITS, capacity: int = INITIAL_CAPACITY):
+        self.words = hash_bits // 64
+        self.capacity = capacity
+        self.size = 0
+        self.slots = array('Q', bytes(8 * self.words * capacity))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, key: int) -> bool:
+        # Returns whether the key was not in the set before
+        if 2 * (self.size + 1) > self.capacity:
+            self.__grow()
+        if not self.__insert(self.slots, self.capacity, key):
+            return False
+        self.size += 1
+        return True
+
+    def __insert(self, slots: array, capacity: int, key: int) -> bool:
+        mask = capacity - 1
+        low = key & WORD_MASK or 1
+        slot = low & mask
+        if self.words == 1:
+            while True:
+                stored = slots[slot]
+                if stored == 0:
+                    slots[slot] = low
+                    return True
+                if stored == low:
+                    return False
+                slot = (slot + 1) & mask
+        high = key >> 64
+        while True:
+            stored = slots[2 * slot]
+            if stored == 0:
+                slots[2 * slot] = low
+                slots[2 * slot + 1] = high
+                return True
+            if stored == low and slots[2 * slot + 1] == high:
+                return False
+            slot = (slot + 1) & mask
+
+    def __grow(self) -> None:
+        capacity = self.capacity * 2
+        slots = array('Q', bytes(8 * self.words * capacity))
+        old_slots = self.slots
+        for start in range(0, len(old_slots), self.words):
+            if old_slots[start]:
+                key = old_slots[start] if self.words == 1 else old_slots[start] | old_slots[start + 1] << 64
+                self.__insert(slots, capacity, key)
+        self.slots = slots
+        self.capacity = capacity
+
+
+class TooManyEntries(Exception):
+    pass
+
+
+def read_pairs(polish_file_path: str, kashubian_file_path: str) -> Iterator[Tuple[str, str]]:
+    with ParallelCorpus(polish_file_path, kashubian_file_path) as corpus:
+        for polish_line, kashubian_line in corpus:
+            yield polish_line.strip(), kashubian_line.strip()
+
+
+def keep_first_in_memory(pairs: Iterator[Tuple[str, str]], key: Callable[[str], str], hash_bits: int,
+                         max_entries: Optional[int]) -> Iterator[Tuple[str, str]]:
+    seen = HashSet(hash_bits)
+    for polish_line, kashubian_line in pairs:
+        if seen.add(pair_hash(key(polish_line), key(kashubian_line), hash_bits)):
+            if max_entries is not None and len(seen) > max_entries:
+                raise TooManyEntries
+            yield polish_line, kashubian_line
+
+
+def write_sorted_run(records: List[Tuple[int, int]], hash_bytes: int, directory: str) -> str:
+    # Fixed width big endian records sort the same way on disk as the (hash, line number) tuples in memory
+    records.sort()
+    with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as run_file:
+        for pair_key, line_number in records:
+            run_file.write(pair_key.to_bytes(hash_bytes, 'big') + line_number.to_bytes(8, 'big'))
+    return run_file.name
+
+
+def read_run(path: str, hash_bytes: int) -> Iterator[Tuple[int, int]]:
+    record_size = hash_bytes + 8
+    with open(path, 'rb') as run_file:
+        while True:
+            chunk = run_file.read(record_size * 4096)
+            if not chunk:
+                return
+            for start in range(0, len(chunk), record_size):
+                yield (int.from_bytes(chunk[start:start + hash_bytes], 'big'),
+                       int.from_bytes(chunk[start + hash_bytes:start + record_size], 'big'))
+
+
+def first_occurrences_external(pairs: Iterator[Tuple[str, str]], key: Callable[[str], str], hash_bits: int,
+                               run_size: int = SORT_RUN_SIZE) -> bytearray:
+    # Sorts (hash, line number) records in runs on disk and merges them, the first record of every hash is the line
+    # to keep. Only the bitmap of kept lines, one bit per line, stays in memory.
+    hash_bytes = hash_bits // 8
+    line_count = 0
+    with tempfile.TemporaryDirectory() as directory:
+        run_paths, records = [], []
+        for line_number, (polish_line, kashubian_line) in enumerate(pairs):
+            records.append((pair_hash(key(polish_line), key(kashubian_line), hash_bits), line_number))
+            line_count = line_number + 1
+            if len(records) >= run_size:
+                run_paths.append(write_sorted_run(records, hash_bytes, directory))
+                records = []
+        if records:
+            run_paths.append(write_sorted_run(records, hash_bytes, directory))
+
+        keep = bytearray((line_count + 7) // 8)
+        previous_key = None
+        for pair_key, line_number in heapq.merge(*(read_run(path, hash_bytes) for path in run_paths)):
+            if pair_key != previous_key:
+                previous_key = pair_key
+                keep[line_number >> 3] |= 1 << (line_number & 7)
+    return keep
+
+
+def keep_first_external(polish_file_path: str, kashubian_file_path: str, key: Callable[[str], str],
+                        hash_bits: int) -> Iterator[Tuple[str, str]]:
+    keep = first_occurrences_external(read_pairs(polish_file_path, kashubian_file_path), key, hash_bits)
+    for line_number, pair in enumerate(read_pairs(polish_file_path, kashubian_file_path)):
+        if keep[line_number >> 3] & (1 << (line_number & 7)):
+            yield pair
+
+
+def write_pairs(pairs: Iterator[Tuple[str, str]], polish_path: str, kashubian_path: str) -> int:
+    written = 0
+    with open(polish_path, 'w', encoding='utf-8') as polish_file, \
+            open(kashubian_path, 'w', encoding='utf-8') as kashubian_file:
+        for polish_line, kashubian_line in pairs:
+            polish_file.write(polish_line + '\n')
+            kashubian_file.write(kashubian_line + '\n')
+            written += 1
+    return written
+
+
+def deduplicate_pairs(polish_file_path: str, kashubian_file_path: str, near_duplicates: bool = False,
+                      hash_bits: int = DEFAULT_HASH_BITS, max_entries: Optional[int] = DEFAULT_MAX_ENTRIES,
+                      external: bool = False) -> int:
+    # Keeps the first occurrence of every pair in place and returns the number of pairs kept. Pairs are streamed
+    # through a set of their hashes, or through an external sort when the set would outgrow max_entries.
+    if hash_bits not in (64, 128):
+        raise ValueError("hash_bits must be 64 or 128")
+    key = normalized_key if near_duplicates else exact_key
+    temp_polish_path = polish_file_path + '.tmp'
+    temp_kashubian_path = kashubian_file_path + '.tmp'
+
+    written = None
+    if not external:
+        try:
+            pairs = read_pairs(polish_file_path, kashubian_file_path)
+            written = write_pairs(keep_first_in_memory(pairs, key, hash_bits, max_entries), temp_polish_path, temp_kashubian_path)
+        except TooManyEntries:
+            print(f"More than {max_entries} distinct pairs, deduplicating with an external sort")
+    if written is None:
+        pairs = keep_first_external(polish_file_path, kashubian_file_path, key, hash_bits)
+        written = write_pairs(pairs, temp_polish_path, temp_kashubian_path)
+
+    os.replace(temp_polish_path, polish_file_path)
+    os.replace(temp_kashubian_path, kashubian_file_path)
+    return written